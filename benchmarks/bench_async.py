@@ -0,0 +1,50 @@
+"""Event throughput of the async hive on the available event loops.
+
+    $ PYTHONPATH=. python benchmarks/bench_async.py [n_events]
+"""
+import asyncio
+import sys
+import time
+
+from pybeehive.asyn import Hive, Batch
+from pybeehive.asyn.utils import uvloop
+
+
+def bench(loop_factory, n_events):
+    hive = Hive()
+    received = []
+
+    @hive.streamer
+    async def stream():
+        for i in range(0, n_events, 1000):
+            yield Batch(range(i, min(i + 1000, n_events)))
+            await asyncio.sleep(0)
+        await asyncio.sleep(3600)
+
+    @hive.listener
+    async def on_event(event):
+        received.append(event)
+        if len(received) == n_events:
+            hive.close()
+
+    start = time.perf_counter()
+    hive.run(threaded=True, loop_factory=loop_factory).join()
+    return time.perf_counter() - start
+
+
+def main():
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    loops = [('asyncio', asyncio.new_event_loop)]
+    if uvloop is not None:
+        loops.append(('uvloop', uvloop.new_event_loop))
+    else:
+        print('uvloop is not installed, skipping')
+
+    for name, loop_factory in loops:
+        elapsed = bench(loop_factory, n_events)
+        print('%-10s %8d events in %6.3fs  %10.0f events/s' % (
+            name, n_events, elapsed, n_events / elapsed))
+
+
+if __name__ == '__main__':
+    main()
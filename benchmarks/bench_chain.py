@@ -0,0 +1,46 @@
+"""Dispatch throughput of chained listeners, with and without the
+compiled execution plan of the listener tree.
+
+    $ PYTHONPATH=. python benchmarks/bench_chain.py [n_events] [n_stages]
+"""
+import sys
+import time
+
+from pybeehive import Hive, Event
+
+
+def build(n_stages):
+    hive = Hive()
+    for i in range(n_stages):
+        def on_event(event):
+            return event.data + 1
+        on_event.__name__ = 'stage%d' % i
+        if i == 0:
+            hive.listener(on_event)
+        else:
+            hive.listener(chain='stage%d' % (i - 1))(on_event)
+    return hive
+
+
+def dispatch(listeners, events):
+    start = time.perf_counter()
+    for event in events:
+        for bee in listeners:
+            bee.notify(event)
+    return time.perf_counter() - start
+
+
+def main():
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    n_stages = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    hive = build(n_stages)
+    events = [Event(i) for i in range(n_events)]
+    for name, listeners in [('notify', list(hive.listeners)),
+                            ('compiled', hive.listeners.compile())]:
+        elapsed = dispatch(listeners, events)
+        print('%-8s %d stages: %8.0f events/s'
+              % (name, n_stages, n_events / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Throughput of CPU-bound listeners in one hive and in a hive cluster.
+
+    $ PYTHONPATH=. python benchmarks/bench_cluster.py [n_events] [processes]
+"""
+from functools import partial
+import multiprocessing
+import os
+import sys
+import time
+
+from pybeehive import Event, Hive
+from pybeehive.cluster import HiveCluster
+
+
+def work(data):
+    total = 0
+    for i in range(2000):
+        total += (data * i) % 7
+    return total
+
+
+def make_hive(done=None):
+    hive = Hive()
+
+    @hive.listener
+    def handle(event):
+        work(event.data)
+        if done is not None:
+            with done.get_lock():
+                done.value += 1
+    return hive
+
+
+def events(n_events):
+    return [Event(i, topic='topic-%d' % (i % 64)) for i in range(n_events)]
+
+
+def run_hive(n_events):
+    hive = make_hive()
+    handled = []
+    hive.listener()(handled.append)
+    hive.submit_events(events(n_events))
+    start = time.perf_counter()
+    thread = hive.run(threaded=True)
+    while len(handled) < n_events:
+        time.sleep(1e-3)
+    elapsed = time.perf_counter() - start
+    hive.close()
+    thread.join()
+    print('hive             : %8.0f events/s' % (n_events / elapsed))
+
+
+def run_cluster(n_events, processes):
+    done = multiprocessing.Value('Q', 0)
+    cluster = HiveCluster(partial(make_hive, done), processes=processes)
+    cluster.submit_events(events(n_events))
+    thread = cluster.run(threaded=True)
+    while cluster.stats() == []:
+        time.sleep(1e-3)
+    start = time.perf_counter()
+    while done.value < n_events:
+        time.sleep(1e-3)
+    elapsed = time.perf_counter() - start
+    cluster.close()
+    thread.join()
+    print('cluster of %2d    : %8.0f events/s' % (
+        processes, n_events / elapsed))
+    for stats in cluster.stats():
+        print('    worker %(worker)d: %(events)6d events' % stats)
+
+
+def main():
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    run_hive(n_events)
+    run_cluster(n_events, processes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Bandwidth saved by socket frame compression against its CPU cost.
+
+    $ PYTHONPATH=. python benchmarks/bench_compression.py [n_events]
+"""
+import random
+import sys
+import time
+
+from pybeehive import Event
+from pybeehive.codec import FrameCodec
+
+
+def make_payloads(n_events, n_fields):
+    symbols = ['AAPL', 'MSFT', 'GOOG', 'AMZN', 'FB']
+    return [Event({
+        'symbol': random.choice(symbols),
+        'fields': {'field_%d' % i: random.random() for i in range(n_fields)},
+        'source': 'exchange-feed',
+    }, topic='quotes').tostring() for _ in range(n_events)]
+
+
+def run(payloads, compression, level, batch_size):
+    codec = FrameCodec(compression, threshold=256, level=level)
+    start = time.perf_counter()
+    if batch_size == 1:
+        frames = [codec.encode(p) for p in payloads]
+    else:
+        frames = [codec.encode_batch(payloads[i:i + batch_size])
+                  for i in range(0, len(payloads), batch_size)]
+    encoded = time.perf_counter()
+    for frame in frames:
+        codec.decode(frame)
+    decoded = time.perf_counter()
+    size = codec.raw_bytes / 2 ** 20
+    print('%-5s level %-4s batch %4d: %5.1f%% of the bytes, '
+          'encode %7.1f MB/s, decode %7.1f MB/s' % (
+              compression, level, batch_size, 100 * codec.ratio,
+              size / (encoded - start), size / (decoded - encoded)))
+
+
+def main():
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    for n_fields in [5, 100]:
+        payloads = make_payloads(n_events, n_fields)
+        print('%d byte events' % (
+            sum(len(p) for p in payloads) // len(payloads)))
+        for batch_size in [1, 100]:
+            run(payloads, None, None, batch_size)
+            for level in [1, 6]:
+                run(payloads, 'zlib', level, batch_size)
+            run(payloads, 'lzma', 0, batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Write throughput of the event journal, to size disks for it.
+
+    $ PYTHONPATH=. python benchmarks/bench_journal.py [n_events] [directory]
+"""
+from threading import Thread
+import shutil
+import sys
+import tempfile
+import time
+
+from pybeehive import Event
+from pybeehive.journal import Journal
+
+
+def write(journal, events, durable):
+    for event in events:
+        seq = journal.append(event)
+        if durable:
+            journal.wait(seq)
+
+
+def run(directory, n_events, writers, durable, payload):
+    path = tempfile.mkdtemp(dir=directory)
+    try:
+        journal = Journal(path)
+        events = [Event(payload) for _ in range(n_events // writers)]
+        threads = [Thread(target=write, args=(journal, events, durable))
+                   for _ in range(writers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        journal.close()
+        elapsed = time.perf_counter() - start
+        size = sum(len(e.tostring()) for e in events) * writers
+        print('%-8s %2d writers %5d byte events: %8.0f events/s %7.1f MB/s '
+              '%6d fsyncs' % (
+                  'durable' if durable else 'buffered', writers, len(payload),
+                  n_events / elapsed, size / elapsed / 2 ** 20,
+                  journal.commits))
+    finally:
+        shutil.rmtree(path)
+
+
+def main():
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    directory = sys.argv[2] if len(sys.argv) > 2 else None
+    for payload in [b'x' * 100, b'x' * 4096]:
+        run(directory, n_events, 1, False, payload)
+        for writers in [1, 8, 32]:
+            run(directory, n_events, writers, True, payload)
+
+
+if __name__ == '__main__':
+    main()
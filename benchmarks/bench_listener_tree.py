@@ -0,0 +1,39 @@
+"""Time to build and flatten large listener graphs.
+
+    $ PYTHONPATH=. python benchmarks/bench_listener_tree.py [n_listeners]
+"""
+import sys
+import time
+
+from pybeehive import Hive
+
+
+def build(n_listeners, fan_in):
+    hive = Hive()
+    for i in range(n_listeners):
+        def on_event(event):
+            return event
+        on_event.__name__ = 'listener%d' % i
+        parents = ['listener%d' % j for j in range(max(i - fan_in, 0), i)]
+        if parents:
+            hive.listener(chain=parents)(on_event)
+        else:
+            hive.listener(on_event)
+    return hive
+
+
+def main():
+    n_listeners = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    for fan_in in [1, 3]:
+        start = time.perf_counter()
+        hive = build(n_listeners, fan_in)
+        built = time.perf_counter()
+        hive.listeners.call_method_recursively('setup')
+        done = time.perf_counter()
+        print('%6d listeners, fan in %d: build %.3fs, setup %.3fs, len %d'
+              % (n_listeners, fan_in, built - start, done - built,
+                 len(hive.listeners)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Throughput of reliable socket delivery compared to fire-and-forget.
+
+    $ PYTHONPATH=. python benchmarks/bench_reliable.py [n_messages]
+"""
+from queue import Empty
+import random
+import sys
+import time
+import zmq
+
+from pybeehive.socket import Client, Server, ReliableClient, ReliableServer
+
+
+def run(client_class, server_class, n_messages, payload):
+    address = '127.0.0.1', random.randint(20000, 30000)
+    server = server_class(address)
+    client = client_class(address)
+    server.start()
+    client.connect()
+    time.sleep(0.1)
+    received = dropped = 0
+    try:
+        start = time.perf_counter()
+        for _ in range(n_messages):
+            try:
+                client.send(payload)
+            except zmq.Again:
+                dropped += 1
+        deadline = time.time() + 10
+        while received + dropped < n_messages and time.time() < deadline:
+            try:
+                server.queue.get(timeout=0.1)
+                received += 1
+            except Empty:
+                continue
+        elapsed = time.perf_counter() - start
+    finally:
+        client.shutdown()
+        server.shutdown()
+    print('%-16s %5d byte messages: %8.0f messages/s %7d received '
+          '%7d dropped' % (client_class.__name__, len(payload),
+                           received / elapsed, received, dropped))
+
+
+def main():
+    n_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for payload in [b'x' * 100, b'x' * 4096]:
+        run(Client, Server, n_messages, payload)
+        run(ReliableClient, ReliableServer, n_messages, payload)
+
+
+if __name__ == '__main__':
+    main()
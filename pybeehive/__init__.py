@@ -1,7 +1,13 @@
 # -*- coding: utf-8 -*-
 """Top-level package for pybeehive."""
+from .actors import ActorListener
 from .core import Event, Listener, Streamer
 from .hive import Hive
+from .predicates import Eq, In, Range
+from .restart import RestartPolicy, ExponentialBackoff
+from .shedding import LoadShedder
+from .topics import Pattern
+from .utils import Batch, Inbox
 
 __author__ = """Djordje Pepic"""
 __email__ = 'djordje.m.pepic@gmail.com'
@@ -9,5 +15,8 @@ __version__ = '0.1.5'
 
 __all__ = [
     'Event', 'Listener', 'Streamer',
-    'Hive'
+    'Hive', 'Batch',
+    'RestartPolicy', 'ExponentialBackoff',
+    'Eq', 'In', 'Range', 'Pattern',
+    'ActorListener', 'Inbox', 'LoadShedder'
 ]
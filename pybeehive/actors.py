@@ -0,0 +1,118 @@
+from collections import defaultdict, deque
+from queue import Empty
+from threading import Lock, Thread
+from .core import Listener, Killable, Event
+from .logging import create_logger
+from .utils import Inbox
+
+
+class ActorListener(Listener, Killable):
+    """
+    Listener that handles events on its own worker thread. The hive's
+    dispatcher only filters events and puts them into the listener's
+    inbox, so a slow listener does not delay the other listeners.
+    Listeners chained to an actor are notified from the actor's thread.
+    If the hive's event queue supports holds, e.g. the
+    :class:`~pybeehive.journal.JournalQueue`, an event is only completed
+    once the actor handled or dropped it.
+
+    :param inbox: :class:`~pybeehive.utils.Inbox` or other queue that
+        buffers events until the worker handles them
+    :param filters:
+    """
+    def __init__(self, inbox=None, filters=None):
+        Listener.__init__(self, filters=filters)
+        Killable.__init__(self)
+        self.inbox = inbox if inbox is not None else Inbox()
+        self.thread = None
+        # Set by the hive to the hold method of its event queue
+        self.hold = None
+        self._releases = defaultdict(deque)
+        self._releases_lock = Lock()
+        self.logger = create_logger(name='pybeehive.actor')
+
+    def __str__(self):
+        return "%s(filters=%s, inbox=%s)" % (
+            self.__class__.__name__, set(self.filters),
+            self.inbox.__class__.__name__
+        )
+
+    def notify(self, event):
+        if not event:
+            return super(ActorListener, self).notify(event)
+        if self.filter(event):
+            if self.hold is not None:
+                with self._releases_lock:
+                    self._releases[id(event)].append(self.hold())
+            self.inbox.put(event)
+
+    def start(self):
+        """
+        Start the worker thread.
+
+        """
+        if self.thread is None:
+            if self.hold is not None:
+                # Dropped and replaced events are released by the inbox
+                self.inbox.on_drop = self._release
+            self.kill_event.clear()
+            self.thread = Thread(target=self._work, daemon=True,
+                                 name='actor-%s' % self.__class__.__name__)
+            self.thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop the worker thread once it has handled the queued events.
+
+        :param timeout: maximum number of seconds to wait for the worker
+        """
+        self.kill()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                self.logger.warning("%s did not stop in %ss, %d events "
+                                    "left", str(self), timeout,
+                                    self.inbox.qsize())
+            self.thread = None
+
+    def _work(self):
+        while True:
+            try:
+                event = self.inbox.get(timeout=0.01)
+            except Empty:
+                if not self.alive:
+                    break
+                continue
+            try:
+                self._handle(event)
+            finally:
+                self.inbox.task_done()
+                self._release(event)
+
+    def _release(self, event):
+        with self._releases_lock:
+            releases = self._releases.get(id(event))
+            if not releases:
+                return
+            release = releases.popleft()
+            if not releases:
+                del self._releases[id(event)]
+        release()
+
+    def _handle(self, event):
+        request = getattr(event, 'request', None)
+        try:
+            result = self.on_event(event)
+            if result is not None:
+                event = Event(result, request=request)
+                for bee in self.chained_bees:
+                    bee.notify(event)
+                if request is not None and not self.chained_bees:
+                    request.resolve(result)
+        except Exception as e:
+            if request is not None:
+                request.fail(e)
+            try:
+                self.on_exception(e)
+            except Exception as e:
+                self.logger.exception("%s - %s", str(self), repr(e))
@@ -1,4 +1,7 @@
 from ..core import Event
+from ..predicates import Eq, In, Range
+from ..topics import Pattern
+from ..utils import Batch
 from .core import Listener, Streamer
 from .hive import Hive
 from .utils import async_generator
@@ -6,5 +9,6 @@ from .utils import async_generator
 
 __all__ = [
     'Event', 'Listener', 'Streamer',
-    'Hive', 'async_generator'
+    'Hive', 'Batch', 'async_generator',
+    'Eq', 'In', 'Range', 'Pattern'
 ]
@@ -0,0 +1,181 @@
+from collections import deque
+from zmq.asyncio import Context
+import asyncio
+import time
+import zmq
+
+from ..balancer import (
+    Credits, credit_frame, decode_event, GRANT, RESET, LEAVE
+)
+from ..core import Event, Killable
+from ..socket import set_hwm
+from .core import Listener, Streamer
+from .utils import AsyncGenerator, Queue
+
+
+class BalancerListener(Listener, Killable):
+    """
+    Asynchronous version of :class:`pybeehive.balancer.BalancerListener`,
+    whose socket is served by a task.
+
+    :param address:
+    :param filters:
+    :param buffer_size:
+    :param codec:
+    :param sndhwm:
+    :param rcvhwm:
+    """
+    _event_class = asyncio.Event
+
+    def __init__(self, address, filters=None, buffer_size=1000, codec=None,
+                 sndhwm=None, rcvhwm=None):
+        Listener.__init__(self, filters=filters)
+        Killable.__init__(self)
+        self.address = address
+        self.codec = codec
+        self.credits = Credits()
+        self.sent = 0
+        self.rerouted = 0
+        self.context = Context.instance()
+        self.socket = self.context.socket(zmq.ROUTER)
+        self.socket.setsockopt(zmq.ROUTER_MANDATORY, 1)
+        set_hwm(self.socket, sndhwm, rcvhwm)
+        self._buffer = Queue(maxsize=buffer_size)
+        self._pending = deque()
+        self._balance_future = None
+
+    @property
+    def workers(self):
+        return len(self.credits)
+
+    async def setup(self):
+        self.socket.bind('tcp://%s:%s' % self.address)
+        self._balance_future = asyncio.ensure_future(self._balance())
+
+    async def teardown(self):
+        self.kill()
+        if self._balance_future is not None \
+                and not self._balance_future.done():
+            self._balance_future.cancel()
+        self.socket.close(linger=0)
+        await asyncio.sleep(0)
+
+    async def on_event(self, event):
+        result = await self.parse_event(event)
+        data = result.tostring()
+        if self.codec is not None:
+            data = self.codec.encode(data)
+        await self._buffer.put(data)
+
+    async def parse_event(self, event):
+        return event  # pragma: nocover
+
+    async def _balance(self):
+        credits, pending = self.credits, self._pending
+        while self.alive:
+            sent = 0
+            while credits.available:
+                if not pending:
+                    try:
+                        pending.append(self._buffer.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+                worker = credits.take()
+                try:
+                    await self.socket.send_multipart([worker, pending[0]],
+                                                     flags=zmq.NOBLOCK)
+                except zmq.ZMQError:
+                    credits.remove(worker)
+                    self.rerouted += 1
+                    continue
+                pending.popleft()
+                self.sent += 1
+                sent += 1
+            if await self.socket.poll(0 if sent else 1, zmq.POLLIN):
+                while True:
+                    try:
+                        worker, frame = await self.socket.recv_multipart(
+                            flags=zmq.NOBLOCK
+                        )
+                    except zmq.Again:
+                        break
+                    credits.handle(worker, frame)
+            elif sent:
+                # Let the listeners fill the buffer
+                await asyncio.sleep(0)
+
+
+class WorkerStreamer(Streamer):
+    """
+    Asynchronous version of :class:`pybeehive.balancer.WorkerStreamer`.
+
+    :param address:
+    :param topic:
+    :param capacity:
+    :param codec:
+    :param refresh_interval:
+    """
+    def __init__(self, address, topic=None, capacity=10, codec=None,
+                 refresh_interval=1.0):
+        super(WorkerStreamer, self).__init__(topic=topic)
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.address = address
+        self.capacity = capacity
+        self.codec = codec
+        self.refresh_interval = refresh_interval
+        self.received = 0
+        self.context = Context.instance()
+        self.socket = self.context.socket(zmq.DEALER)
+
+    async def setup(self):
+        self.socket.connect('tcp://%s:%s' % self.address)
+
+    async def teardown(self):
+        try:
+            await self.socket.send(credit_frame(LEAVE), flags=zmq.NOBLOCK)
+        except zmq.ZMQError:
+            pass
+        self.socket.close(linger=100)
+
+    def stream(self):
+        state = {'outstanding': 0, 'last_event': None}
+        events = deque()
+
+        async def next_event():
+            while self.alive and not events:
+                await self._grant(state)
+                if not await self.socket.poll(10, zmq.POLLIN):
+                    continue
+                while True:
+                    try:
+                        data = await self.socket.recv(flags=zmq.NOBLOCK)
+                    except zmq.Again:
+                        break
+                    state['last_event'] = time.monotonic()
+                    events.extend(decode_event(data, self.codec))
+            if not events:
+                raise StopAsyncIteration
+            event = events.popleft()
+            state['outstanding'] -= 1
+            self.received += 1
+            return Event(event.data, topic=self.topic,
+                         created_at=event.created_at, request=event.request)
+
+        return AsyncGenerator(next_event)
+
+    async def _grant(self, state):
+        now = time.monotonic()
+        last_event = state['last_event']
+        if last_event is None or now - last_event > self.refresh_interval:
+            state['outstanding'] = self._free(0)
+            await self.socket.send(credit_frame(RESET, state['outstanding']))
+            state['last_event'] = now
+        else:
+            free = self._free(state['outstanding'])
+            if free >= max(1, self.capacity // 4):
+                await self.socket.send(credit_frame(GRANT, free))
+                state['outstanding'] += free
+
+    def _free(self, outstanding):
+        return max(0, self.capacity - outstanding - self._q.qsize())
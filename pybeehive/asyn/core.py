@@ -1,6 +1,7 @@
 import asyncio
 from abc import abstractmethod
 from ..core import Event, Listener as SyncListener, Streamer as SyncStreamer
+from ..utils import Batch
 from .utils import AsyncContextManager
 
 
@@ -10,11 +11,20 @@ class Listener(SyncListener):
         raise NotImplementedError  # pragma: nocover
 
     async def notify(self, event):
+        if event and not self.filter(event):
+            return
         if event:
+            request = getattr(event, 'request', None)
             try:
-                event = await self.on_event(event)
-                event = Event(event)
+                result = await self.on_event(event)
+                event = Event(result, request=request)
+                # Results at the end of a chain answer requests
+                if request is not None and result is not None \
+                        and not self.chained_bees:
+                    request.resolve(result)
             except Exception as e:
+                if request is not None:
+                    request.fail(e)
                 self.on_exception(e)
             await asyncio.gather(*[
                 bee.notify(event) for bee in self.chained_bees
@@ -43,14 +53,43 @@ class Streamer(SyncStreamer):
 
     async def run(self):
         self._assert_queue_is_set()
+        failures = 0
         while self.alive:
+            streamed, exhausted = False, True
             try:
                 async with AsyncContextManager(self.stream()) as stream:
                     async for data in stream:
-                        event = Event(data, topic=self.topic)
-                        await self._q.put(event)
+                        streamed = True
+                        await self._put(data)
                         # break long running streams if the kill event is set
                         if not self.alive:
                             break
             except Exception as e:
+                exhausted = False
                 self.on_exception(e)
+            if not self.alive:
+                break
+            failures = 0 if streamed else failures + 1
+            delay = self._next_restart_delay(failures, exhausted)
+            if delay:
+                try:
+                    await asyncio.wait_for(self.kill_event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _put(self, data):
+        if isinstance(data, Batch):
+            await self._put_batch(data)
+        else:
+            await self._q.put(self._create_event(data, self.clock.time()))
+
+    async def _put_batch(self, batch):
+        now = self.clock.time()
+        events = [self._create_event(data, now) for data in batch]
+        try:
+            put_many = self._q.put_many
+        except AttributeError:
+            for event in events:
+                await self._q.put(event)
+        else:
+            await put_many(events)
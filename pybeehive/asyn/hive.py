@@ -1,19 +1,28 @@
-from contextlib import contextmanager
+from time import time
 import asyncio
 import inspect
 
 from ..hive import Hive as SyncHive
 from .core import Listener, Streamer
-from .utils import AsyncGenerator
+from .multiplex import IOStreamer
+from .rpc import RequestTracker
+from .timers import TimerStreamer
+from .utils import AsyncGenerator, Queue
 try:
-    from .socket import SocketListener, SocketStreamer
+    from .socket import SocketListener, SocketStreamer, ReplyServer
 # This is tested, just not by patching imports
 except ImportError:  # pragma: nocover
     SocketListener, SocketStreamer = None, None  # pragma: nocover
+    ReplyServer = None  # pragma: nocover
 
 
-async def _loop_async(event_queue, listeners, kill_event):
+async def _loop_async(event_queue, listeners, kill_event, shedder=None,
+                      clock=None, requests=None):
+    advance = getattr(clock, 'advance', None)
+    now = getattr(clock, 'time', time)
     while not kill_event.is_set():
+        if requests is not None:
+            requests.expire()
         # This try except mimics 'await queue.get()',
         # but continuously yields control back to loop
         # in order to allow graceful shutdown
@@ -22,24 +31,51 @@ async def _loop_async(event_queue, listeners, kill_event):
         except asyncio.QueueEmpty:
             await asyncio.sleep(1e-3)
         else:
-            await asyncio.gather(*[
-                    bee.notify(event) for bee in listeners
-                ])
+            if requests is not None and event.request is not None:
+                requests.adopt(event.request)
+            try:
+                if advance is not None:
+                    for fired in advance(event.created_at):
+                        # Timers of coroutine functions return awaitables
+                        if inspect.isawaitable(fired):
+                            fired = await fired
+                            if fired is None:
+                                continue
+                        await asyncio.gather(*[
+                            bee.notify(fired) for bee in listeners
+                        ])
+                if shedder is not None and shedder.should_drop(event, now()):
+                    continue
+                await asyncio.gather(*[
+                        bee.notify(event) for bee in listeners
+                    ])
+            finally:
+                event_queue.task_done()
 
 
 class Hive(SyncHive):
 
     _event_class = asyncio.Event
     _listener_class = Listener
+    _actor_listener_class = None
     _streamer_class = Streamer
     _socket_listener_class = SocketListener
     _socket_streamer_class = SocketStreamer
+    _timer_streamer_class = TimerStreamer
+    _io_streamer_class = IOStreamer
+    _request_tracker_class = RequestTracker
+    _reply_server_class = ReplyServer
 
-    def __init__(self):
-        super(Hive, self).__init__()
+    def __init__(self, **kwargs):
+        super(Hive, self).__init__(**kwargs)
         # This is set at runtime depending on the run context
         self.loop = None
-        self._event_queue = asyncio.Queue()
+        self._loop_factory = None
+        self._owns_loop = False
+        self._dispatcher = None
+        self._jobs = []
+        if kwargs.get('queue') is None:
+            self._event_queue = Queue()
 
     def _wrap_stream(self, stream_func):
         def stream(s):
@@ -50,61 +86,149 @@ class Hive(SyncHive):
             return stream_func()
         return stream
 
+    async def __aenter__(self):
+        await self._start()
+        self._dispatcher = asyncio.ensure_future(_loop_async(
+            self._event_queue, self.listeners, self.kill_event, self.shedder,
+            self.clock, self.requests
+        ))
+        self.logger.info("The hive is now live!")
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.logger.info("Shutting down hive...")
+        self.kill()
+        await asyncio.wait([self._dispatcher])
+        await self._stop()
+
+    def request(self, event, timeout=None, priority=None):
+        """
+        Submit an event and return a future of its result,
+        see :meth:`pybeehive.Hive.request`. Must be called on the event
+        loop of the hive.
+
+        :param event:
+        :param timeout:
+        :param priority:
+        :return: :class:`asyncio.Future`
+        """
+        return super(Hive, self).request(event, timeout, priority)
+
+    async def serve(self):
+        """
+        Run the hive on the running event loop until it is killed or closed.
+        Setup, streamers, dispatch and teardown all happen on the caller's
+        loop, so this can be awaited from inside an existing application.
+        ``async with hive:`` runs the hive in the background for the
+        duration of the block instead.
+        """
+        async with self:
+            await self._dispatcher
+
+    def run(self, threaded=False, debug=False, loop_factory=None):
+        """
+
+        :param threaded:
+        :param debug:
+        :param loop_factory: callable that creates the event loop the hive
+            runs on, e.g. :func:`pybeehive.asyn.utils.new_event_loop`
+        :return:
+        """
+        self._loop_factory = loop_factory
+        return super(Hive, self).run(threaded=threaded, debug=debug)
+
     def _run(self):
         self._set_loop()
-        with self._setup_teardown_streamers() as jobs:
-            with self._setup_teardown_listeners():
-                task = asyncio.ensure_future(asyncio.gather(
-                    *jobs,
-                    _loop_async(
-                        self._event_queue, self.listeners, self.kill_event
-                    )
-                ))
-                try:
-                    self.logger.info("The hive is now live!")
-                    self.loop.run_until_complete(task)
-                except KeyboardInterrupt:
-                    pass  # Need explicit catch here
-                finally:
-                    self.logger.info("Shutting down hive...")
-        task.cancel()
-        self.close()
+        task = asyncio.ensure_future(self.serve())
+        try:
+            self.loop.run_until_complete(task)
+        except KeyboardInterrupt:
+            # Give the hive a chance to teardown its bees gracefully
+            self.kill()
+            try:
+                self.loop.run_until_complete(task)
+            except KeyboardInterrupt:
+                pass
+        finally:
+            self._close_loop()
 
     def _set_loop(self):
+        self._owns_loop = True
+        if self._loop_factory is not None:
+            self.loop = self._loop_factory()
+            asyncio.set_event_loop(self.loop)
+            return
         try:
             self.loop = asyncio.get_event_loop()
+            self._owns_loop = False
         except RuntimeError:
             # Create new event loop when called from a thread
             self.loop = asyncio.get_event_loop_policy().new_event_loop()
             asyncio.set_event_loop(self.loop)
 
-    @contextmanager
-    def _setup_teardown_listeners(self):
-        setup_futures = self.listeners.call_method_recursively('setup')
-        if setup_futures:
-            self.loop.run_until_complete(asyncio.gather(
-                *setup_futures, return_exceptions=True))
-        yield
-        teardown_futures = self.listeners.call_method_recursively('teardown')
-        if teardown_futures:
-            self.loop.run_until_complete(asyncio.gather(
-                *teardown_futures, return_exceptions=True))
-
-    @contextmanager
-    def _setup_teardown_streamers(self):
-        jobs = self.loop.run_until_complete(asyncio.gather(
+    def _close_loop(self):
+        # Loops of the caller are left open
+        if not self._owns_loop:
+            return
+        self._owns_loop = False
+        try:
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            self.loop.close()
+
+    async def _start(self):
+        self.loop = asyncio.get_event_loop()
+        self.setup_errors = []
+        self._attach_clock()
+        jobs = await asyncio.gather(
             *[self._setup_streamer(s) for s in self.streamers]
-        ))
-        yield jobs
+        )
+        if self.reply_address is not None:
+            self._reply_server = self._reply_server_class(self.reply_address,
+                                                          self.requests)
+            await self._reply_server.start()
+        self.listeners.bind_predicates()
+        await self._call_listeners('setup')
+        self._jobs = [asyncio.ensure_future(job) for job in jobs]
+        self.live.set()
 
-        self.loop.run_until_complete(asyncio.gather(
+    async def _stop(self):
+        self.live.clear()
+        await self._call_listeners('teardown')
+        if self._reply_server is not None:
+            await self._reply_server.shutdown()
+            self._reply_server = None
+        self.requests.close()
+        await asyncio.gather(
             *[self._teardown_streamer(s) for s in self.streamers]
-        ))
+        )
+        for job in self._jobs:
+            if not job.done():
+                job.cancel()
+        self._detach_clock()
+        self.close()
+
+    async def _call_listeners(self, method_name):
+        errors = []
+        bees = self.listeners.flatten()
+        futures = self.listeners.call_method_recursively(method_name,
+                                                         errors=errors)
+        if futures:
+            # Only the bees whose method did not raise returned a future
+            failed = [bee for bee, _ in errors]
+            bees = [bee for bee in bees if bee not in failed]
+            results = await asyncio.gather(*futures, return_exceptions=True)
+            errors.extend((bee, result) for bee, result in zip(bees, results)
+                          if isinstance(result, Exception))
+        if method_name == 'setup':
+            self.setup_errors.extend(errors)
 
     async def _setup_streamer(self, streamer):
         try:
             await streamer.setup()
         except Exception as e:
+            self.setup_errors.append((streamer, e))
             self.logger.exception("setup %s - %s", streamer, repr(e))
         else:
             self.logger.debug("setup %s - OK", streamer)
@@ -114,6 +238,6 @@ class Hive(SyncHive):
         streamer.kill()
         try:
             await streamer.teardown()
-            self.logger.exception("teardown %s - OK", str(streamer))
+            self.logger.debug("teardown %s - OK", str(streamer))
         except Exception as e:
             self.logger.exception("teardown %s - %s", str(streamer), repr(e))
@@ -0,0 +1,49 @@
+import asyncio
+
+from .core import Streamer
+
+
+class IOStreamer(Streamer):
+    """
+    Streamer driven by the readiness of a file object such as a socket,
+    a pipe or a file descriptor. ``stream`` is a regular generator that is
+    called every time the file object becomes readable, and should yield
+    whatever data is available without blocking. Readiness is watched by
+    the event loop, so no threads are used.
+
+    :param fileobj: object with a fileno() method or a file descriptor,
+        which can also be set in setup
+    :param topic:
+    """
+    def __init__(self, fileobj=None, topic=None):
+        super(IOStreamer, self).__init__(topic=topic)
+        self.fileobj = fileobj
+
+    async def run(self):
+        self._assert_queue_is_set()
+        loop = asyncio.get_event_loop()
+        ready = asyncio.Event()
+        loop.add_reader(self.fileobj, ready.set)
+        try:
+            while self.alive:
+                try:
+                    await asyncio.wait_for(ready.wait(), 0.05)
+                except asyncio.TimeoutError:
+                    continue
+                ready.clear()
+                await self.read()
+        finally:
+            loop.remove_reader(self.fileobj)
+
+    async def read(self):
+        """
+        Stream the data that is available after the file object
+        became readable into the output queue.
+        """
+        try:
+            for data in self.stream():
+                await self._put(data)
+                if not self.alive:
+                    break
+        except Exception as e:
+            self.on_exception(e)
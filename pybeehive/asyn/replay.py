@@ -0,0 +1,60 @@
+from time import time
+import asyncio
+
+from ..replay import (
+    ReplayStreamer as SyncReplayStreamer, Recorder as SyncRecorder, read_log
+)
+from ..utils import Batch
+from .core import Listener, Streamer
+from .utils import AsyncGenerator
+
+
+class ReplayStreamer(SyncReplayStreamer, Streamer):
+    """
+    Asynchronous version of :class:`pybeehive.replay.ReplayStreamer`.
+    Segments are read on the event loop one batch at a time, so large
+    batch sizes delay other tasks for longer.
+    """
+    def stream(self):
+        pacer = self._begin()
+        batches = read_log(self.path, self.start, self.end, self.batch_size)
+        pending = []
+
+        async def next_event():
+            if not self.alive:
+                raise StopAsyncIteration
+            if pacer.speed is None:
+                for events in batches:
+                    self.replayed += len(events)
+                    # Let other tasks run between batches
+                    await asyncio.sleep(0)
+                    return Batch(events)
+                self._finish()
+                raise StopAsyncIteration
+            if not pending:
+                pending.extend(reversed(next(batches, [])))
+                if not pending:
+                    self._finish()
+                    raise StopAsyncIteration
+            event = pending.pop()
+            delay = pacer.delay(event, time())
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.replayed += 1
+            return event
+
+        return AsyncGenerator(next_event)
+
+
+class Recorder(SyncRecorder, Listener):
+    """
+    Asynchronous version of :class:`pybeehive.replay.Recorder`.
+    """
+    async def setup(self):
+        SyncRecorder.setup(self)
+
+    async def teardown(self):
+        SyncRecorder.teardown(self)
+
+    async def on_event(self, event):
+        self.journal.append(event)
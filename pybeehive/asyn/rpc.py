@@ -0,0 +1,18 @@
+import asyncio
+
+from ..rpc import RequestTracker as SyncRequestTracker
+
+
+class RequestTracker(SyncRequestTracker):
+    """
+    Asynchronous version of :class:`pybeehive.rpc.RequestTracker`, whose
+    requests are resolved with asyncio futures. Requests must be created
+    on the event loop of the hive.
+
+    :param max_outstanding:
+    :param reply_address:
+    """
+    timeout_error = asyncio.TimeoutError
+
+    def _new_future(self):
+        return asyncio.get_event_loop().create_future()
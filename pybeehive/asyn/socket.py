@@ -1,23 +1,32 @@
+from collections import deque
 from zmq.asyncio import Context, Poller
 import asyncio
+import pickle
+import time
 import zmq
 
 from ..core import Event, Killable
+from ..partition import HashRing
+from ..reliable import ReliableReceiver, ReliableSender
+from ..socket import set_hwm
 from .core import Streamer, Listener
-from .utils import AsyncGenerator
+from .utils import AsyncGenerator, Queue, SpillQueue
 
 
 class Server(Killable):
 
     _event_class = asyncio.Event
+    socket_type = zmq.PULL
 
-    def __init__(self, address):
+    def __init__(self, address, sndhwm=None, rcvhwm=None, codec=None):
         super(Server, self).__init__()
         self.address = address
+        self.codec = codec
         self.queue = asyncio.Queue()
 
         self.context = Context.instance()
-        self.socket = self.context.socket(zmq.PULL)
+        self.socket = self.context.socket(self.socket_type)
+        set_hwm(self.socket, sndhwm, rcvhwm)
         self.poller = Poller()
         self._listen_future = None
 
@@ -27,10 +36,17 @@ class Server(Killable):
                 events = await self.poller.poll(timeout=1e-4)
                 if self.socket in dict(events):
                     data = await self.socket.recv()
-                    await self.queue.put(data)
+                    await self._enqueue(data)
             except zmq.error.ZMQError:
                 await asyncio.sleep(1e-4)
 
+    async def _enqueue(self, data):
+        if self.codec is None:
+            await self.queue.put(data)
+        else:
+            for payload in self.codec.decode(data):
+                await self.queue.put(payload)
+
     async def start(self):
         self.socket.bind('tcp://%s:%s' % self.address)
         self.poller.register(self.socket, zmq.POLLIN)
@@ -60,33 +76,278 @@ class Server(Killable):
 
 
 class Client(Killable):
+    """
+    Asynchronous version of :class:`pybeehive.socket.Client`, whose send
+    buffer is flushed by a task.
 
+    :param address:
+    :param sndhwm:
+    :param rcvhwm:
+    :param buffer_size:
+    :param overflow:
+    :param linger:
+    :param codec:
+    :param batch_size:
+    """
     _event_class = asyncio.Event
+    socket_type = zmq.PUSH
+    overflow_policies = ('block', 'drop', 'spill')
 
-    def __init__(self, address):
+    def __init__(self, address, sndhwm=None, rcvhwm=None, buffer_size=0,
+                 overflow='block', linger=1.0, codec=None, batch_size=1):
+        if overflow not in self.overflow_policies:
+            raise ValueError("overflow must be one of %s, not %r"
+                             % (', '.join(self.overflow_policies), overflow))
+        if batch_size > 1 and (codec is None or not buffer_size):
+            raise ValueError("batching requires a buffer and a codec")
         super(Client, self).__init__()
         self.address = address
+        self.overflow = overflow
+        self.linger = linger
+        self.codec = codec
+        self.batch_size = batch_size
         self.context = Context.instance()
-        self.socket = self.context.socket(zmq.PUSH)
+        self.socket = self.context.socket(self.socket_type)
+        set_hwm(self.socket, sndhwm, rcvhwm)
+        self.buffer = None
+        if buffer_size and overflow == 'spill':
+            self.buffer = SpillQueue(memory_limit=buffer_size)
+        elif buffer_size:
+            self.buffer = Queue(maxsize=buffer_size)
+        self.dropped = 0
+        self._flush_future = None
+
+    def stats(self):
+        """
+        Return the metrics of the send buffer.
+
+        :return: dict with the number of buffered messages and the number
+            of dropped and spilled messages
+        """
+        return {
+            'depth': self.buffer.qsize() if self.buffer is not None else 0,
+            'dropped': self.dropped,
+            'spilled': getattr(self.buffer, 'spilled', 0),
+        }
 
     async def connect(self):
         self.socket.connect('tcp://%s:%s' % self.address)
+        if self.buffer is not None:
+            self._flush_future = asyncio.ensure_future(self._flush_buffer())
         await asyncio.sleep(0)
 
     async def send(self, data):
-        while self.alive:
-            return await self.socket.send(data, flags=zmq.NOBLOCK)
+        if self.buffer is None:
+            if self.codec is not None:
+                data = self.codec.encode(data)
+            while self.alive:
+                return await self.socket.send(data, flags=zmq.NOBLOCK)
+        elif self.overflow == 'drop':
+            try:
+                self.buffer.put_nowait(data)
+            except asyncio.QueueFull:
+                self.dropped += 1
+        else:
+            # Waits for room in the buffer until the client is killed
+            while self.alive:
+                try:
+                    return await asyncio.wait_for(self.buffer.put(data),
+                                                  0.01)
+                except asyncio.TimeoutError:
+                    continue
 
     async def shutdown(self):
+        if self._flush_future is not None:
+            try:
+                await asyncio.wait_for(self.buffer.join(), self.linger)
+            except asyncio.TimeoutError:
+                pass
         self.kill()
+        if self._flush_future is not None and not self._flush_future.done():
+            self._flush_future.cancel()
+        if self.overflow == 'spill' and self.buffer is not None:
+            self.buffer.close()
         self.socket.close(linger=0)
         await asyncio.sleep(0)
 
+    async def _flush_buffer(self):
+        while self.alive:
+            batch = [await self.buffer.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.buffer.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                await self.socket.send(self._encode(batch))
+            finally:
+                for _ in batch:
+                    self.buffer.task_done()
+
+    def _encode(self, batch):
+        if self.codec is None:
+            return batch[0]
+        if len(batch) == 1:
+            return self.codec.encode(batch[0])
+        return self.codec.encode_batch(batch)
+
+
+class ReliableServer(Server):
+    """
+    Asynchronous version of :class:`pybeehive.socket.ReliableServer`.
+
+    :param address:
+    :param ack_every:
+    :param ack_interval:
+    :param sndhwm:
+    :param rcvhwm:
+    :param codec:
+    """
+    socket_type = zmq.ROUTER
+
+    def __init__(self, address, ack_every=256, ack_interval=0.01,
+                 sndhwm=None, rcvhwm=None, codec=None):
+        super(ReliableServer, self).__init__(address, sndhwm, rcvhwm, codec)
+        self.receiver = ReliableReceiver(ack_every, ack_interval)
+
+    async def _receive_into_queue(self):
+        receiver = self.receiver
+        while self.alive:
+            try:
+                events = await self.poller.poll(timeout=1)
+                if self.socket in dict(events):
+                    # Bound the batch so that acks are not held back
+                    for _ in range(receiver.ack_every):
+                        try:
+                            peer, frame = await self.socket.recv_multipart(
+                                flags=zmq.NOBLOCK
+                            )
+                        except zmq.Again:
+                            break
+                        payload = receiver.receive(peer, frame)
+                        if payload is not None:
+                            await self._enqueue(payload)
+                for peer, ack in receiver.acks():
+                    await self.socket.send_multipart(
+                        [peer, ack], flags=zmq.NOBLOCK
+                    )
+            except zmq.error.ZMQError:
+                await asyncio.sleep(1e-4)
+
+
+class ReliableClient(Client):
+    """
+    Asynchronous version of :class:`pybeehive.socket.ReliableClient`.
+    Acks are received and timed out messages are sent again by a task,
+    and :meth:`send` waits while ``window`` messages wait for their acks.
+
+    :param address:
+    :param window:
+    :param ack_timeout:
+    :param linger:
+    :param sndhwm:
+    :param rcvhwm:
+    :param codec:
+    """
+    socket_type = zmq.DEALER
+
+    def __init__(self, address, window=10000, ack_timeout=0.2, linger=1.0,
+                 sndhwm=None, rcvhwm=None, codec=None):
+        super(ReliableClient, self).__init__(address, sndhwm, rcvhwm,
+                                             linger=linger, codec=codec)
+        self.sender = ReliableSender(window, ack_timeout)
+        self._backlog = deque()
+        self._ack_future = None
+
+    @property
+    def pending(self):
+        return len(self.sender)
+
+    def stats(self):
+        return {'depth': self.pending, 'dropped': 0, 'spilled': 0}
+
+    async def connect(self):
+        await super(ReliableClient, self).connect()
+        self._ack_future = asyncio.ensure_future(self._receive_acks())
+
+    async def send(self, data):
+        if self.codec is not None:
+            data = self.codec.encode(data)
+        while self.alive:
+            if not self.sender.full:
+                return await self._transmit(self.sender.wrap(data))
+            await asyncio.sleep(1e-3)
+
+    async def shutdown(self):
+        if self._ack_future is not None:
+            deadline = time.monotonic() + self.linger
+            while self.pending and time.monotonic() < deadline:
+                await asyncio.sleep(1e-3)
+            self.kill()
+            if not self._ack_future.done():
+                self._ack_future.cancel()
+        await super(ReliableClient, self).shutdown()
+
+    async def _receive_acks(self):
+        sender, backlog = self.sender, self._backlog
+        while self.alive:
+            resend = sender.due()
+            if resend:
+                backlog.clear()
+                backlog.extend(resend)
+            try:
+                await self._flush()
+                flags = zmq.POLLIN | zmq.POLLOUT if backlog else zmq.POLLIN
+                if await self.socket.poll(1, flags) & zmq.POLLIN:
+                    while True:
+                        try:
+                            sender.receive(
+                                await self.socket.recv(flags=zmq.NOBLOCK)
+                            )
+                        except zmq.Again:
+                            break
+            except zmq.error.ZMQError:
+                await asyncio.sleep(1e-4)
+
+    async def _transmit(self, frame):
+        self._backlog.append(frame)
+        await self._flush()
+
+    async def _flush(self):
+        # Frames wait in order while the socket is full, so that
+        # they do not leave gaps the receiver would have to drop
+        backlog = self._backlog
+        while backlog:
+            try:
+                await self.socket.send(backlog[0], flags=zmq.NOBLOCK)
+            except zmq.Again:
+                break
+            backlog.popleft()
+
+
+class ReplyServer(Server):
+    """
+    Asynchronous version of :class:`pybeehive.socket.ReplyServer`.
+
+    :param address:
+    :param tracker:
+    :param server_kwargs:
+    """
+    def __init__(self, address, tracker, **server_kwargs):
+        super(ReplyServer, self).__init__(address, **server_kwargs)
+        self.tracker = tracker
+
+    async def _enqueue(self, data):
+        id, result, error = pickle.loads(data)
+        self.tracker.complete(id, result, error)
+
 
 class SocketStreamer(Streamer):
-    def __init__(self, address, topic=None):
+    def __init__(self, address, topic=None, reliable=False, **server_kwargs):
         super(SocketStreamer, self).__init__(topic=topic)
-        self.server = Server(address)
+        self.server = (ReliableServer if reliable else Server)(
+            address, **server_kwargs
+        )
         self.server.kill_event = self.kill_event
 
     async def setup(self):
@@ -103,16 +364,20 @@ class SocketStreamer(Streamer):
                 msg = await gen.__anext__()
                 event = Event.fromstring(msg)
                 return Event(
-                    event.data, topic=self.topic, created_at=event.created_at
+                    event.data, topic=self.topic, created_at=event.created_at,
+                    request=event.request
                 )
 
         return AsyncGenerator(wrapped)
 
 
 class SocketListener(Listener):
-    def __init__(self, address, filters=None):
+    def __init__(self, address, filters=None, reliable=False,
+                 **client_kwargs):
         super(SocketListener, self).__init__(filters=filters)
-        self.client = Client(address)
+        self.reliable = reliable
+        self.client_kwargs = client_kwargs
+        self.client = self._create_client(address)
 
     async def setup(self):
         await self.client.connect()
@@ -120,9 +385,98 @@ class SocketListener(Listener):
     async def teardown(self):
         await self.client.shutdown()
 
+    def interrupt(self):
+        """
+        See :meth:`pybeehive.socket.SocketListener.interrupt`.
+
+        """
+        self.client.kill()
+
     async def on_event(self, event):
-        event = await self.parse_event(event)
-        await self.client.send(event.tostring())
+        result = await self.parse_event(event)
+        if result.request is None:
+            result.request = getattr(event, 'request', None)
+        await self._send(result)
 
     async def parse_event(self, event):
         return event  # pragma: nocover
+
+    def _create_client(self, address):
+        return (ReliableClient if self.reliable else Client)(
+            address, **self.client_kwargs
+        )
+
+    async def _send(self, event):
+        await self.client.send(event.tostring())
+
+
+def _topic(event):
+    return event.topic
+
+
+class PartitionedSocketListener(SocketListener):
+    """
+    Asynchronous version of
+    :class:`pybeehive.socket.PartitionedSocketListener`.
+
+    :param addresses:
+    :param filters:
+    :param key:
+    :param replicas:
+    :param reliable:
+    :param client_kwargs:
+    """
+    def __init__(self, addresses, filters=None, key=None, replicas=100,
+                 reliable=False, **client_kwargs):
+        super(SocketListener, self).__init__(filters=filters)
+        self.reliable = reliable
+        self.client_kwargs = client_kwargs
+        self.key = key or _topic
+        self.ring = HashRing(replicas=replicas)
+        self.clients = {}
+        self._connected = False
+        for address in addresses:
+            self.clients[address] = self._create_client(address)
+            self.ring.add(address)
+
+    async def setup(self):
+        await asyncio.gather(*[c.connect() for c in self.clients.values()])
+        self._connected = True
+
+    async def teardown(self):
+        clients, self.clients = list(self.clients.values()), {}
+        self._connected = False
+        await asyncio.gather(*[c.shutdown() for c in clients])
+
+    def interrupt(self):
+        for client in list(self.clients.values()):
+            client.kill()
+
+    async def add_node(self, address):
+        """
+
+        :param address:
+        """
+        if address in self.clients:
+            return
+        client = self._create_client(address)
+        if self._connected:
+            await client.connect()
+        self.clients[address] = client
+        self.ring.add(address)
+
+    async def remove_node(self, address):
+        """
+
+        :param address:
+        """
+        client = self.clients.pop(address, None)
+        self.ring.remove(address)
+        if client is not None:
+            # A send that waits for the node returns once it is killed
+            client.kill()
+            await client.shutdown()
+
+    async def _send(self, event):
+        client = self.clients[self.ring.get(self.key(event))]
+        await client.send(event.tostring())
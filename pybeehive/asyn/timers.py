@@ -0,0 +1,130 @@
+from collections import deque
+import asyncio
+import inspect
+
+from ..core import Event
+from ..timers import TimerHeap
+from .core import Streamer
+from .utils import AsyncGenerator
+
+
+class TimerStreamer(Streamer):
+    """
+    Streamer that serves any number of timers from a single task.
+    Timer functions can be coroutine functions.
+
+    :param topic:
+    :param poll_interval: maximum number of seconds to sleep between
+        checking for new timers
+    """
+    def __init__(self, topic=None, poll_interval=0.05):
+        super(TimerStreamer, self).__init__(topic=topic)
+        self.poll_interval = poll_interval
+        # Whether the timers are fired by a virtual clock
+        self.clock_driven = False
+        self.timers = []
+        self._heap = TimerHeap()
+
+    def add_timer(self, timer):
+        """
+
+        :param timer:
+        """
+        self.timers.append(timer)
+        self._heap.push(timer, self.clock.time())
+
+    def attach(self, virtual_clock):
+        """
+        Let a :class:`~pybeehive.clock.VirtualClock` fire the timers while
+        it advances, instead of the streamer's task. The events of timers
+        whose functions are coroutine functions are returned as awaitables.
+
+        :param virtual_clock:
+        """
+        self._reschedule()
+        self.clock_driven = True
+        virtual_clock.add_scheduler(self)
+
+    def detach(self, virtual_clock):
+        """
+
+        :param virtual_clock:
+        """
+        virtual_clock.remove_scheduler(self)
+        self.clock_driven = False
+
+    def next_due(self):
+        """
+
+        :return:
+        """
+        return self._heap.next_time()
+
+    def fire_due(self, now):
+        """
+        Fire the timers that are due and return their events.
+
+        :param now:
+        :return:
+        """
+        fired = []
+        for scheduled, timer in self._heap.pop_due(now):
+            try:
+                result = timer.func()
+            except Exception as e:
+                self.on_exception(e)
+                continue
+            if inspect.isawaitable(result):
+                fired.append(self._event_of(timer, result, now))
+            elif result is not None:
+                fired.append(Event(result, topic=timer.topic, created_at=now))
+        return fired
+
+    def stream(self):
+        pending = deque()
+        if not self.clock_driven:
+            self._reschedule()
+
+        async def next_event():
+            while self.alive:
+                if self.clock_driven:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                if pending:
+                    return pending.popleft()
+                now = self.clock.time()
+                for scheduled, timer in self._heap.pop_due(now):
+                    try:
+                        result = timer.func()
+                        if inspect.isawaitable(result):
+                            result = await result
+                    except Exception as e:
+                        self.on_exception(e)
+                    else:
+                        if result is not None:
+                            pending.append(Event(result, topic=timer.topic,
+                                                 created_at=now))
+                if not pending:
+                    delay = self._heap.delay(now)
+                    if delay is None or delay > self.poll_interval:
+                        delay = self.poll_interval
+                    await asyncio.sleep(delay)
+            raise StopAsyncIteration
+
+        return AsyncGenerator(next_event)
+
+    async def _event_of(self, timer, result, now):
+        try:
+            result = await result
+        except Exception as e:
+            self.on_exception(e)
+        else:
+            if result is not None:
+                return Event(result, topic=timer.topic, created_at=now)
+
+    def _reschedule(self):
+        # Timers added before the hive started are scheduled from the time
+        # of the clock the hive runs with, which may be a virtual clock
+        self._heap = TimerHeap()
+        for timer in self.timers:
+            self._heap.push(timer, self.clock.time())
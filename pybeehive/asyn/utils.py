@@ -1,4 +1,11 @@
 from functools import wraps
+import asyncio
+from ..spill import SpillBuffer
+from ..utils import ConflationBuffer, LaneBuffer, topic_of
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 
 class AsyncContextManager:
@@ -11,8 +18,10 @@ class AsyncContextManager:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if exc_val is not None:
             raise exc_type(exc_val).with_traceback(exc_tb)
-        else:
-            self.gen.aclose()
+        # AsyncGenerator based streams have nothing to close
+        aclose = getattr(self.gen, 'aclose', None)
+        if aclose is not None:
+            await aclose()
 
 
 class AsyncGenerator:
@@ -28,8 +37,155 @@ class AsyncGenerator:
         return await self.f(*self.args, **self.kwargs)
 
 
+def new_event_loop():
+    """
+    Create a new uvloop event loop if uvloop is installed,
+    otherwise fall back to the standard asyncio event loop.
+
+    :return:
+    """
+    if uvloop is not None:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
 def async_generator(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         return AsyncGenerator(f, *args, **kwargs)
     return decorated_function
+
+
+class Queue(asyncio.Queue):
+    """
+    :class:`asyncio.Queue` that can also put many items at once.
+    """
+
+    def put_many_nowait(self, items):
+        """
+        Put all items into the queue at once and wake waiting consumers.
+        A batch larger than ``maxsize`` is only put once the queue is empty.
+
+        :param items: iterable of items to put
+        """
+        items = list(items)
+        if not items:
+            return
+        if self._no_room_for(items):
+            raise asyncio.QueueFull
+        for item in items:
+            self._put(item)
+        self._unfinished_tasks += len(items)
+        self._finished.clear()
+        for _ in items:
+            self._wakeup_next(self._getters)
+
+    async def put_many(self, items):
+        """
+        Put all items into the queue at once, waiting for free space
+        if the queue is bounded and full.
+
+        :param items: iterable of items to put
+        """
+        items = list(items)
+        while self._no_room_for(items):
+            await asyncio.sleep(1e-3)
+        self.put_many_nowait(items)
+
+    def _no_room_for(self, items):
+        if self.maxsize <= 0:
+            return False
+        return self.maxsize - self.qsize() < min(len(items), self.maxsize)
+
+
+class ConflatingQueue(Queue):
+    """
+    Asynchronous version of :class:`pybeehive.utils.ConflatingQueue`.
+
+    :param key: function that returns the key of an event,
+        defaults to the topic of the event
+    :param maxsize: maximum number of distinct pending keys, 0 for unbounded
+    """
+    def __init__(self, key=None, maxsize=0, **kwargs):
+        self.key = key or topic_of
+        super(ConflatingQueue, self).__init__(maxsize, **kwargs)
+
+    @property
+    def conflated(self):
+        return self._queue.conflated
+
+    async def put(self, item):
+        if self._queue.is_pending(self.key(item)):
+            return self.put_nowait(item)
+        return await super(ConflatingQueue, self).put(item)
+
+    def put_nowait(self, item):
+        # Replacing a pending event takes no space, even when full
+        if not self._queue.is_pending(self.key(item)):
+            return super(ConflatingQueue, self).put_nowait(item)
+        self._put(item)
+        self._unfinished_tasks += 1
+        self._finished.clear()
+        self._wakeup_next(self._getters)
+
+    def _no_room_for(self, items):
+        keys = {self.key(item) for item in items}
+        return super(ConflatingQueue, self)._no_room_for(
+            [k for k in keys if not self._queue.is_pending(k)]
+        )
+
+    def _init(self, maxsize):
+        self._queue = ConflationBuffer(self.key)
+
+    def _put(self, item):
+        if self._queue.append(item) is not None:
+            self._unfinished_tasks -= 1
+
+
+class LaneQueue(Queue):
+    """
+    Asynchronous version of :class:`pybeehive.utils.LaneQueue`.
+
+    :param weights:
+    :param topic_priorities:
+    :param max_wait:
+    :param maxsize:
+    """
+    def __init__(self, weights=None, topic_priorities=None, max_wait=1.0,
+                 maxsize=0, **kwargs):
+        self._lane_args = (weights, topic_priorities, max_wait)
+        super(LaneQueue, self).__init__(maxsize, **kwargs)
+
+    def lengths(self):
+        return self._queue.lengths()
+
+    def _init(self, maxsize):
+        self._queue = LaneBuffer(*self._lane_args)
+
+
+class SpillQueue(Queue):
+    """
+    Asynchronous version of :class:`pybeehive.spill.SpillQueue`.
+
+    :param memory_limit:
+    :param directory:
+    :param segment_size:
+    """
+    def __init__(self, memory_limit=10000, directory=None,
+                 segment_size=8 * 2 ** 20, **kwargs):
+        self._spill_args = (memory_limit, directory, segment_size)
+        super(SpillQueue, self).__init__(**kwargs)
+
+    @property
+    def spilled(self):
+        return self._queue.spilled
+
+    @property
+    def on_disk(self):
+        return self._queue.on_disk
+
+    def close(self):
+        self._queue.close()
+
+    def _init(self, maxsize):
+        self._queue = SpillBuffer(*self._spill_args)
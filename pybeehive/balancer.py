@@ -0,0 +1,291 @@
+from collections import deque, OrderedDict
+from queue import Empty, Full, Queue
+from threading import Thread
+import struct
+import time
+import zmq
+from .core import Streamer, Listener, Event, Killable
+from .socket import set_hwm
+
+# Kind and number of credits of the frames workers send to the balancer
+_CREDIT = struct.Struct('>cI')
+GRANT = b'G'
+RESET = b'R'
+LEAVE = b'L'
+
+
+def credit_frame(kind, credits=0):
+    """
+
+    :param kind: :data:`GRANT`, :data:`RESET` or :data:`LEAVE`
+    :param credits:
+    :return:
+    """
+    return _CREDIT.pack(kind, credits)
+
+
+def decode_event(data, codec=None):
+    """
+    Decode the events in a frame of a balancer.
+
+    :param data:
+    :param codec: :class:`~pybeehive.codec.FrameCodec`
+    :return: list of events
+    """
+    payloads = [data] if codec is None else codec.decode(data)
+    return [Event.fromstring(p) for p in payloads]
+
+
+class Credits:
+    """
+    Credits that workers grant to a balancer, one per event they are ready
+    to take. Each event goes to the worker with the most credits, i.e. the
+    most free capacity, and ties go to the worker that waited the longest,
+    so a slow worker only receives work as fast as it frees up capacity.
+    """
+    def __init__(self):
+        self.available = 0
+        self._credits = OrderedDict()
+
+    def __len__(self):
+        return len(self._credits)
+
+    def __contains__(self, worker):
+        return worker in self._credits
+
+    def handle(self, worker, frame):
+        """
+        Update the credits of a worker from one of its credit frames.
+
+        :param worker: identity of the worker
+        :param frame:
+        """
+        kind, credits = _CREDIT.unpack(frame)
+        if kind == GRANT:
+            self.grant(worker, credits)
+        elif kind == RESET:
+            self.remove(worker)
+            self.grant(worker, credits)
+        elif kind == LEAVE:
+            self.remove(worker)
+
+    def grant(self, worker, credits):
+        """
+
+        :param worker:
+        :param credits: number of additional events the worker can take
+        """
+        self._credits[worker] = self._credits.get(worker, 0) + credits
+        self.available += credits
+
+    def take(self):
+        """
+        Use a credit of the worker with the most credits.
+
+        :return: identity of the worker
+        """
+        if not self.available:
+            raise LookupError("no worker has credits")
+        worker = max(self._credits, key=self._credits.get)
+        self._credits[worker] -= 1
+        self._credits.move_to_end(worker)
+        self.available -= 1
+        return worker
+
+    def remove(self, worker):
+        """
+        Forget a worker that left, with its credits.
+
+        :param worker:
+        """
+        self.available -= self._credits.pop(worker, 0)
+
+
+class BalancerListener(Listener, Killable):
+    """
+    Listener that distributes the events it receives across the
+    :class:`WorkerStreamer` of worker hives, which connect to its ROUTER
+    socket. Workers grant credits as they free up capacity and each event
+    is sent to the worker with the most credits, see :class:`Credits`.
+    A thread owns the socket; while no worker has credits, events wait in
+    a buffer, and the listener blocks once ``buffer_size`` events wait.
+
+    Events are delivered at most once, the events a worker holds when it
+    crashes are lost.
+
+    :param address:
+    :param filters:
+    :param buffer_size: maximum number of events that wait for credits
+    :param codec: :class:`~pybeehive.codec.FrameCodec` that encodes the
+        events
+    :param sndhwm:
+    :param rcvhwm:
+    """
+    def __init__(self, address, filters=None, buffer_size=1000, codec=None,
+                 sndhwm=None, rcvhwm=None):
+        Listener.__init__(self, filters=filters)
+        Killable.__init__(self)
+        self.address = address
+        self.codec = codec
+        self.credits = Credits()
+        # Number of events sent to workers, and resent after a worker left
+        self.sent = 0
+        self.rerouted = 0
+        self.context = zmq.Context()
+        self.socket = self.context.socket(zmq.ROUTER)
+        # Raise instead of silently dropping events for workers that left
+        self.socket.setsockopt(zmq.ROUTER_MANDATORY, 1)
+        set_hwm(self.socket, sndhwm, rcvhwm)
+        self._buffer = Queue(maxsize=buffer_size)
+        self._pending = deque()
+        self._balancer_thread = None
+
+    @property
+    def workers(self):
+        """
+        Number of connected workers.
+
+        :return:
+        """
+        return len(self.credits)
+
+    def setup(self):
+        self.socket.bind('tcp://%s:%s' % self.address)
+        self._balancer_thread = Thread(target=self._balance)
+        self._balancer_thread.start()
+
+    def teardown(self):
+        self.kill()
+        if self._balancer_thread is not None:
+            self._balancer_thread.join()
+        self.socket.close(linger=0)
+
+    def on_event(self, event):
+        result = self.parse_event(event)
+        data = result.tostring()
+        if self.codec is not None:
+            data = self.codec.encode(data)
+        while self.alive:
+            try:
+                return self._buffer.put(data, timeout=0.01)
+            except Full:
+                continue
+
+    def parse_event(self, event):
+        """
+
+        :param event:
+        :return:
+        """
+        return event  # pragma: nocover
+
+    def _balance(self):
+        credits, pending = self.credits, self._pending
+        while self.alive:
+            sent = 0
+            while credits.available:
+                if not pending:
+                    try:
+                        pending.append(self._buffer.get_nowait())
+                    except Empty:
+                        break
+                worker = credits.take()
+                try:
+                    self.socket.send_multipart([worker, pending[0]],
+                                               flags=zmq.NOBLOCK)
+                except zmq.ZMQError:
+                    # The worker left or is not keeping up, the event
+                    # goes to another worker
+                    credits.remove(worker)
+                    self.rerouted += 1
+                    continue
+                pending.popleft()
+                self.sent += 1
+                sent += 1
+            if self.socket.poll(0 if sent else 1, zmq.POLLIN):
+                while True:
+                    try:
+                        worker, frame = self.socket.recv_multipart(
+                            flags=zmq.NOBLOCK
+                        )
+                    except zmq.Again:
+                        break
+                    credits.handle(worker, frame)
+
+
+class WorkerStreamer(Streamer):
+    """
+    Streamer of a worker hive that receives events from a
+    :class:`BalancerListener`. It grants the balancer a credit for each
+    event the hive can take, keeping at most ``capacity`` events received
+    or queued in the hive, so a slow worker never builds up a backlog.
+    When no event arrived for ``refresh_interval`` seconds the credits are
+    granted again from scratch, which recovers the credits that were lost
+    when the balancer restarted.
+
+    :param address: address of the balancer
+    :param topic:
+    :param capacity: maximum number of events held by the worker
+    :param codec: :class:`~pybeehive.codec.FrameCodec` that decodes the
+        events
+    :param refresh_interval:
+    """
+    def __init__(self, address, topic=None, capacity=10, codec=None,
+                 refresh_interval=1.0):
+        super(WorkerStreamer, self).__init__(topic=topic)
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.address = address
+        self.capacity = capacity
+        self.codec = codec
+        self.refresh_interval = refresh_interval
+        self.received = 0
+        self.context = zmq.Context()
+        self.socket = self.context.socket(zmq.DEALER)
+
+    def setup(self):
+        self.socket.connect('tcp://%s:%s' % self.address)
+
+    def run(self):
+        try:
+            super(WorkerStreamer, self).run()
+        finally:
+            # ZeroMQ sockets are not thread safe, so the thread that
+            # streams from the socket also leaves and closes it
+            try:
+                self.socket.send(credit_frame(LEAVE), flags=zmq.NOBLOCK)
+            except zmq.ZMQError:
+                pass
+            self.socket.close(linger=100)
+
+    def stream(self):
+        outstanding, last_event = 0, None
+        while self.alive:
+            now = time.monotonic()
+            if last_event is None or now - last_event > self.refresh_interval:
+                outstanding = self._free(0)
+                self.socket.send(credit_frame(RESET, outstanding))
+                last_event = now
+            else:
+                free = self._free(outstanding)
+                # Grant in batches to keep the credit traffic low
+                if free >= max(1, self.capacity // 4):
+                    self.socket.send(credit_frame(GRANT, free))
+                    outstanding += free
+            if not self.socket.poll(10, zmq.POLLIN):
+                continue
+            while True:
+                try:
+                    data = self.socket.recv(flags=zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                last_event = time.monotonic()
+                for event in decode_event(data, self.codec):
+                    outstanding -= 1
+                    self.received += 1
+                    yield Event(event.data, topic=self.topic,
+                                created_at=event.created_at,
+                                request=event.request)
+
+    def _free(self, outstanding):
+        return max(0, self.capacity - outstanding - self._q.qsize())
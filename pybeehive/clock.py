@@ -0,0 +1,113 @@
+from threading import Condition
+import time as _time
+
+
+class WallClock:
+    """
+    Clock that follows the system time.
+    """
+    def time(self):
+        """
+        Return the current time in seconds since the epoch.
+
+        :return:
+        """
+        return _time.time()
+
+    def wait(self, event, timeout=None):
+        """
+        Wait until the event is set or the timeout passes.
+
+        :param event: :class:`threading.Event`
+        :param timeout: number of seconds to wait, or None to wait forever
+        :return: True if the event was set
+        """
+        return event.wait(timeout)
+
+
+class VirtualClock(WallClock):
+    """
+    Clock that only moves when it is advanced, e.g. by the hive to the
+    creation time of each event it dispatches. This lets time dependent
+    code such as timers and TTLs run against recorded events as fast as
+    they can be replayed, with results that do not depend on the wall clock.
+
+    Schedulers, such as the hive's timer streamer, can be added to the
+    clock. While the clock advances it stops at the time each of their
+    timers is due and collects the events the timers create, so that
+    timers fire at exactly the virtual time they are scheduled for.
+    A scheduler has a ``next_due()`` method that returns the time of its
+    next timer or None, and a ``fire_due(now)`` method that fires the due
+    timers and returns their events.
+
+    :param start: initial time of the clock
+    """
+    # Number of real seconds between checks of events that waiters wait on
+    poll_interval = 0.01
+
+    def __init__(self, start=0.0):
+        self._now = start
+        self._cond = Condition()
+        self._schedulers = []
+
+    def time(self):
+        return self._now
+
+    def add_scheduler(self, scheduler):
+        """
+
+        :param scheduler:
+        """
+        self._schedulers.append(scheduler)
+
+    def remove_scheduler(self, scheduler):
+        """
+
+        :param scheduler:
+        """
+        self._schedulers.remove(scheduler)
+
+    def advance(self, to):
+        """
+        Move the clock forward to a time, never backwards, firing the
+        timers of the schedulers that are due on the way.
+
+        :param to:
+        :return: list of the events created by the timers, in time order
+        """
+        fired = []
+        while self._schedulers:
+            due = [(s.next_due(), i) for i, s in enumerate(self._schedulers)]
+            due = [d for d in due if d[0] is not None and d[0] <= to]
+            if not due:
+                break
+            when, i = min(due)
+            self._move(when)
+            fired.extend(self._schedulers[i].fire_due(self._now))
+        self._move(to)
+        return fired
+
+    def advance_by(self, seconds):
+        """
+        Move the clock forward by a number of seconds.
+
+        :param seconds:
+        :return: list of the events created by the timers, in time order
+        """
+        return self.advance(self._now + seconds)
+
+    def _move(self, to):
+        if to > self._now:
+            with self._cond:
+                if to > self._now:
+                    self._now = to
+                    self._cond.notify_all()
+
+    def wait(self, event, timeout=None):
+        deadline = None if timeout is None else self._now + timeout
+        with self._cond:
+            while not event.is_set():
+                if deadline is not None and self._now >= deadline:
+                    return False
+                self._cond.wait(self.poll_interval)
+        return True
@@ -0,0 +1,332 @@
+from itertools import count
+from queue import Empty, Full
+from threading import Event as _Event, Lock, Thread
+import multiprocessing
+import os
+import time
+import traceback
+import zlib
+from .core import Listener, Streamer, Killable
+from .hive import Hive
+from .utils import Batch
+
+
+def _topic(event):
+    return event.topic
+
+
+def partition(key, partitions):
+    """
+    Stable partition of a key, which is the same in every process and run.
+
+    :param key:
+    :param partitions: number of partitions
+    :return: index of the partition
+    """
+    return zlib.crc32(str(key).encode()) % partitions
+
+
+class _Partitioner(Listener):
+    def __init__(self, queues, processes, key, batch_size, flush_interval):
+        super(_Partitioner, self).__init__()
+        self.queues = queues
+        self.processes = processes
+        self.key = key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Number of events that were dropped because their worker died
+        self.lost = 0
+        self._batches = [[] for _ in queues]
+        self._locks = [Lock() for _ in queues]
+        self._round_robin = count()
+        self._stopped = _Event()
+        self._flusher_thread = None
+
+    def setup(self):
+        self._flusher_thread = Thread(target=self._flush_periodically)
+        self._flusher_thread.start()
+
+    def teardown(self):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        if self._flusher_thread is not None:
+            self._flusher_thread.join()
+        for index in range(len(self.queues)):
+            with self._locks[index]:
+                self._flush(index)
+                # Tells the worker that no more events follow
+                self._put(index, None)
+
+    def on_event(self, event):
+        key = self.key(event)
+        if key is None:
+            index = next(self._round_robin) % len(self.queues)
+        else:
+            index = partition(key, len(self.queues))
+        with self._locks[index]:
+            batch = self._batches[index]
+            batch.append(event)
+            if len(batch) >= self.batch_size:
+                self._flush(index)
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.flush_interval):
+            for index in range(len(self.queues)):
+                with self._locks[index]:
+                    self._flush(index)
+
+    def _flush(self, index):
+        batch = self._batches[index]
+        if batch:
+            self._batches[index] = []
+            self._put(index, batch)
+
+    def _put(self, index, batch):
+        queue, process = self.queues[index], self.processes[index]
+        while process.is_alive():
+            try:
+                return queue.put(batch, timeout=0.1)
+            except Full:
+                continue
+        if batch is not None:
+            self.lost += len(batch)
+
+
+class _WorkerStreamer(Streamer):
+    def __init__(self, index, queue, counters):
+        super(_WorkerStreamer, self).__init__()
+        self.index = index
+        self.queue = queue
+        self.counters = counters
+        self.done = _Event()
+
+    def stream(self):
+        try:
+            while self.alive:
+                try:
+                    events = self.queue.get(timeout=0.01)
+                except Empty:
+                    continue
+                if events is None:
+                    break
+                self.counters[self.index] += len(events)
+                yield Batch(events)
+        finally:
+            self.kill()
+            self.done.set()
+
+
+def _format_setup_errors(errors):
+    return ''.join(
+        "%s failed to set up:\n%s" % (bee, ''.join(
+            traceback.format_exception(type(e), e, e.__traceback__)
+        )) for bee, e in errors
+    )
+
+
+def _work(index, factory, queue, counters, status):
+    try:
+        hive = factory()
+        streamer = _WorkerStreamer(index, queue, counters)
+        hive.add(streamer)
+    except Exception:
+        status.put((index, traceback.format_exc()))
+        return
+    thread = hive.run(threaded=True)
+    # The worker is ready once the bees of its hive are set up
+    while not hive.live.wait(0.01) and thread.is_alive():
+        continue
+    if not hive.live.is_set() or hive.setup_errors:
+        status.put((index, _format_setup_errors(hive.setup_errors)
+                    or "worker hive stopped while setting up"))
+        hive.close()
+        thread.join()
+        return
+    status.put((index, None))
+    try:
+        streamer.done.wait()
+        # Dispatch the events that are still queued before closing
+        hive.drain()
+    finally:
+        hive.close()
+        thread.join()
+
+
+class HiveCluster(Killable):
+    """
+    Runs a hive in each of ``processes`` worker processes, so that events
+    are handled on all cores rather than under a single GIL. The worker
+    hives are created by ``factory`` and the streamers of the parent hive,
+    :attr:`hive`, feed them: each event goes to the worker of the partition
+    of its key, so the events of a key are handled in order by one worker,
+    and events without a key are spread round-robin. Events are sent to the
+    workers in batches over multiprocessing queues.
+
+    The cluster runs the parent hive once every worker hive is set up, and
+    after the parent hive closed, the workers handle the events that they
+    received before they close.
+
+    :param factory: callable that returns a :class:`~pybeehive.Hive` with
+        the listeners of a worker, which must be picklable unless processes
+        are forked
+    :param processes: number of worker processes, by default one per core
+    :param key: callable that returns the partition key of an event,
+        by default its topic
+    :param hive: parent hive to add the streamers to, by default a new hive
+    :param batch_size: maximum number of events sent to a worker at once
+    :param queue_size: maximum number of batches queued for each worker
+    :param flush_interval: number of seconds after which a partial batch
+        is sent
+    :param start_method: multiprocessing start method, e.g. ``'spawn'``
+    :param start_timeout: number of seconds to wait for the workers to
+        set up
+    """
+    def __init__(self, factory, processes=None, key=None, hive=None,
+                 batch_size=100, queue_size=100, flush_interval=0.005,
+                 start_method=None, start_timeout=10):
+        super(HiveCluster, self).__init__()
+        self.factory = factory
+        self.processes = processes or os.cpu_count() or 1
+        self.key = key or _topic
+        self.hive = hive if hive is not None else Hive()
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.start_timeout = start_timeout
+        self.context = multiprocessing.get_context(start_method)
+        self.workers = []
+        self._counters = None
+        self._partitioner = None
+        self._started_at = None
+        self._stopped_at = None
+
+    @property
+    def lost(self):
+        """
+        Number of events that were dropped because their worker died.
+
+        :return:
+        """
+        return self._partitioner.lost if self._partitioner else 0
+
+    def add(self, *streamers):
+        """
+
+        :param streamers:
+        """
+        self.hive.add(*streamers)
+
+    def submit_event(self, event, priority=None):
+        """
+
+        :param event:
+        :param priority:
+        """
+        self.hive.submit_event(event, priority)
+
+    def submit_events(self, events):
+        """
+
+        :param events:
+        """
+        self.hive.submit_events(events)
+
+    def stats(self):
+        """
+        Return the number of events that each worker received and its
+        throughput since the cluster started.
+
+        :return: list of dicts with the ``worker`` index, ``pid``,
+            ``alive``, ``events`` and ``throughput`` in events per second
+        """
+        if self._started_at is None:
+            return []
+        elapsed = (self._stopped_at or time.monotonic()) - self._started_at
+        return [{
+            'worker': index,
+            'pid': process.pid,
+            'alive': process.is_alive(),
+            'events': self._counters[index],
+            'throughput': self._counters[index] / elapsed if elapsed else 0.0,
+        } for index, process in enumerate(self.workers)]
+
+    def run(self, threaded=False, debug=False):
+        """
+
+        :param threaded:
+        :param debug:
+        :return:
+        """
+        if threaded:
+            worker = Thread(target=self._run, args=(debug,))
+            worker.start()
+            return worker
+        else:
+            self._run(debug)
+
+    def close(self):
+        """
+
+        :return:
+        """
+        self.kill()
+        self.hive.close()
+
+    def _run(self, debug=False):
+        queues = self._start_workers()
+        self._partitioner = _Partitioner(queues, self.workers, self.key,
+                                         self.batch_size, self.flush_interval)
+        self.hive.add(self._partitioner)
+        try:
+            if self.alive:
+                self.hive.run(debug=debug)
+        finally:
+            self._stop_workers()
+
+    def _start_workers(self):
+        self._counters = self.context.Array('Q', self.processes, lock=False)
+        status = self.context.Queue()
+        queues = [self.context.Queue(self.queue_size)
+                  for _ in range(self.processes)]
+        self.workers = [
+            self.context.Process(target=_work, args=(
+                index, self.factory, queue, self._counters, status
+            )) for index, queue in enumerate(queues)
+        ]
+        for process in self.workers:
+            process.start()
+        ready, deadline = 0, time.monotonic() + self.start_timeout
+        try:
+            while ready < self.processes:
+                try:
+                    index, error = status.get(
+                        timeout=max(0, deadline - time.monotonic())
+                    )
+                except Empty:
+                    raise RuntimeError("worker hives did not set up within "
+                                       "%s seconds" % self.start_timeout)
+                if error is not None:
+                    raise RuntimeError("worker hive %d failed to set up:\n%s"
+                                       % (index, error))
+                ready += 1
+        except BaseException:
+            for process in self.workers:
+                process.terminate()
+                process.join()
+            raise
+        self.hive.logger.info("%d worker hives are live", self.processes)
+        self._started_at, self._stopped_at = time.monotonic(), None
+        return queues
+
+    def _stop_workers(self):
+        # The partitioner was not torn down if the parent hive failed
+        self._partitioner.teardown()
+        for process in self.workers:
+            process.join()
+        self._stopped_at = time.monotonic()
+        for stats in self.stats():
+            self.hive.logger.info(
+                "worker %(worker)d handled %(events)d events at "
+                "%(throughput).0f events/s", stats
+            )
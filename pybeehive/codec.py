@@ -0,0 +1,117 @@
+import struct
+import zlib
+try:
+    import lzma
+# Python can be built without lzma
+except ImportError:  # pragma: nocover
+    lzma = None  # pragma: nocover
+
+# The low bits of the flag byte are the compression of the frame
+NONE, ZLIB, LZMA = 0, 1, 2
+_COMPRESSION_MASK = 0x0f
+# Set when the frame holds many length-prefixed payloads
+BATCH = 0x80
+_LENGTH = struct.Struct('>I')
+
+
+class FrameCodec:
+    """
+    Encodes the messages of socket bees into frames that start with a flag
+    byte. Payloads of at least ``threshold`` bytes are compressed with zlib
+    or lzma, unless that would not make them smaller, and the flag byte
+    tells the receiving codec how to decompress each frame, so a receiving
+    codec decodes frames of every compression. Batches of payloads are
+    encoded into a single frame and compressed as a whole, which
+    compresses small similar payloads much better than one at a time.
+
+    :param compression: None, ``'zlib'`` or ``'lzma'``
+    :param threshold: minimum number of bytes of a payload or batch
+        before it is compressed
+    :param level: compression level, or preset of lzma
+    """
+    compressions = {None: NONE, 'zlib': ZLIB, 'lzma': LZMA}
+
+    def __init__(self, compression=None, threshold=1024, level=None):
+        if compression not in self.compressions:
+            raise ValueError("compression must be None, 'zlib' or 'lzma', "
+                             "not %r" % compression)
+        if compression == 'lzma' and lzma is None:
+            raise ValueError("lzma is not available")  # pragma: nocover
+        self.compression = compression
+        self.threshold = threshold
+        self.level = level
+        # Bytes before and after encoding, for monitoring the savings
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+
+    @property
+    def ratio(self):
+        """
+        Number of bytes sent per byte of payload.
+
+        :return:
+        """
+        return self.wire_bytes / self.raw_bytes if self.raw_bytes else 1.0
+
+    def encode(self, payload):
+        """
+
+        :param payload: bytes
+        :return: frame
+        """
+        return self._encode(0, payload)
+
+    def encode_batch(self, payloads):
+        """
+        Encode many payloads into one frame.
+
+        :param payloads: list of bytes
+        :return: frame
+        """
+        parts = []
+        for payload in payloads:
+            parts.append(_LENGTH.pack(len(payload)))
+            parts.append(payload)
+        return self._encode(BATCH, b''.join(parts))
+
+    def decode(self, frame):
+        """
+
+        :param frame:
+        :return: list of the payloads in the frame
+        """
+        flags = frame[0]
+        body = frame[1:]
+        compression = flags & _COMPRESSION_MASK
+        if compression == ZLIB:
+            body = zlib.decompress(body)
+        elif compression == LZMA:
+            body = lzma.decompress(body)
+        elif compression != NONE:
+            raise ValueError("unknown compression %d" % compression)
+        if not flags & BATCH:
+            return [body]
+        payloads, offset = [], 0
+        while offset < len(body):
+            length, = _LENGTH.unpack_from(body, offset)
+            offset += _LENGTH.size
+            payloads.append(body[offset:offset + length])
+            offset += length
+        return payloads
+
+    def _encode(self, flags, body):
+        self.raw_bytes += len(body)
+        if self.compression is not None and len(body) >= self.threshold:
+            compressed = self._compress(body)
+            if len(compressed) < len(body):
+                flags |= self.compressions[self.compression]
+                body = compressed
+        self.wire_bytes += 1 + len(body)
+        return bytes((flags,)) + body
+
+    def _compress(self, body):
+        if self.compression == 'zlib':
+            if self.level is None:
+                return zlib.compress(body)
+            return zlib.compress(body, self.level)
+        return lzma.compress(body, preset=self.level)
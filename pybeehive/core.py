@@ -2,6 +2,11 @@ import pickle
 from abc import ABC, abstractmethod
 from threading import Event as _Event
 from time import time
+from .clock import WallClock
+from .predicates import Predicate
+from .restart import RestartPolicy
+from .topics import TopicTrie
+from .utils import Batch
 
 
 class Event:
@@ -10,10 +15,32 @@ class Event:
     :param data:
     :param topic:
     :param created_at:
+    :param ttl: number of seconds after created_at that the event is worth
+        dispatching, see :class:`~pybeehive.shedding.LoadShedder`
+    :param priority: priority of the event, events with higher priorities
+        are dispatched first by a :class:`~pybeehive.utils.LaneQueue`
+    :param request: :class:`~pybeehive.rpc.Request` that the result of the
+        event resolves, see :meth:`pybeehive.Hive.request`
     """
-
-    def __init__(self, data, topic=None, created_at=None):
+    ttl = None
+    priority = None
+    request = None
+
+    def __init__(self, data, topic=None, created_at=None, ttl=None,
+                 priority=None, request=None):
+        if ttl is not None:
+            self.ttl = ttl
+        if priority is not None:
+            self.priority = priority
+        if request is not None:
+            self.request = request
         if isinstance(data, Event):
+            if ttl is None and data.ttl is not None:
+                self.ttl = data.ttl
+            if priority is None and data.priority is not None:
+                self.priority = data.priority
+            if request is None and data.request is not None:
+                self.request = data.request
             self.data = data.data
             self.topic = topic or data.topic
             if created_at:
@@ -71,18 +98,88 @@ class Event:
         return pickle.dumps(self)
 
 
+class _Counter:
+    def __init__(self):
+        self.value = 0
+
+
+# Number of times any listener was chained, which lets listener trees know
+# when their cached structure is stale. This is not a class attribute of
+# Listener because setting those invalidates the cache of every subclass.
+chain_counter = _Counter()
+
+
+class _FilterSet(set):
+    # Set of filters that recompiles the matchers of its listener whenever
+    # it is changed in place
+    def __init__(self, filters, on_change):
+        super(_FilterSet, self).__init__(filters)
+        self._on_change = on_change
+
+    def _changed(method):
+        def changed(self, *args):
+            result = method(self, *args)
+            self._on_change()
+            return result
+        changed.__name__ = method.__name__
+        return changed
+
+    add = _changed(set.add)
+    discard = _changed(set.discard)
+    remove = _changed(set.remove)
+    pop = _changed(set.pop)
+    clear = _changed(set.clear)
+    update = _changed(set.update)
+    difference_update = _changed(set.difference_update)
+    intersection_update = _changed(set.intersection_update)
+    symmetric_difference_update = _changed(set.symmetric_difference_update)
+    __ior__ = _changed(set.__ior__)
+    __iand__ = _changed(set.__iand__)
+    __isub__ = _changed(set.__isub__)
+    __ixor__ = _changed(set.__ixor__)
+    del _changed
+
+
 class Listener(ABC):
     """
+    Filters are matched against the topic of each event, and can be exact
+    topics or :class:`~pybeehive.topics.Pattern` instances with ``*`` and
+    ``#`` wildcards. Filters can also be
+    :class:`~pybeehive.predicates.Predicate` instances that test the data of
+    each event. An event is accepted if its topic matches any of the topic
+    filters and its data matches all of the predicates.
 
     :param filters:
     """
+    # Shared evaluator of predicates, set by the hive the listener runs in
+    predicate_index = None
+
     def __init__(self, filters=None):
         super(Listener, self).__init__()
         self.chained_bees = []
-        self.filters = set(filters or [])
+        self.filters = filters
+
+    @property
+    def filters(self):
+        return self._filters
+
+    @filters.setter
+    def filters(self, filters):
+        self._filters = _FilterSet(filters or [], self._compile_filters)
+        self._compile_filters()
+
+    def _compile_filters(self):
+        self._predicates = tuple(
+            f for f in self._filters if isinstance(f, Predicate)
+        )
+        self._topics = TopicTrie(
+            f for f in self._filters if not isinstance(f, Predicate)
+        )
 
     def __str__(self):
-        return "%s(filters=%s)" % (self.__class__.__name__, self.filters)
+        return "%s(filters=%s)" % (
+            self.__class__.__name__, set(self.filters)
+        )
 
     def chain(self, bee):
         """
@@ -96,6 +193,7 @@ class Listener(ABC):
                 other.chain(bee)
         else:
             self.chained_bees.append(bee)
+            chain_counter.value += 1
         return bee
 
     def filter(self, event):
@@ -105,7 +203,14 @@ class Listener(ABC):
         :return:
         """
         # If no filters are defined then listens to all events
-        return not self.filters or event.topic in self.filters
+        if not self._filters:
+            return True
+        if self._topics and not self._topics.match(event.topic):
+            return False
+        index = self.predicate_index
+        if index is None:
+            return all(p.evaluate(event) for p in self._predicates)
+        return all(index.evaluate(p, event) for p in self._predicates)
 
     def notify(self, event):
         """
@@ -114,14 +219,20 @@ class Listener(ABC):
         :return:
         """
         if event and self.filter(event):
+            request = getattr(event, 'request', None)
             try:
                 result = self.on_event(event)
                 if result is not None:
-                    event = Event(result)
+                    event = Event(result, request=request)
                     # Only propagate events that this listener can accept
                     for bee in self.chained_bees:
                         bee.notify(event)
+                    # Results at the end of a chain answer requests
+                    if request is not None and not self.chained_bees:
+                        request.resolve(result)
             except Exception as e:
+                if request is not None:
+                    request.fail(e)
                 self.on_exception(e)
 
         if not event:
@@ -186,11 +297,19 @@ class Streamer(Killable, ABC):
     """
 
     :param topic:
+    :param restart_policy: :class:`~pybeehive.restart.RestartPolicy` that
+        decides when the stream is restarted after it fails or is exhausted
     """
-    def __init__(self, topic=None):
+    restart_policy = RestartPolicy()
+
+    def __init__(self, topic=None, restart_policy=None):
         super(Streamer, self).__init__()
         self.topic = topic
+        self.restarts = 0
+        if restart_policy is not None:
+            self.restart_policy = restart_policy
         self._q = None  # this is set when a streamer is added to a hive
+        self.clock = WallClock()  # this is set to the clock of the hive
 
     def __str__(self):
         return "%s(topic=%s)" % (self.__class__.__name__, self.topic)
@@ -234,15 +353,56 @@ class Streamer(Killable, ABC):
 
         """
         self._assert_queue_is_set()
+        failures = 0
         while self.alive:
+            streamed, exhausted = False, True
             try:
                 for data in self.stream():
-                    self._q.put(Event(data, topic=self.topic))
+                    streamed = True
+                    self._put(data)
                     # break long running streams if the kill event is set
                     if not self.alive:
                         break
             except Exception as e:
+                exhausted = False
                 self.on_exception(e)
+            if not self.alive:
+                break
+            failures = 0 if streamed else failures + 1
+            delay = self._next_restart_delay(failures, exhausted)
+            if delay:
+                self.kill_event.wait(delay)
+
+    def _next_restart_delay(self, failures, exhausted):
+        delay = self.restart_policy.next_delay(failures, exhausted)
+        if delay is None:
+            self.kill()
+        else:
+            self.restarts += 1
+        return delay
+
+    def _put(self, data):
+        if isinstance(data, Batch):
+            self._put_batch(data)
+        else:
+            self._q.put(self._create_event(data, self.clock.time()))
+
+    def _create_event(self, data, now):
+        # Events that were streamed keep their creation time
+        if isinstance(data, Event):
+            return Event(data, topic=self.topic)
+        return Event(data, topic=self.topic, created_at=now)
+
+    def _put_batch(self, batch):
+        now = self.clock.time()
+        events = [self._create_event(data, now) for data in batch]
+        try:
+            put_many = self._q.put_many
+        except AttributeError:
+            for event in events:
+                self._q.put(event)
+        else:
+            put_many(events)
 
     def _assert_queue_is_set(self):
         assert self._q is not None, \
@@ -1,47 +1,113 @@
 import inspect
 from collections import defaultdict
 from contextlib import contextmanager
-# from .utils import Queue  # TODO: Optimize queue
-from queue import Queue
 from queue import Empty
-from threading import Thread
-from .core import Listener, Streamer, Event, Killable
+from threading import Event as _Event, Thread
+from time import monotonic, sleep, time
+from .actors import ActorListener
+from .clock import WallClock
+from .core import Listener, Streamer, Event, Killable, chain_counter
 from .logging import create_logger, debug_handler, default_handler
+from .multiplex import IOStreamer, Multiplexer
+from .predicates import PredicateIndex
+from .rpc import RequestTracker
+from .timers import TimerStreamer, Interval, Cron, Once
+from .utils import Queue
 try:
-    from .socket import SocketListener, SocketStreamer
+    from .socket import SocketListener, SocketStreamer, ReplyServer
 # This is tested, just not by patching imports
 except ImportError:  # pragma: nocover
     SocketListener, SocketStreamer = None, None  # pragma: nocover
+    ReplyServer = None  # pragma: nocover
 
 
-def _loop(event_queue, listeners, kill_event):
+def _loop(event_queue, listeners, kill_event, shedder=None, clock=None,
+          requests=None):
+    # A virtual clock follows the creation time of the dispatched events
+    advance = getattr(clock, 'advance', None)
+    now = getattr(clock, 'time', time)
     while not kill_event.is_set():
+        if requests is not None:
+            requests.expire()
         # Timeout on get and Empty catch ensure threads
         # are not waiting forever for an item in the queue
         try:
             event = event_queue.get(timeout=0.001)
-            for bee in listeners:
-                bee.notify(event)
         except Empty:
             continue
         except KeyboardInterrupt:
             break
+        if requests is not None and event.request is not None:
+            # Requests from other hives are answered by this hive
+            requests.adopt(event.request)
+        try:
+            if advance is not None:
+                # Dispatch the events of the timers that were due first
+                for fired in advance(event.created_at):
+                    for bee in listeners.compile():
+                        bee.notify(fired)
+            if shedder is not None and shedder.should_drop(event, now()):
+                continue
+            for bee in listeners.compile():
+                bee.notify(event)
+        except KeyboardInterrupt:
+            break
+        finally:
+            # Lets queues such as the JournalQueue acknowledge the event
+            event_queue.task_done()
 
 
 class Hive(Killable):
     """
 
+    :param io_workers: number of threads used to read ready IOStreamers,
+        or 0 to read them on the multiplexer thread
+    :param queue: event queue to use instead of an unbounded FIFO queue,
+        e.g. a :class:`~pybeehive.utils.ConflatingQueue`
+    :param shedder: :class:`~pybeehive.shedding.LoadShedder` that drops
+        expired events, and sheds events under overload, before dispatch
+    :param clock: :class:`~pybeehive.clock.WallClock` or
+        :class:`~pybeehive.clock.VirtualClock` that the events of the hive's
+        streamers, its timers and load shedding use, by default a
+        :class:`~pybeehive.clock.WallClock`
+    :param max_requests: maximum number of outstanding requests,
+        see :meth:`request`
+    :param reply_address: address of the server that receives the results
+        of requests from other hives, or None to only answer requests
+        within the hive
     """
     _listener_class = Listener
+    _actor_listener_class = ActorListener
     _streamer_class = Streamer
     _socket_listener_class = SocketListener
     _socket_streamer_class = SocketStreamer
-
-    def __init__(self):
+    _timer_streamer_class = TimerStreamer
+    _multiplexer_class = Multiplexer
+    _io_streamer_class = IOStreamer
+    _request_tracker_class = RequestTracker
+    _reply_server_class = ReplyServer
+
+    def __init__(self, io_workers=0, queue=None, shedder=None, clock=None,
+                 max_requests=1000, reply_address=None):
+        if reply_address is not None and self._reply_server_class is None:
+            raise RuntimeError("replies from other hives require pyzmq")
         super(Hive, self).__init__()
+        self.shedder = shedder
+        self.clock = clock if clock is not None else WallClock()
+        self.requests = self._request_tracker_class(max_requests,
+                                                    reply_address)
+        self.reply_address = reply_address
+        self._reply_server = None
         self.streamers = []
         self.listeners = _ListenerTree()
-        self._event_queue = Queue()
+        self.io_workers = io_workers
+        self._event_queue = queue if queue is not None else Queue()
+        self._timer_streamer = None
+        self._multiplexer = None
+        # Set while the bees are set up and the hive dispatches events
+        self.live = _Event()
+        # Bees whose setup raised an exception, with the exception
+        self.setup_errors = []
 
         self.logger = create_logger(handler=default_handler)
 
@@ -61,11 +127,13 @@ class Hive(Killable):
                 bee.set_queue(self._event_queue)
                 self.streamers.append(bee)
 
-    def listener(self, chain=None, filters=None, **kwargs):
+    def listener(self, chain=None, filters=None, inbox=None, **kwargs):
         """
 
         :param chain:
         :param filters:
+        :param inbox: :class:`~pybeehive.utils.Inbox` to run the listener as
+            an :class:`~pybeehive.actors.ActorListener` on its own thread
         :param kwargs:
         :return:
         """
@@ -81,6 +149,13 @@ class Hive(Killable):
                     filters = [filters]
                 self.listeners.validate_filters(filters)
 
+            if inbox is not None:
+                if self._actor_listener_class is None:
+                    raise TypeError("%s does not support listener inboxes"
+                                    % self.__class__.__name__)
+                kwargs.update(klass=self._actor_listener_class,
+                              klass_args=(inbox,))
+
             def wrapper(f):
                 self._create_listener(f, chain, filters, **kwargs)
             return wrapper
@@ -103,12 +178,92 @@ class Hive(Killable):
                 self._create_streamer(f, topic=topic, **kwargs)
             return wrapper
 
-    def socket_listener(self, address, chain=None, filters=None):
+    def interval(self, seconds, topic=None, jitter=0):
+        """
+        Decorator that calls the function every ``seconds`` seconds.
+        Results other than None are submitted to the hive as events.
+
+        :param seconds:
+        :param topic:
+        :param jitter:
+        :return:
+        """
+        def wrapper(f):
+            self.add_timer(Interval(f, seconds, topic=topic, jitter=jitter))
+        return wrapper
+
+    def cron(self, expression, topic=None, jitter=0):
+        """
+        Decorator that calls the function at the times matched by a
+        cron expression. Results other than None are submitted to the
+        hive as events.
+
+        :param expression:
+        :param topic:
+        :param jitter:
+        :return:
+        """
+        def wrapper(f):
+            self.add_timer(Cron(f, expression, topic=topic, jitter=jitter))
+        return wrapper
+
+    def once(self, delay=0, topic=None):
+        """
+        Decorator that calls the function once, ``delay`` seconds after
+        the hive starts. A result other than None is submitted to the
+        hive as an event.
+
+        :param delay:
+        :param topic:
+        :return:
+        """
+        def wrapper(f):
+            self.add_timer(Once(f, delay, topic=topic))
+        return wrapper
+
+    def add_timer(self, timer):
+        """
+        Add a timer to the hive. All timers of a hive are served by a
+        single streamer, instead of a thread per timer.
+
+        :param timer:
+        """
+        if timer.topic:
+            self.listeners.validate_filters([timer.topic])
+        if self._timer_streamer is None:
+            self._timer_streamer = self._timer_streamer_class()
+            self.add(self._timer_streamer)
+        self._timer_streamer.add_timer(timer)
+
+    def io_streamer(self, fileobj, topic=None):
+        """
+        Decorator for a generator function that is called every time
+        ``fileobj`` becomes readable, and yields the available data
+        without blocking. IO streamers share a single multiplexer thread
+        instead of running in a thread each.
+
+        :param fileobj:
+        :param topic:
+        :return:
+        """
+        def wrapped(f):
+            return self.streamer(
+                topic=topic, klass=self._io_streamer_class,
+                klass_args=(fileobj,)
+            )(f)
+        return wrapped
+
+    def socket_listener(self, address, chain=None, filters=None,
+                        reliable=False, **client_kwargs):
         """
 
         :param address:
         :param chain:
         :param filters:
+        :param reliable: deliver every event at least once to a reliable
+            socket streamer
+        :param client_kwargs: keyword arguments of the socket client, e.g.
+            ``sndhwm``, ``buffer_size`` and ``overflow``
         :return:
         """
         if self._socket_listener_class is None:
@@ -118,15 +273,20 @@ class Hive(Killable):
             return self.listener(
                 chain=chain, filters=filters,
                 klass=self._socket_listener_class, klass_args=(address,),
+                klass_kwargs=dict(client_kwargs, reliable=reliable),
                 method_name='parse_event'
             )(f)
         return wrapped
 
-    def socket_streamer(self, address, topic=None):
+    def socket_streamer(self, address, topic=None, reliable=False,
+                        **server_kwargs):
         """
 
         :param address:
         :param topic:
+        :param reliable: receive from reliable socket listeners
+        :param server_kwargs: keyword arguments of the socket server, e.g.
+            ``rcvhwm``
         :return:
         """
         if self._socket_streamer_class is None:
@@ -136,19 +296,79 @@ class Hive(Killable):
             return self.streamer(
                 topic=topic,
                 klass=self._socket_streamer_class, klass_args=(address,),
+                klass_kwargs=dict(server_kwargs, reliable=reliable),
                 method_name=None
             )(f)
         return wrapped
 
-    def submit_event(self, event):
+    def submit_event(self, event, priority=None):
         """
 
         :param event:
+        :param priority: priority to dispatch the event with,
+            see :class:`~pybeehive.utils.LaneQueue`
         :return:
         """
         assert isinstance(event, Event), "Can only submit Events to the Hive"
+        if priority is not None:
+            event.priority = priority
         self._event_queue.put_nowait(event)
 
+    def request(self, event, timeout=None, priority=None):
+        """
+        Submit an event and return a future of its result, which is the
+        first result that a listener at the end of a chain returns for it.
+        The future fails with the first exception a listener raises, or
+        with a timeout error after ``timeout`` seconds.
+
+        :param event:
+        :param timeout: number of seconds to wait for the result
+        :param priority: priority to dispatch the event with
+        :return: :class:`concurrent.futures.Future`
+        """
+        assert isinstance(event, Event), "Can only submit Events to the Hive"
+        event.request = self.requests.create(timeout)
+        try:
+            self.submit_event(event, priority)
+        except Exception as e:
+            event.request.fail(e)
+            raise
+        return event.request.future
+
+    def submit_events(self, events):
+        """
+        Submit many events at once. The events are put into the event
+        queue atomically and the dispatcher is only woken up once.
+
+        :param events: iterable of Events
+        """
+        events = list(events)
+        assert all(isinstance(e, Event) for e in events), \
+            "Can only submit Events to the Hive"
+        self._event_queue.put_many_nowait(events)
+
+    def drain(self, timeout=None):
+        """
+        Wait until the events that were queued have been dispatched, e.g.
+        before closing the hive. Must be called from another thread than
+        the hive's dispatcher.
+
+        :param timeout: maximum number of seconds to wait, or None to wait
+            until the queue is drained or the hive stops
+        :return: True if the queued events were dispatched
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        queue = self._event_queue
+        while not self.kill_event.is_set():
+            # Queues that track tasks count the event being dispatched
+            pending = getattr(queue, 'unfinished_tasks', None)
+            if not (queue.qsize() if pending is None else pending):
+                return True
+            if deadline is not None and monotonic() >= deadline:
+                return False
+            sleep(1e-3)
+        return False
+
     def run(self, threaded=False, debug=False):
         """
 
@@ -173,71 +393,148 @@ class Hive(Killable):
         self.kill()
         for streamer in self.streamers:
             streamer.kill()
+        # The dispatcher may be waiting for a peer that is gone
+        if self._socket_listener_class is not None:
+            for bee in self.listeners.flatten():
+                if isinstance(bee, self._socket_listener_class):
+                    bee.interrupt()
 
     def _wrap_stream(self, stream_func):
         return lambda s: stream_func()
 
     def _create_listener(self, func, chain=None, filters=None,
-                         klass=None, klass_args=(), method_name='on_event'):
+                         klass=None, klass_args=(), klass_kwargs=None,
+                         method_name='on_event'):
 
         _Listener = type(func.__name__, (klass or self._listener_class,), {
             method_name: lambda s, e: func(e)
         })
         self.listeners.add_listener(
-            _Listener(*klass_args, filters=filters), chain=chain
+            _Listener(*klass_args, filters=filters, **(klass_kwargs or {})),
+            chain=chain
         )
 
-    def _create_streamer(self, func, topic=None,
-                         klass=None, klass_args=(), method_name='stream'):
+    def _create_streamer(self, func, topic=None, restart_policy=None,
+                         klass=None, klass_args=(), klass_kwargs=None,
+                         method_name='stream'):
         if method_name == 'stream':
             klass_dict = {method_name: self._wrap_stream(func)}
         else:
             klass_dict = {}
         klass = klass or self._streamer_class
         _Streamer = type(func.__name__, (klass,), klass_dict)
-        self.add(_Streamer(*klass_args, topic=topic))
+        streamer = _Streamer(*klass_args, topic=topic, **(klass_kwargs or {}))
+        if restart_policy is not None:
+            streamer.restart_policy = restart_policy
+        self.add(streamer)
 
     def _run(self):
-        with self._setup_teardown_streamers():
-            with self._setup_teardown_listeners():
-                self.logger.info("The hive is now live!")
-                try:
-                    _loop(self._event_queue, self.listeners, self.kill_event)
-                finally:
-                    self.logger.info("Shutting down hive...")
+        self.setup_errors = []
+        self._attach_clock()
+        try:
+            with self._setup_teardown_streamers():
+                with self._setup_teardown_listeners():
+                    self.logger.info("The hive is now live!")
+                    self.listeners.compile()
+                    try:
+                        _loop(self._event_queue, self.listeners,
+                              self.kill_event, self.shedder, self.clock,
+                              self.requests)
+                    finally:
+                        self.logger.info("Shutting down hive...")
+        finally:
+            self._detach_clock()
         self.close()
 
+    def _attach_clock(self):
+        for streamer in self.streamers:
+            streamer.clock = self.clock
+        if self._clock_drives_timers():
+            self._timer_streamer.attach(self.clock)
+
+    def _detach_clock(self):
+        if self._clock_drives_timers():
+            self._timer_streamer.detach(self.clock)
+
+    def _clock_drives_timers(self):
+        # Virtual clocks fire the timers of the streamers that support it
+        return hasattr(self.clock, 'add_scheduler') \
+            and hasattr(self._timer_streamer, 'attach')
+
     @contextmanager
     def _setup_teardown_listeners(self):
-        self.listeners.call_method_recursively('setup')
-        yield
+        self.listeners.bind_predicates()
+        self.listeners.call_method_recursively('setup',
+                                               errors=self.setup_errors)
+        actors = [bee for bee in self.listeners.flatten()
+                  if isinstance(bee, self._actor_listener_class)]
+        for actor in actors:
+            # Queues such as the JournalQueue wait for the actors
+            actor.hold = getattr(self._event_queue, 'hold', None)
+            actor.start()
+        self.live.set()
+        try:
+            yield
+        finally:
+            self.live.clear()
+            for actor in actors:
+                actor.stop()
         self.listeners.call_method_recursively('teardown')
 
     @contextmanager
     def _setup_teardown_streamers(self):
         for streamer in self.streamers:
             self._setup_streamer(streamer)
+        if self._multiplexer is not None:
+            self._multiplexer.start()
+        self._start_reply_server()
 
         yield
 
+        self._stop_reply_server()
+        # Stop reading before IO streamers close their file objects
+        if self._multiplexer is not None:
+            self._multiplexer.shutdown()
+            self._multiplexer = None
         for streamer in self.streamers:
             self._teardown_streamer(streamer)
 
+    def _start_reply_server(self):
+        if self.reply_address is None:
+            return
+        self._reply_server = self._reply_server_class(self.reply_address,
+                                                      self.requests)
+        self._reply_server.start()
+
+    def _stop_reply_server(self):
+        if self._reply_server is not None:
+            self._reply_server.shutdown()
+            self._reply_server = None
+        self.requests.close()
+
     def _setup_streamer(self, streamer):
         try:
             streamer.setup()
         except Exception as e:
+            self.setup_errors.append((streamer, e))
             self.logger.exception("setup %s - %s", str(streamer), repr(e))
         else:
             self.logger.debug("setup %s - OK", str(streamer))
-        streamer.thread = Thread(target=streamer.run)
-        streamer.thread.start()
+        if isinstance(streamer, self._io_streamer_class):
+            if self._multiplexer is None:
+                self._multiplexer = self._multiplexer_class(self.io_workers)
+            self._multiplexer.register(streamer)
+            streamer.thread = None
+        else:
+            streamer.thread = Thread(target=streamer.run)
+            streamer.thread.start()
 
     def _teardown_streamer(self, streamer):
         try:
             streamer.kill()
             streamer.teardown()
-            streamer.thread.join()
+            if streamer.thread is not None:
+                streamer.thread.join()
             self.logger.debug("teardown %s - OK", str(streamer))
         except Exception as e:
             self.logger.exception("teardown %s - %s", str(streamer), repr(e))
@@ -246,31 +543,43 @@ class Hive(Killable):
 class _ListenerTree:
     def __init__(self):
         self._listeners = defaultdict(list)
+        self._length = 0
+        # Every listener reachable from the roots, indexed by name
+        self._by_name = defaultdict(list)
+        self._indexed = set()
+        # Cached depth first order of all reachable listeners
+        self._order = None
+        # Cached execution plans of the root listeners
+        self._plan = None
+        self._chain_count = chain_counter.value
         self.logger = create_logger(name='pybeehive.hive.listeners')
 
     def __iter__(self):
         for v in self._listeners.values():
-            for l in v:
-                yield l
+            for listener in v:
+                yield listener
 
     def __len__(self):
-        length = 0
-        for _ in self:
-            length += 1
-        return length
+        return self._length
 
     def add_listener(self, listener, chain=None):
         if chain:
             self.chain(listener, chain)
         else:
+            self._refresh()
             self._listeners[listener.__class__.__name__].append(listener)
+            self._length += 1
+            self._index(listener)
 
-    def call_method_recursively(self, method_name, *args, **kwargs):
+    def call_method_recursively(self, method_name, *args, errors=None,
+                                **kwargs):
         results = []
-        for bee in self._recursive_iter():
+        for bee in self.flatten():
             try:
                 result = bee.__getattribute__(method_name)(*args, **kwargs)
             except Exception as e:
+                if errors is not None:
+                    errors.append((bee, e))
                 self.logger.exception(
                     "%s %s - %s", method_name, str(bee), repr(e))
             else:
@@ -290,13 +599,52 @@ class _ListenerTree:
 
         for bee in bees_to_chain:
             bee.chain(listener)
+        if bees_to_chain:
+            # The index is still valid as only this listener was chained
+            self._chain_count = chain_counter.value
+            self._index(listener)
+
+    def bind_predicates(self):
+        """
+        Share a single :class:`~pybeehive.predicates.PredicateIndex` between
+        every listener in the tree that filters on predicates.
+
+        :return: the index
+        """
+        index = PredicateIndex()
+        for bee in self.flatten():
+            predicates = getattr(bee, '_predicates', ())
+            for predicate in predicates:
+                index.add(predicate)
+            if predicates:
+                bee.predicate_index = index
+        return index
+
+    def compile(self):
+        """
+        Return an execution plan for every root listener. A plan behaves
+        exactly like calling notify on its listener, but runs each chain of
+        listeners that have a single chained listener as a flat loop.
+        Plans are cached until the structure of the tree changes.
+        """
+        self._refresh()
+        if self._plan is None:
+            plans = {}
+            self._plan = [
+                _ExecutionPlan.compile(bee, plans) for bee in self
+            ]
+        return self._plan
+
+    def flatten(self):
+        """Return all listeners reachable from the roots, depth first."""
+        self._refresh()
+        if self._order is None:
+            self._order = self._depth_first()
+        return self._order
 
     def listeners_by_name(self, name):
-        listeners = []
-        for listener in self._recursive_iter():
-            if listener.__class__.__name__ == name:
-                listeners.append(listener)
-        return listeners
+        self._refresh()
+        return list(self._by_name.get(name, ()))
 
     @staticmethod
     def validate_chain(c):
@@ -318,16 +666,124 @@ class _ListenerTree:
             except TypeError:
                 raise TypeError("filter %s is not hashable" % str(item))
 
-    def _recursive_iter(self, listeners=None, visited=None):
-        visited = visited or []
-        if listeners is None:
-            listeners = self
+    def _depth_first(self):
+        order, visited = [], set()
+        stack = [iter(list(self))]
+        while stack:
+            for listener in stack[-1]:
+                if id(listener) not in visited:
+                    visited.add(id(listener))
+                    order.append(listener)
+                    stack.append(iter(listener.chained_bees))
+                    break
+            else:
+                stack.pop()
+        return order
+
+    def _index(self, listener):
+        self._order = None
+        self._plan = None
+        stack = [listener]
+        while stack:
+            bee = stack.pop()
+            if id(bee) not in self._indexed:
+                self._indexed.add(id(bee))
+                self._by_name[bee.__class__.__name__].append(bee)
+                stack.extend(reversed(bee.chained_bees))
+
+    def _refresh(self):
+        # Listeners can be chained directly with Listener.chain,
+        # in which case the index has to be rebuilt from the roots
+        if self._chain_count != chain_counter.value:
+            self._chain_count = chain_counter.value
+            self._by_name.clear()
+            self._indexed.clear()
+            for listener in self:
+                self._index(listener)
+
+
+class _ExecutionPlan:
+    """
+    A run of listeners where each listener has exactly one chained listener,
+    followed by the plans of the chained listeners of the last listener.
 
-        for listener in listeners:
-            if listener not in visited:
-                visited.append(listener)
-                yield listener
-            for _l in self._recursive_iter(listener.chained_bees, visited):
-                if _l not in visited:
-                    visited.append(_l)
-                    yield _l
+    Listeners that override notify are not compiled into plans and
+    are notified directly. The result of a listener is only copied into a
+    new Event when it is not already a new Event.
+    """
+    __slots__ = ('stages', 'children')
+
+    def __init__(self):
+        self.stages = ()
+        self.children = ()
+
+    @classmethod
+    def compile(cls, listener, plans):
+        if type(listener).notify is not Listener.notify:
+            return listener
+        if id(listener) in plans:
+            return plans[id(listener)]
+        plan = plans[id(listener)] = cls()
+        stages, seen = [listener], {id(listener)}
+        while len(listener.chained_bees) == 1:
+            bee = listener.chained_bees[0]
+            if type(bee).notify is not Listener.notify or id(bee) in seen:
+                break
+            stages.append(bee)
+            seen.add(id(bee))
+            listener = bee
+        plan.stages = tuple(stages)
+        plan.children = tuple(
+            cls.compile(bee, plans) for bee in listener.chained_bees
+        )
+        return plan
+
+    def notify(self, event):
+        stages = self.stages
+        if not event:
+            # Falsy events tear listeners down, which the listeners handle
+            return stages[0].notify(event)
+        request = getattr(event, 'request', None)
+        index = -1
+        for bee in stages:
+            try:
+                accepted = bee.filter(event)
+            except Exception as e:
+                return self._handle_exception(index, e, request)
+            if not accepted:
+                return
+            index += 1
+            try:
+                result = bee.on_event(event)
+            except Exception as e:
+                return self._handle_exception(index, e, request)
+            if result is None:
+                return
+            if result is event or type(result) is not Event:
+                event = Event(result, request=request)
+            else:
+                if request is not None and result.request is None:
+                    result.request = request
+                event = result
+        if not self.children:
+            # Results at the end of a chain answer requests
+            if request is not None:
+                request.resolve(result)
+            return
+        try:
+            for child in self.children:
+                child.notify(event)
+        except Exception as e:
+            self._handle_exception(index, e, request)
+
+    def _handle_exception(self, index, exception, request=None):
+        if request is not None:
+            request.fail(exception)
+        # Each listener in a chain handles the exceptions raised by the
+        # listeners after it, just like nested calls to Listener.notify
+        for bee in reversed(self.stages[:index + 1]):
+            try:
+                return bee.on_exception(exception)
+            except Exception as e:
+                exception = e
+        raise exception
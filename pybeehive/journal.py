@@ -0,0 +1,428 @@
+from collections import deque
+from functools import partial
+from heapq import heappop, heappush
+from threading import Condition, Lock, Thread
+import mmap
+import os
+import pickle
+import struct
+import time
+import zlib
+from .logging import create_logger
+from .utils import Queue
+
+# Sequence number, payload length and crc32 of the payload
+_HEADER = struct.Struct('>QII')
+# Acknowledged sequence number and its crc32
+_CHECKPOINT = struct.Struct('>QI')
+
+
+def read_records(path):
+    """
+    Read the records of a journal segment through mmap, stopping at the
+    first torn or corrupt record.
+
+    :param path: path of the segment
+    :return: generator of (sequence number, payload, end offset) tuples
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as m:
+            offset = 0
+            while offset + _HEADER.size <= size:
+                seq, length, crc = _HEADER.unpack_from(m, offset)
+                start = offset + _HEADER.size
+                if start + length > size:
+                    return
+                payload = m[start:start + length]
+                if zlib.crc32(payload) != crc:
+                    return
+                offset = start + length
+                yield seq, payload, offset
+
+
+def segment_paths(path):
+    """
+    Return the paths of the segments of a journal in order.
+
+    :param path: directory of the journal
+    :return:
+    """
+    return [
+        os.path.join(path, name) for name in sorted(os.listdir(path))
+        if name.endswith(Journal.segment_suffix)
+    ]
+
+
+class Journal:
+    """
+    Durable append-only log of events. Events are pickled into records with
+    a sequence number, a length prefix and a crc32, and appended to segment
+    files named after the sequence number of their first record. Appends
+    are buffered and made durable by a background thread that fsyncs all
+    pending appends at once (group commit), so many writers share the cost
+    of a single fsync.
+
+    Consumers acknowledge the sequence number up to which events have been
+    handled, or complete events one at a time in any order. The
+    acknowledged watermark is checkpointed to disk and segments
+    that only contain acknowledged events are deleted. When a journal is
+    opened, torn writes at the end of the last segment are truncated and
+    :meth:`replay` yields the events that were never acknowledged.
+
+    :param path: directory of the journal, created if it does not exist
+    :param segment_size: number of bytes after which a new segment is started
+    :param commit_interval: number of seconds the commit thread waits to
+        gather appends before each fsync
+    :param checkpoint_interval: maximum number of seconds between
+        checkpoints of the acknowledged watermark
+    """
+    segment_suffix = '.seg'
+    checkpoint_name = 'checkpoint'
+
+    def __init__(self, path, segment_size=64 * 2 ** 20, commit_interval=0.002,
+                 checkpoint_interval=1.0):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.segment_size = segment_size
+        self.commit_interval = commit_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.logger = create_logger(name='pybeehive.journal')
+        # Number of appended records and of fsyncs, for monitoring
+        self.appended = 0
+        self.commits = 0
+        self.acked = self._read_checkpoint()
+        self._checkpointed = self.acked
+        # Completed sequence numbers after a gap in the acknowledged ones
+        self._completed = []
+        self._segments = sorted(
+            int(name[:-len(self.segment_suffix)])
+            for name in os.listdir(path) if name.endswith(self.segment_suffix)
+        )
+        self.next_seq = max(self._recover(), self.acked) + 1
+        self._lock = Lock()
+        self._cond = Condition()
+        self._written = self._synced = self.next_seq - 1
+        self._closed = False
+        if not self._segments:
+            self._segments.append(self.next_seq)
+        self._file = open(self._segment_path(self._segments[-1]), 'ab')
+        self._size = self._file.tell()
+        self._committer = Thread(target=self._commit_loop, daemon=True,
+                                 name='journal-commit')
+        self._committer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def append(self, event):
+        """
+        Append an event to the journal. The event is only durable once
+        :meth:`wait` returns for its sequence number.
+
+        :param event:
+        :return: sequence number of the event
+        """
+        return self.append_many([event])
+
+    def append_many(self, events):
+        """
+        Append many events with a single write.
+
+        :param events: iterable of events
+        :return: sequence number of the last event
+        """
+        payloads = [pickle.dumps(e, pickle.HIGHEST_PROTOCOL) for e in events]
+        with self._lock:
+            if self._closed:
+                raise ValueError("journal is closed")
+            records = []
+            for payload in payloads:
+                records.append(_HEADER.pack(
+                    self.next_seq, len(payload), zlib.crc32(payload)
+                ))
+                records.append(payload)
+                self.next_seq += 1
+            data = b''.join(records)
+            self._file.write(data)
+            self._size += len(data)
+            self.appended += len(payloads)
+            seq = self.next_seq - 1
+            if self._size >= self.segment_size:
+                self._rotate()
+        with self._cond:
+            self._written = max(self._written, seq)
+            self._cond.notify_all()
+        return seq
+
+    def wait(self, seq, timeout=None):
+        """
+        Wait until the event with the sequence number is durable.
+
+        :param seq:
+        :param timeout: maximum number of seconds to wait
+        :return: True if the event is durable
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._synced >= seq, timeout)
+
+    def commit(self):
+        """
+        Flush and fsync every appended event now.
+
+        """
+        with self._lock:
+            if self._file.closed:
+                return
+            seq = self.next_seq - 1
+            self._file.flush()
+            # Sync a duplicate so that appends are not blocked by the fsync
+            # and a rotation can not close the descriptor while syncing
+            fd = os.dup(self._file.fileno())
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self.commits += 1
+        with self._cond:
+            self._synced = max(self._synced, seq)
+            self._cond.notify_all()
+
+    def ack(self, seq):
+        """
+        Acknowledge that every event up to the sequence number was handled.
+
+        :param seq:
+        """
+        with self._cond:
+            if seq > self.acked:
+                self.acked = seq
+                self._advance()
+
+    def complete(self, seq):
+        """
+        Acknowledge that the event with the sequence number was handled.
+        The acknowledged watermark only moves past events that were all
+        completed, so an event that is completed before an earlier one
+        does not cause the earlier one to be skipped by :meth:`replay`.
+
+        :param seq:
+        """
+        with self._cond:
+            if seq > self.acked:
+                heappush(self._completed, seq)
+                self._advance()
+
+    def replay(self, after=None):
+        """
+        Yield the events after a sequence number, reading the segments
+        through mmap.
+
+        :param after: sequence number to start after,
+            defaults to the acknowledged watermark
+        :return: generator of (sequence number, event) tuples
+        """
+        if after is None:
+            after = self.acked
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+            segments = list(self._segments)
+        for i, base in enumerate(segments):
+            if i + 1 < len(segments) and segments[i + 1] - 1 <= after:
+                continue
+            for seq, payload, _ in self._read_segment(base):
+                if seq > after:
+                    yield seq, pickle.loads(payload)
+
+    def close(self):
+        """
+        Make every appended event durable, checkpoint and stop.
+
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._committer.join()
+        self.commit()
+        self._checkpoint()
+        with self._lock:
+            self._file.close()
+
+    def _advance(self):
+        completed = self._completed
+        while completed and completed[0] <= self.acked + 1:
+            self.acked = max(self.acked, heappop(completed))
+
+    def _segment_path(self, base):
+        return os.path.join(self.path, '%020d%s' % (base, self.segment_suffix))
+
+    def _read_segment(self, base):
+        return read_records(self._segment_path(base))
+
+    def _recover(self):
+        last, offset = 0, 0
+        for i, base in enumerate(self._segments):
+            offset = 0
+            for seq, _, offset in self._read_segment(base):
+                last = seq
+            path = self._segment_path(base)
+            if offset < os.path.getsize(path):
+                if i + 1 < len(self._segments):
+                    self.logger.warning("corrupt record in segment %s", path)
+                else:
+                    self.logger.warning("truncating torn write in %s", path)
+                    with open(path, 'r+b') as f:
+                        f.truncate(offset)
+        return last
+
+    def _rotate(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        with self._cond:
+            self._synced = max(self._synced, self.next_seq - 1)
+            self._cond.notify_all()
+        self._segments.append(self.next_seq)
+        self._file = open(self._segment_path(self.next_seq), 'ab')
+        self._size = 0
+
+    def _commit_loop(self):
+        last_checkpoint = time.monotonic()
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._written > self._synced or self._closed,
+                    self.checkpoint_interval
+                )
+                if self._closed:
+                    return
+                pending = self._written > self._synced
+            if pending:
+                # Gather the appends of other writers into the same fsync
+                time.sleep(self.commit_interval)
+                self.commit()
+            if time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                self._checkpoint()
+                last_checkpoint = time.monotonic()
+
+    def _read_checkpoint(self):
+        try:
+            with open(os.path.join(self.path, self.checkpoint_name),
+                      'rb') as f:
+                data = f.read()
+            seq, crc = _CHECKPOINT.unpack(data)
+        except (OSError, struct.error):
+            return 0
+        if zlib.crc32(data[:8]) != crc:
+            self.logger.warning("ignoring corrupt journal checkpoint")
+            return 0
+        return seq
+
+    def _checkpoint(self):
+        acked = self.acked
+        if acked == self._checkpointed:
+            return
+        data = struct.pack('>Q', acked)
+        path = os.path.join(self.path, self.checkpoint_name)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data + struct.pack('>I', zlib.crc32(data)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        self._checkpointed = acked
+        # Delete the segments that only contain acknowledged events
+        with self._lock:
+            while len(self._segments) > 1 and self._segments[1] - 1 <= acked:
+                os.remove(self._segment_path(self._segments.pop(0)))
+
+
+class JournalQueue(Queue):
+    """
+    Event queue that writes every event to a :class:`Journal` before it is
+    queued, and completes it once :meth:`task_done` is called for it and
+    every :meth:`hold` on it was released. Events that were journaled but
+    never acknowledged, e.g. because the process crashed, are queued again
+    when the queue is created.
+
+    :param journal:
+    :param maxsize:
+    :param durable: wait for the group commit of each event before it is
+        queued, otherwise events are queued as soon as they are written
+    """
+    def __init__(self, journal, maxsize=0, durable=True):
+        super(JournalQueue, self).__init__(maxsize)
+        self.journal = journal
+        self.durable = durable
+        self._inflight = deque()
+        self._holds = {}
+        recovered = list(journal.replay())
+        if recovered:
+            super(JournalQueue, self).put_many(recovered)
+
+    def put(self, item, block=True, timeout=None):
+        seq = self.journal.append(item)
+        if self.durable:
+            self.journal.wait(seq)
+        try:
+            super(JournalQueue, self).put((seq, item), block, timeout)
+        except Exception:
+            # The caller knows that the event was not queued
+            self.journal.complete(seq)
+            raise
+
+    def put_many(self, items, block=True, timeout=None):
+        items = list(items)
+        if not items:
+            return
+        last = self.journal.append_many(items)
+        if self.durable:
+            self.journal.wait(last)
+        first = last - len(items) + 1
+        try:
+            super(JournalQueue, self).put_many(
+                zip(range(first, last + 1), items), block, timeout
+            )
+        except Exception:
+            for seq in range(first, last + 1):
+                self.journal.complete(seq)
+            raise
+
+    def hold(self):
+        """
+        Delay the completion of the event that is being dispatched, e.g.
+        until an :class:`~pybeehive.actors.ActorListener` handled it.
+
+        :return: function that releases the hold
+        """
+        with self.mutex:
+            seq = self._inflight[-1]
+            self._holds[seq] = self._holds.get(seq, 1) + 1
+        return partial(self._release, seq)
+
+    def task_done(self):
+        with self.mutex:
+            seq = self._inflight.popleft() if self._inflight else None
+        super(JournalQueue, self).task_done()
+        if seq is not None:
+            self._release(seq)
+
+    def _release(self, seq):
+        with self.mutex:
+            holds = self._holds.pop(seq, 1) - 1
+            if holds:
+                self._holds[seq] = holds
+                return
+        self.journal.complete(seq)
+
+    def _get(self):
+        seq, item = self.queue.popleft()
+        self._inflight.append(seq)
+        return item
@@ -0,0 +1,182 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Lock
+import selectors
+import socket
+from .core import Streamer, Killable
+from .logging import create_logger
+
+
+class IOStreamer(Streamer):
+    """
+    Streamer driven by the readiness of a file object such as a socket,
+    a pipe or a file descriptor. Instead of running in a thread of its own,
+    ``stream`` is called every time the file object becomes readable
+    and should yield whatever data is available without blocking.
+    Inside a hive, all IOStreamers share one :class:`Multiplexer`.
+
+    :param fileobj: object with a fileno() method or a file descriptor,
+        which can also be set in setup
+    :param topic:
+    """
+    def __init__(self, fileobj=None, topic=None):
+        super(IOStreamer, self).__init__(topic=topic)
+        self.fileobj = fileobj
+
+    def run(self):
+        """
+        Wait for the file object to become readable and stream from it
+        until the streamer is killed. This is only used when the streamer
+        is not run by a :class:`Multiplexer`.
+        """
+        self._assert_queue_is_set()
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.fileobj, selectors.EVENT_READ)
+            while self.alive:
+                if selector.select(timeout=0.01):
+                    self.read()
+
+    def read(self):
+        """
+        Stream the data that is available after the file object
+        became readable into the output queue.
+        """
+        try:
+            for data in self.stream():
+                self._put(data)
+                if not self.alive:
+                    break
+        except Exception as e:
+            self.on_exception(e)
+
+
+class Multiplexer(Killable):
+    """
+    Runs any number of :class:`IOStreamer` from a single selector thread.
+    If ``workers`` is given, ready streamers are read on a fixed size thread
+    pool, and a streamer is not selected again until its read has finished.
+
+    :param workers: number of threads used to read ready streamers
+    """
+    def __init__(self, workers=0):
+        super(Multiplexer, self).__init__()
+        self.workers = workers
+        self.streamers = set()
+        self.selector = selectors.DefaultSelector()
+        self.logger = create_logger(name='pybeehive.hive.multiplexer')
+        self._pool = None
+        self._thread = None
+        self._pending = deque()
+        self._lock = Lock()
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._wakeup_recv.setblocking(False)
+        self._wakeup_send.setblocking(False)
+
+    def register(self, streamer):
+        """
+
+        :param streamer:
+        """
+        self._schedule(self._add, streamer)
+
+    def unregister(self, streamer):
+        """
+
+        :param streamer:
+        """
+        self._schedule(self._remove, streamer)
+
+    def start(self):
+        """
+
+        """
+        if self.workers:
+            self._pool = ThreadPoolExecutor(self.workers)
+        self._thread = Thread(target=self.run)
+        self._thread.start()
+
+    def shutdown(self):
+        """
+
+        """
+        self.kill()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown()
+        self.selector.close()
+        self._wakeup_recv.close()
+        self._wakeup_send.close()
+
+    def run(self):
+        """
+
+        """
+        self.selector.register(self._wakeup_recv, selectors.EVENT_READ)
+        while self.alive:
+            self._run_pending()
+            for key, _ in self.selector.select():
+                if key.fileobj is self._wakeup_recv:
+                    self._drain_wakeup()
+                elif self._pool is not None:
+                    # Stop selecting the streamer until it has been read
+                    self._remove(key.data)
+                    self._pool.submit(self._read_and_register, key.data)
+                else:
+                    self._read(key.data)
+
+    def _read(self, streamer):
+        if streamer.alive:
+            streamer.read()
+        if not streamer.alive:
+            self._remove(streamer)
+
+    def _read_and_register(self, streamer):
+        if streamer.alive:
+            streamer.read()
+        if streamer.alive:
+            self.register(streamer)
+
+    def _add(self, streamer):
+        if streamer.alive and streamer not in self.streamers:
+            try:
+                self.selector.register(
+                    streamer.fileobj, selectors.EVENT_READ, streamer)
+            except (KeyError, ValueError, OSError) as e:
+                self.logger.exception(
+                    "register %s - %s", str(streamer), repr(e))
+            else:
+                self.streamers.add(streamer)
+
+    def _remove(self, streamer):
+        if streamer in self.streamers:
+            self.streamers.discard(streamer)
+            try:
+                self.selector.unregister(streamer.fileobj)
+            except (KeyError, ValueError, OSError):
+                pass  # the file object was already closed
+
+    def _schedule(self, method, streamer):
+        with self._lock:
+            self._pending.append((method, streamer))
+        self._wake()
+
+    def _run_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, deque()
+        for method, streamer in pending:
+            method(streamer)
+
+    def _wake(self):
+        try:
+            self._wakeup_send.send(b'\0')
+        except OSError:
+            pass  # the wakeup buffer is full or the socket is closed
+
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_recv.recv(4096):
+                pass
+        except OSError:
+            pass
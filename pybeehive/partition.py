@@ -0,0 +1,85 @@
+from bisect import bisect, insort
+import hashlib
+
+
+def _hash(value):
+    digest = hashlib.md5(str(value).encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+class HashRing:
+    """
+    Consistent hash ring that maps keys to nodes. Each node is placed on
+    the ring ``replicas`` times, and a key belongs to the first node after
+    it on the ring, so adding a node to N nodes only moves about 1/N of
+    the keys, all of them to the new node, and removing a node only moves
+    its own keys. Keys and nodes are hashed by their string, so a ring maps
+    the same keys to the same nodes in every process.
+
+    :param nodes: initial nodes, e.g. addresses
+    :param replicas: number of virtual nodes of each node, more replicas
+        spread the keys more evenly
+    """
+    def __init__(self, nodes=(), replicas=100):
+        if replicas < 1:
+            raise ValueError("replicas must be at least 1")
+        self.replicas = replicas
+        self._nodes = set()
+        self._hashes = []
+        self._owners = {}
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, node):
+        return node in self._nodes
+
+    @property
+    def nodes(self):
+        """
+
+        :return: set of the nodes on the ring
+        """
+        return set(self._nodes)
+
+    def add(self, node):
+        """
+
+        :param node:
+        """
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for replica in range(self.replicas):
+            h = _hash('%s-%d' % (node, replica))
+            # Collisions are vanishingly rare, the first node keeps the point
+            if h not in self._owners:
+                self._owners[h] = node
+                insort(self._hashes, h)
+
+    def remove(self, node):
+        """
+
+        :param node:
+        """
+        if node not in self._nodes:
+            return
+        self._nodes.remove(node)
+        self._hashes = [h for h in self._hashes if self._owners[h] != node]
+        self._owners = {h: self._owners[h] for h in self._hashes}
+
+    def get(self, key):
+        """
+        Return the node that a key belongs to.
+
+        :param key:
+        :return: node
+        """
+        if not self._hashes:
+            raise LookupError("the hash ring has no nodes")
+        index = bisect(self._hashes, _hash(key))
+        if index == len(self._hashes):
+            index = 0
+        return self._owners[self._hashes[index]]
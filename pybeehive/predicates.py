@@ -0,0 +1,219 @@
+from collections import defaultdict
+
+_MISSING = object()
+
+
+def get_field(data, field):
+    """
+    Look up a dotted field path in the data of an event. Each segment is
+    looked up as a key of mappings and as an attribute of other objects.
+    Returns a sentinel if any segment of the path is missing.
+
+    :param data:
+    :param field: dotted path such as ``'order.side'``, or None for the
+        data itself
+    :return:
+    """
+    if field is None:
+        return data
+    for key in field.split('.'):
+        try:
+            data = data[key]
+        except (KeyError, IndexError):
+            return _MISSING
+        except TypeError:
+            data = getattr(data, key, _MISSING)
+        if data is _MISSING:
+            return data
+    return data
+
+
+class Predicate:
+    """
+    Base class for declarative filters on the data of events, which can be
+    given to listeners alongside topic filters. A listener accepts an event
+    only if every one of its predicates matches. Predicates are hashable
+    and compare equal when they test the same field in the same way, which
+    lets a :class:`PredicateIndex` evaluate each of them once per event no
+    matter how many listeners use it.
+
+    :param field: dotted path of the field in the event data
+    """
+    def __init__(self, field):
+        self.field = field
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._key() == other._key()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((type(self).__name__,) + self._key())
+
+    def __repr__(self):
+        return "%s(%s)" % (
+            self.__class__.__name__, ', '.join(map(repr, self._key()))
+        )
+
+    def evaluate(self, event):
+        """
+        Return True if the field of the event data matches.
+
+        :param event:
+        :return:
+        """
+        value = get_field(event.data, self.field)
+        if value is _MISSING:
+            return False
+        try:
+            return bool(self.test(value))
+        except TypeError:
+            return False
+
+    def test(self, value):
+        """
+
+        :param value: value of the field
+        :return:
+        """
+        raise NotImplementedError  # pragma: nocover
+
+    def _key(self):
+        return (self.field,)
+
+
+class Eq(Predicate):
+    """
+    Match events where the field equals ``value``.
+
+    :param field:
+    :param value:
+    """
+    def __init__(self, field, value):
+        super(Eq, self).__init__(field)
+        self.value = value
+
+    @property
+    def values(self):
+        return (self.value,)
+
+    def test(self, value):
+        return value == self.value
+
+    def _key(self):
+        return self.field, self.value
+
+
+class In(Predicate):
+    """
+    Match events where the field is one of ``values``.
+
+    :param field:
+    :param values: iterable of hashable values
+    """
+    def __init__(self, field, values):
+        super(In, self).__init__(field)
+        self.values = frozenset(values)
+
+    def test(self, value):
+        return value in self.values
+
+    def _key(self):
+        return self.field, self.values
+
+
+class Range(Predicate):
+    """
+    Match events where ``low <= field < high``. Either bound can be None.
+
+    :param field:
+    :param low: inclusive lower bound
+    :param high: exclusive upper bound
+    """
+    def __init__(self, field, low=None, high=None):
+        super(Range, self).__init__(field)
+        self.low = low
+        self.high = high
+
+    def test(self, value):
+        return (self.low is None or self.low <= value) and \
+               (self.high is None or value < self.high)
+
+    def _key(self):
+        return self.field, self.low, self.high
+
+
+class PredicateIndex:
+    """
+    Shared evaluator of the predicates of many listeners. The result of
+    every distinct predicate is computed at most once per event, and all
+    :class:`Eq` and :class:`In` predicates on the same field are resolved
+    with a single lookup of the field and a single dictionary lookup.
+
+    :param predicates: iterable of predicates
+    """
+    def __init__(self, predicates=()):
+        self._predicates = set()
+        # field -> value -> equality and membership predicates matching it
+        self._by_value = defaultdict(lambda: defaultdict(set))
+        self._hashed = defaultdict(set)
+        # The results for the last event, replaced as a whole so that
+        # listeners notified from other threads at worst recompute them
+        self._memo = (None, {})
+        for predicate in predicates:
+            self.add(predicate)
+
+    def __len__(self):
+        return len(self._predicates)
+
+    def __contains__(self, predicate):
+        return predicate in self._predicates
+
+    def add(self, predicate):
+        """
+
+        :param predicate:
+        """
+        if predicate in self._predicates:
+            return
+        self._predicates.add(predicate)
+        if isinstance(predicate, (Eq, In)):
+            for value in predicate.values:
+                self._by_value[predicate.field][value].add(predicate)
+            self._hashed[predicate.field].add(predicate)
+
+    def evaluate(self, predicate, event):
+        """
+        Return the memoized result of the predicate for the event.
+
+        :param predicate:
+        :param event:
+        :return:
+        """
+        memo_event, results = self._memo
+        if memo_event is not event:
+            results = {}
+            self._memo = (event, results)
+        try:
+            return results[predicate]
+        except KeyError:
+            pass
+        if predicate in self._hashed.get(predicate.field, ()):
+            self._resolve_field(predicate.field, event, results)
+        else:
+            results[predicate] = predicate.evaluate(event)
+        return results[predicate]
+
+    def _resolve_field(self, field, event, results):
+        for predicate in self._hashed[field]:
+            results[predicate] = False
+        value = get_field(event.data, field)
+        if value is _MISSING:
+            return
+        try:
+            matched = self._by_value[field].get(value, ())
+        except TypeError:
+            return
+        for predicate in matched:
+            results[predicate] = True
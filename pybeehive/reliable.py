@@ -0,0 +1,235 @@
+from collections import deque, OrderedDict
+import os
+import struct
+import time
+
+# Frame kind, session id, sequence number and the oldest unacknowledged
+# sequence number of the sender, followed by the payload of data frames
+_FRAME = struct.Struct('>cQQQ')
+DATA = b'D'
+ACK = b'A'
+
+
+def new_session():
+    """
+    Return a random session id, so that receivers can tell a restarted
+    sender from the one that was running before.
+
+    :return:
+    """
+    return int.from_bytes(os.urandom(8), 'big')
+
+
+class ReliableSender:
+    """
+    Sending half of the at-least-once protocol of the socket bees. It does
+    no IO itself: payloads are wrapped into frames numbered within the
+    session of the sender, and kept in a bounded replay buffer until the
+    receiver acknowledges them. Acknowledgements are cumulative, so one
+    ack releases every frame up to its sequence number. When no ack
+    arrives within ``ack_timeout`` every unacknowledged frame is sent again
+    in order (go-back-N), which also recovers frames that were dropped by a
+    full socket or lost when the receiver restarted.
+
+    :param window: maximum number of unacknowledged frames
+    :param ack_timeout: number of seconds to wait for an ack before resending
+    :param session: session id, a random one by default
+    """
+    def __init__(self, window=10000, ack_timeout=0.2, session=None):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.window = window
+        self.ack_timeout = ack_timeout
+        self.session = new_session() if session is None else session
+        self.next_seq = 1
+        self.acked = 0
+        # Number of frames sent for the first time and sent again
+        self.sent = 0
+        self.retransmitted = 0
+        self._unacked = deque()
+        self._deadline = None
+
+    def __len__(self):
+        return len(self._unacked)
+
+    @property
+    def full(self):
+        return len(self._unacked) >= self.window
+
+    def wrap(self, payload, now=None):
+        """
+        Number a payload and keep it until it is acknowledged.
+
+        :param payload: bytes
+        :param now: current monotonic time
+        :return: frame to send
+        """
+        if self.full:
+            raise OverflowError("replay buffer is full")
+        seq = self.next_seq
+        self.next_seq += 1
+        self._unacked.append((seq, payload))
+        if self._deadline is None:
+            self._deadline = (time.monotonic() if now is None else now) \
+                + self.ack_timeout
+        self.sent += 1
+        return self._frame(seq, payload)
+
+    def receive(self, frame, now=None):
+        """
+        Handle an ack frame from the receiver.
+
+        :param frame:
+        :param now: current monotonic time
+        :return: number of frames that were released
+        """
+        kind, session, seq, _ = _FRAME.unpack_from(frame)
+        if kind != ACK or session != self.session or seq <= self.acked:
+            return 0
+        released = 0
+        while self._unacked and self._unacked[0][0] <= seq:
+            self._unacked.popleft()
+            released += 1
+        self.acked = seq
+        if self._unacked:
+            self._deadline = (time.monotonic() if now is None else now) \
+                + self.ack_timeout
+        else:
+            self._deadline = None
+        return released
+
+    def due(self, now=None):
+        """
+        Return the frames to send again because their ack timed out.
+
+        :param now: current monotonic time
+        :return: list of frames, oldest first
+        """
+        if self._deadline is None:
+            return []
+        now = time.monotonic() if now is None else now
+        if now < self._deadline:
+            return []
+        return self.resend(now)
+
+    def resend(self, now=None):
+        """
+        Return every unacknowledged frame, e.g. after a reconnect.
+
+        :param now: current monotonic time
+        :return: list of frames, oldest first
+        """
+        if not self._unacked:
+            return []
+        self._deadline = (time.monotonic() if now is None else now) \
+            + self.ack_timeout
+        self.retransmitted += len(self._unacked)
+        return [self._frame(seq, payload) for seq, payload in self._unacked]
+
+    def _frame(self, seq, payload):
+        # The oldest unacknowledged frame tells a new receiver where to start
+        return _FRAME.pack(
+            DATA, self.session, seq, self._unacked[0][0]
+        ) + payload
+
+
+class _Peer:
+    __slots__ = ('session', 'last', 'pending', 'ack_at')
+
+    def __init__(self, session, last):
+        self.session = session
+        self.last = last
+        self.pending = 0
+        self.ack_at = None
+
+
+class ReliableReceiver:
+    """
+    Receiving half of the at-least-once protocol of the socket bees. Frames
+    are accepted strictly in order per peer and session, so duplicates of
+    frames that were already delivered are suppressed and frames after a
+    gap are dropped until the sender resends the missing ones. Acks are
+    batched: a peer is acknowledged after ``ack_every`` frames, or
+    ``ack_interval`` seconds after the first frame that was not
+    acknowledged yet, whichever comes first.
+
+    When a peer starts a new session the receiver starts over at the
+    oldest frame the sender still holds. At most ``max_peers`` peers are
+    tracked; when a forgotten peer sends again, frames it resends may be
+    delivered a second time.
+
+    :param ack_every: number of frames after which a peer is acknowledged
+    :param ack_interval: maximum number of seconds an ack is delayed
+    :param max_peers: maximum number of peers to keep the state of
+    """
+    def __init__(self, ack_every=256, ack_interval=0.01, max_peers=1024):
+        self.ack_every = ack_every
+        self.ack_interval = ack_interval
+        self.max_peers = max_peers
+        # Number of frames delivered, suppressed and dropped after a gap
+        self.delivered = 0
+        self.duplicates = 0
+        self.out_of_order = 0
+        self._peers = OrderedDict()
+
+    def receive(self, peer, frame, now=None):
+        """
+        Handle a data frame from a peer.
+
+        :param peer: identity of the sending peer
+        :param frame:
+        :param now: current monotonic time
+        :return: payload of the frame, or None if it is not delivered
+        """
+        kind, session, seq, base = _FRAME.unpack_from(frame)
+        if kind != DATA:
+            return None
+        state = self._peers.get(peer)
+        if state is None or state.session != session:
+            state = self._track(peer, session, base - 1)
+        if state.pending == 0:
+            state.ack_at = (time.monotonic() if now is None else now) \
+                + self.ack_interval
+        state.pending += 1
+        if seq != state.last + 1:
+            if seq <= state.last:
+                self.duplicates += 1
+            else:
+                self.out_of_order += 1
+            return None
+        state.last = seq
+        self.delivered += 1
+        return frame[_FRAME.size:]
+
+    def acks(self, now=None):
+        """
+        Return the acks that are due.
+
+        :param now: current monotonic time
+        :return: list of (peer, ack frame) tuples
+        """
+        now = time.monotonic() if now is None else now
+        due = []
+        for peer, state in self._peers.items():
+            if state.pending and (state.pending >= self.ack_every
+                                  or now >= state.ack_at):
+                state.pending = 0
+                due.append((peer, _FRAME.pack(
+                    ACK, state.session, state.last, 0
+                )))
+        return due
+
+    def forget(self, peer):
+        """
+        Drop the state of a peer.
+
+        :param peer:
+        """
+        self._peers.pop(peer, None)
+
+    def _track(self, peer, session, last):
+        self._peers.pop(peer, None)
+        while len(self._peers) >= self.max_peers:
+            self._peers.popitem(last=False)
+        state = self._peers[peer] = _Peer(session, last)
+        return state
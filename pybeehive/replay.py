@@ -0,0 +1,176 @@
+from time import time
+import os
+import pickle
+from .core import Listener, Streamer
+from .journal import Journal, read_records, segment_paths
+from .logging import create_logger
+from .restart import RestartPolicy
+from .utils import Batch
+
+
+def read_log(path, start=None, end=None, batch_size=1000):
+    """
+    Read the events recorded in a journal directory or segment file,
+    decoding them in batches.
+
+    :param path: journal directory or path of a single segment
+    :param start: only read events created at or after this time
+    :param end: only read events created before this time
+    :param batch_size: maximum number of events per batch
+    :return: generator of lists of events
+    """
+    paths = segment_paths(path) if os.path.isdir(path) else [path]
+    for segment in paths:
+        payloads = []
+        for _, payload, _ in read_records(segment):
+            payloads.append(payload)
+            if len(payloads) >= batch_size:
+                batch = _decode(payloads, start, end)
+                if batch:
+                    yield batch
+                payloads = []
+        batch = _decode(payloads, start, end)
+        if batch:
+            yield batch
+
+
+def _decode(payloads, start, end):
+    events = [pickle.loads(p) for p in payloads]
+    if start is not None or end is not None:
+        events = [
+            e for e in events
+            if (start is None or e.created_at >= start)
+            and (end is None or e.created_at < end)
+        ]
+    return events
+
+
+class Pacer:
+    """
+    Computes when recorded events should be replayed. Without a speed
+    events are replayed as fast as possible, otherwise the time between
+    events is divided by the speed, e.g. a speed of 60 replays an hour of
+    events in a minute.
+
+    :param speed: wall clock speed up, or None to replay as fast as possible
+    """
+    def __init__(self, speed=None):
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be a positive number")
+        self.speed = speed
+        self._origin = None
+
+    def delay(self, event, now):
+        """
+        Return the number of seconds to wait before replaying the event.
+
+        :param event:
+        :param now:
+        :return:
+        """
+        if self.speed is None:
+            return 0
+        if self._origin is None:
+            self._origin = (event.created_at, now)
+        recorded, started = self._origin
+        return started + (event.created_at - recorded) / self.speed - now
+
+
+class ReplayStreamer(Streamer):
+    """
+    Streamer that replays the events recorded in a journal, keeping their
+    original topics and created_at times. The streamer stops once every
+    event was replayed.
+
+    :param path: journal directory or path of a single segment
+    :param start: only replay events created at or after this time
+    :param end: only replay events created before this time
+    :param speed: wall clock speed up, or None to replay as fast as possible
+    :param batch_size: number of events decoded at once
+    :param topic: topic to replay the events with instead of their own
+    """
+    restart_policy = RestartPolicy(restart_exhausted=False)
+
+    def __init__(self, path, start=None, end=None, speed=None,
+                 batch_size=1000, topic=None):
+        super(ReplayStreamer, self).__init__(topic=topic)
+        self.path = path
+        self.start = start
+        self.end = end
+        self.speed = speed
+        self.batch_size = batch_size
+        self.replayed = 0
+        self.started_at = None
+        self.finished_at = None
+        self.logger = create_logger(name='pybeehive.replay')
+
+    def __str__(self):
+        return "%s(path=%s, speed=%s)" % (
+            self.__class__.__name__, self.path, self.speed
+        )
+
+    @property
+    def events_per_second(self):
+        """
+        Number of events replayed per second so far.
+
+        :return:
+        """
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time()) - self.started_at
+        return self.replayed / elapsed if elapsed > 0 else 0.0
+
+    def stream(self):
+        pacer = self._begin()
+        for events in read_log(self.path, self.start, self.end,
+                               self.batch_size):
+            if pacer.speed is None:
+                self.replayed += len(events)
+                yield Batch(events)
+            else:
+                for event in events:
+                    delay = pacer.delay(event, time())
+                    if delay > 0 and self.kill_event.wait(delay):
+                        return
+                    self.replayed += 1
+                    yield event
+            if not self.alive:
+                return
+        self._finish()
+
+    def _begin(self):
+        self.replayed = 0
+        self.started_at, self.finished_at = time(), None
+        return Pacer(self.speed)
+
+    def _finish(self):
+        self.finished_at = time()
+        self.logger.info("%s replayed %d events at %.0f events/s", str(self),
+                         self.replayed, self.events_per_second)
+
+
+class Recorder(Listener):
+    """
+    Listener that records every event it receives into a
+    :class:`~pybeehive.journal.Journal`, for a :class:`ReplayStreamer`.
+
+    :param path: directory of the journal
+    :param filters:
+    :param journal_kwargs: keyword arguments of the journal
+    """
+    def __init__(self, path, filters=None, **journal_kwargs):
+        super(Recorder, self).__init__(filters=filters)
+        self.path = path
+        self.journal_kwargs = journal_kwargs
+        self.journal = None
+
+    def setup(self):
+        self.journal = Journal(self.path, **self.journal_kwargs)
+
+    def teardown(self):
+        if self.journal is not None:
+            self.journal.close()
+
+    def on_event(self, event):
+        self.journal.append(event)
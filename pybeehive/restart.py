@@ -0,0 +1,84 @@
+import random
+
+
+class RestartPolicy:
+    """
+    Decides if and when a :class:`~pybeehive.Streamer` restarts its stream
+    after the stream raised an exception or was exhausted. The default
+    policy restarts immediately, forever.
+
+    A run of the stream counts as a failure when it did not produce
+    anything, so ``max_restarts`` limits the number of consecutive
+    restarts that made no progress.
+
+    :param max_restarts: maximum number of consecutive failures before the
+        streamer is killed, or None to never give up
+    :param restart_exhausted: whether to restart streams that finished
+        without raising; if False the streamer is killed instead
+    """
+    def __init__(self, max_restarts=None, restart_exhausted=True):
+        self.max_restarts = max_restarts
+        self.restart_exhausted = restart_exhausted
+
+    def __str__(self):
+        return "%s(max_restarts=%s, restart_exhausted=%s)" % (
+            self.__class__.__name__, self.max_restarts,
+            self.restart_exhausted
+        )
+
+    def next_delay(self, failures, exhausted):
+        """
+        Return the number of seconds to wait before restarting,
+        or None if the streamer should stop.
+
+        :param failures: number of consecutive failures, or 0 if the
+            last run of the stream produced something
+        :param exhausted: whether the stream finished without an exception
+        :return:
+        """
+        if exhausted and not self.restart_exhausted:
+            return None
+        if self.max_restarts is not None and failures > self.max_restarts:
+            return None
+        return self.delay(max(failures, 1))
+
+    def delay(self, failures):
+        """
+        Return the number of seconds to wait before the nth restart.
+
+        :param failures:
+        :return:
+        """
+        return 0
+
+
+class ExponentialBackoff(RestartPolicy):
+    """
+    Wait ``initial * factor ** (failures - 1)`` seconds before restarting,
+    up to ``maximum`` seconds, and add up to ``jitter`` times that
+    delay at random so that many failing streamers do not restart together.
+
+    :param initial: delay before the first restart
+    :param factor: multiplier applied to the delay after every failure
+    :param maximum: maximum delay between restarts
+    :param jitter: fraction of the delay to add at random
+    :param max_restarts:
+    :param restart_exhausted:
+    """
+    def __init__(self, initial=0.1, factor=2, maximum=60, jitter=0.1,
+                 max_restarts=None, restart_exhausted=True):
+        super(ExponentialBackoff, self).__init__(
+            max_restarts=max_restarts, restart_exhausted=restart_exhausted
+        )
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+        self.jitter = jitter
+
+    def delay(self, failures):
+        # Cap the exponent so huge failure counts cannot overflow
+        exponent = min(failures - 1, 64)
+        delay = min(self.initial * self.factor ** exponent, self.maximum)
+        if self.jitter:
+            delay += random.uniform(0, delay * self.jitter)
+        return delay
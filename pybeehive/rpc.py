@@ -0,0 +1,242 @@
+from concurrent.futures import Future, TimeoutError
+from itertools import count
+from threading import Lock
+import heapq
+import os
+import pickle
+import time
+
+
+def _no_request():
+    return None
+
+
+class Request:
+    """
+    Pending result of an event submitted with :meth:`pybeehive.Hive.request`.
+    The event carries the request through the chain of listeners it
+    triggers, and the request is resolved with the first result that a
+    listener at the end of a chain returns, or failed with the first
+    exception a listener raises. Listeners that return None do not resolve
+    it.
+
+    When the event is sent to another hive by a socket listener, the
+    request is sent along as a :class:`RemoteRequest` if the hive has a
+    reply address, and is dropped otherwise.
+    """
+    __slots__ = ('id', 'future', 'reply_address', '_tracker')
+
+    def __init__(self, id, future, reply_address=None, tracker=None):
+        self.id = id
+        self.future = future
+        self.reply_address = reply_address
+        self._tracker = tracker
+
+    def __reduce__(self):
+        if self.reply_address is None:
+            return _no_request, ()
+        return RemoteRequest, (self.id, self.reply_address)
+
+    def resolve(self, result):
+        """
+
+        :param result:
+        """
+        self._tracker.complete(self.id, result)
+
+    def fail(self, exception):
+        """
+
+        :param exception:
+        """
+        self._tracker.complete(self.id, error=exception)
+
+
+class RemoteRequest:
+    """
+    Request of an event that was received from another hive. Its result
+    is sent back to the reply server of that hive by the
+    :class:`RequestTracker` of the hive that dispatched the event.
+
+    :param id:
+    :param reply_address: address of the reply server
+    """
+    __slots__ = ('id', 'reply_address', '_tracker')
+
+    def __init__(self, id, reply_address):
+        self.id = id
+        self.reply_address = reply_address
+        # This is set by the hive that dispatches the event
+        self._tracker = None
+
+    def __reduce__(self):
+        return RemoteRequest, (self.id, self.reply_address)
+
+    def resolve(self, result):
+        self._reply(result, None)
+
+    def fail(self, exception):
+        self._reply(None, exception)
+
+    def _reply(self, result, error):
+        try:
+            data = pickle.dumps((self.id, result, error))
+        except Exception as e:
+            data = pickle.dumps((self.id, None, RuntimeError(
+                "result of request %r can not be pickled: %r" % (self.id, e)
+            )))
+        tracker = self._tracker
+        if tracker is None:
+            # Answered outside of a hive, so no connection is kept open
+            tracker = RequestTracker()
+            try:
+                tracker.reply(self.reply_address, data)
+            finally:
+                tracker.close()
+        else:
+            tracker.reply(self.reply_address, data)
+
+
+class RequestTracker:
+    """
+    Tracks the outstanding requests of a hive, up to ``max_outstanding``
+    at a time, and fails the requests that time out.
+
+    :param max_outstanding: maximum number of outstanding requests
+    :param reply_address: address of the reply server of the hive, for
+        requests that are answered by other hives
+    """
+    timeout_error = TimeoutError
+
+    def __init__(self, max_outstanding=1000, reply_address=None):
+        self.max_outstanding = max_outstanding
+        self.reply_address = reply_address
+        # Number of requests that were completed, failed and timed out
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self._pending = {}
+        self._deadlines = []
+        # Ids are unique across processes, so that replies from other
+        # hives can not resolve the requests of a restarted hive
+        self._prefix = os.urandom(4).hex() + '-'
+        self._ids = count()
+        self._lock = Lock()
+        # Clients that send the results of requests to other hives
+        self._clients = {}
+        self._clients_lock = Lock()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def create(self, timeout=None):
+        """
+
+        :param timeout: number of seconds after which the request fails
+            with a timeout error
+        :return: :class:`Request`
+        """
+        self.expire()
+        with self._lock:
+            if len(self._pending) >= self.max_outstanding:
+                raise RuntimeError("%d requests are outstanding"
+                                   % len(self._pending))
+            request = Request(self._prefix + str(next(self._ids)),
+                              self._new_future(), self.reply_address, self)
+            self._pending[request.id] = request
+            if timeout is not None:
+                heapq.heappush(self._deadlines,
+                               (time.monotonic() + timeout, request.id))
+        return request
+
+    def complete(self, id, result=None, error=None):
+        """
+        Resolve or fail a request, unless it was completed already.
+
+        :param id:
+        :param result:
+        :param error: exception to fail the request with
+        """
+        with self._lock:
+            request = self._pending.pop(id, None)
+        if request is None or request.future.done():
+            return
+        if error is None:
+            self.completed += 1
+            request.future.set_result(result)
+        else:
+            self.failed += 1
+            request.future.set_exception(error)
+
+    def expire(self, now=None):
+        """
+        Fail the requests whose timeout has passed.
+
+        :param now: current monotonic time
+        """
+        if not self._deadlines:
+            return
+        now = time.monotonic() if now is None else now
+        expired = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, id = heapq.heappop(self._deadlines)
+                request = self._pending.pop(id, None)
+                if request is not None:
+                    expired.append(request)
+        for request in expired:
+            if not request.future.done():
+                self.timed_out += 1
+                request.future.set_exception(self.timeout_error(
+                    "request %s timed out" % request.id
+                ))
+
+    def adopt(self, request):
+        """
+        Answer a request that was received from another hive through the
+        clients of this tracker.
+
+        :param request:
+        """
+        if request._tracker is None:
+            request._tracker = self
+
+    def reply(self, address, data):
+        """
+        Send the pickled result of a request of another hive to its reply
+        server.
+
+        :param address: address of the reply server
+        :param data:
+        """
+        # pyzmq is only required to answer the requests of other hives
+        from .socket import Client
+        import zmq
+        with self._clients_lock:
+            client = self._clients.get(address)
+            if client is None:
+                client = Client(address)
+                client.connect()
+                self._clients[address] = client
+            try:
+                client.send(data)
+            except zmq.ZMQError:
+                # The requesting hive is gone or not keeping up, so the
+                # request times out instead
+                pass
+
+    def close(self):
+        """
+        Shut down the clients that sent results to other hives.
+
+        """
+        with self._clients_lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.shutdown()
+
+    def _new_future(self):
+        future = Future()
+        # The caller can no longer cancel the future once it is running
+        future.set_running_or_notify_cancel()
+        return future
@@ -0,0 +1,104 @@
+from collections import Counter
+from time import time
+
+
+class LoadShedder:
+    """
+    Decides which events the hive drops before they are dispatched.
+
+    An event expires once it is older than its TTL, which is the ``ttl`` of
+    the event itself, or else the TTL of its topic, or else the default TTL.
+    In adaptive mode the shedder also tracks how long events wait in the
+    event queue, and while that latency exceeds ``target_latency`` it sheds
+    the events of the topics with the lowest priority, raising the
+    shedding level one priority at a time until the latency recovers.
+
+    :param ttl: default number of seconds an event is worth dispatching,
+        or None for no limit
+    :param topic_ttls: dict of topic to TTL
+    :param target_latency: target number of seconds between the creation
+        and the dispatch of events, or None to disable adaptive shedding
+    :param priorities: dict of topic to priority, events of topics with
+        higher priorities are shed last. Events with a priority of their own
+        keep it, and other topics default to priority 0.
+    :param smoothing: weight of each new latency sample in the moving
+        average of the queue latency
+    :param adjust_interval: minimum number of seconds between changes of
+        the shedding level
+    """
+    def __init__(self, ttl=None, topic_ttls=None, target_latency=None,
+                 priorities=None, smoothing=0.1, adjust_interval=0.1):
+        self.ttl = ttl
+        self.topic_ttls = dict(topic_ttls or {})
+        self.target_latency = target_latency
+        self.priorities = dict(priorities or {})
+        self.smoothing = smoothing
+        self.adjust_interval = adjust_interval
+        self.latency = 0.0
+        # Events with a priority below the level are shed
+        self.level = None
+        # Number of dropped events per topic
+        self.expired = Counter()
+        self.shed = Counter()
+        self._levels = sorted(set(self.priorities.values()) | {0})
+        self._adjusted_at = None
+
+    def stats(self):
+        """
+        Return the number of expired and shed events per topic.
+
+        :return: dict of topic to dict with 'expired' and 'shed' counts
+        """
+        return {
+            topic: {'expired': self.expired[topic], 'shed': self.shed[topic]}
+            for topic in set(self.expired) | set(self.shed)
+        }
+
+    def should_drop(self, event, now=None):
+        """
+        Return True if the event should be dropped instead of dispatched.
+
+        :param event:
+        :param now: current time, defaults to time()
+        :return:
+        """
+        if now is None:
+            now = time()
+        age = now - event.created_at
+        ttl = event.ttl
+        if ttl is None:
+            ttl = self.topic_ttls.get(event.topic, self.ttl)
+        if ttl is not None and age > ttl:
+            self.expired[event.topic] += 1
+            return True
+        if self.target_latency is None:
+            return False
+        self._adapt(age, now)
+        if self.level is not None and self._priority(event) < self.level:
+            self.shed[event.topic] += 1
+            return True
+        return False
+
+    def _priority(self, event):
+        if event.priority is not None:
+            return event.priority
+        return self.priorities.get(event.topic, 0)
+
+    def _adapt(self, age, now):
+        self.latency += self.smoothing * (age - self.latency)
+        if self._adjusted_at is not None \
+                and now - self._adjusted_at < self.adjust_interval:
+            return
+        level = self.level
+        if self.latency > self.target_latency:
+            # Shed the next priority, but never the highest one
+            if self.level is None:
+                self.level = self._levels[min(1, len(self._levels) - 1)]
+            elif self.level != self._levels[-1]:
+                self.level = self._levels[self._levels.index(self.level) + 1]
+        elif self.latency < self.target_latency / 2 \
+                and self.level is not None:
+            i = self._levels.index(self.level)
+            self.level = self._levels[i - 1] if i > 1 else None
+        if self.level != level:
+            self._adjusted_at = now
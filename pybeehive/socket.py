@@ -1,17 +1,51 @@
-from queue import Empty, Queue
-from threading import Thread
+from collections import deque
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+import pickle
 import time
 import zmq
 from .core import Streamer, Listener, Event, Killable
+from .partition import HashRing
+from .reliable import ReliableReceiver, ReliableSender
+from .spill import SpillQueue
+from .utils import Inbox
+
+
+def set_hwm(socket, sndhwm=None, rcvhwm=None):
+    """
+    Set the ZeroMQ high-water marks of a socket, i.e. the number of
+    messages it queues per peer before sending blocks or messages are
+    dropped. Options that are None keep the ZeroMQ default.
+
+    :param socket:
+    :param sndhwm: send high-water mark
+    :param rcvhwm: receive high-water mark
+    """
+    if sndhwm is not None:
+        socket.setsockopt(zmq.SNDHWM, sndhwm)
+    if rcvhwm is not None:
+        socket.setsockopt(zmq.RCVHWM, rcvhwm)
 
 
 class Server(Killable):
-    def __init__(self, address):
+    """
+
+    :param address:
+    :param sndhwm: send high-water mark of the socket
+    :param rcvhwm: receive high-water mark of the socket
+    :param codec: :class:`~pybeehive.codec.FrameCodec` that decodes the
+        frames of clients with a codec
+    """
+    socket_type = zmq.PULL
+
+    def __init__(self, address, sndhwm=None, rcvhwm=None, codec=None):
         super(Server, self).__init__()
         self.address = address
+        self.codec = codec
         self.queue = Queue()
         self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.PULL)
+        self.socket = self.context.socket(self.socket_type)
+        set_hwm(self.socket, sndhwm, rcvhwm)
         self._listener_thread = None
 
     def _receive_into_queue(self):
@@ -21,7 +55,14 @@ class Server(Killable):
             except zmq.error.ZMQError:
                 time.sleep(1e-6)
             else:
-                self.queue.put(data)
+                self._enqueue(data)
+
+    def _enqueue(self, data):
+        if self.codec is None:
+            self.queue.put(data)
+        else:
+            for payload in self.codec.decode(data):
+                self.queue.put(payload)
 
     def iter_messages(self):
         while not self.kill_event.is_set():
@@ -46,33 +87,308 @@ class Server(Killable):
 
 
 class Client(Killable):
-    def __init__(self, address):
+    """
+    By default messages are sent straight to the socket, which raises
+    :class:`zmq.Again` when it is full. With a ``buffer_size`` messages are
+    put into a local bounded buffer instead and sent by a background
+    thread, and when the buffer is full:
+
+    * ``'block'`` waits for free space, so the listener blocks
+    * ``'drop'`` drops the message
+    * ``'spill'`` spills the message to disk, see
+      :class:`~pybeehive.spill.SpillQueue`
+
+    :param address:
+    :param sndhwm: send high-water mark of the socket
+    :param rcvhwm: receive high-water mark of the socket
+    :param buffer_size: number of messages buffered in memory,
+        0 to send directly
+    :param overflow: overflow policy of the buffer
+    :param linger: number of seconds :meth:`shutdown` waits for the
+        buffered messages
+    :param codec: :class:`~pybeehive.codec.FrameCodec` that encodes, and
+        e.g. compresses, the messages
+    :param batch_size: maximum number of buffered messages sent together
+        in one frame, which requires a buffer and a codec
+    """
+    socket_type = zmq.PUSH
+    overflow_policies = ('block', 'drop', 'spill')
+
+    def __init__(self, address, sndhwm=None, rcvhwm=None, buffer_size=0,
+                 overflow='block', linger=1.0, codec=None, batch_size=1):
+        if overflow not in self.overflow_policies:
+            raise ValueError("overflow must be one of %s, not %r"
+                             % (', '.join(self.overflow_policies), overflow))
+        if batch_size > 1 and (codec is None or not buffer_size):
+            raise ValueError("batching requires a buffer and a codec")
         super(Client, self).__init__()
         self.address = address
+        self.overflow = overflow
+        self.linger = linger
+        self.codec = codec
+        self.batch_size = batch_size
         self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.PUSH)
+        self.socket = self.context.socket(self.socket_type)
+        set_hwm(self.socket, sndhwm, rcvhwm)
+        self.buffer = None
+        if buffer_size and overflow == 'spill':
+            self.buffer = SpillQueue(memory_limit=buffer_size)
+        elif buffer_size:
+            self.buffer = Inbox(buffer_size, overflow={
+                'block': 'block', 'drop': 'drop_newest'
+            }[overflow])
+        self._flusher_thread = None
+
+    def stats(self):
+        """
+        Return the metrics of the send buffer.
+
+        :return: dict with the number of buffered messages and the number
+            of dropped and spilled messages
+        """
+        if self.buffer is None:
+            return {'depth': 0, 'dropped': 0, 'spilled': 0}
+        return {
+            'depth': self.buffer.qsize(),
+            'dropped': getattr(self.buffer, 'dropped', 0),
+            'spilled': getattr(self.buffer, 'spilled', 0),
+        }
 
     def send(self, data):
+        if self.buffer is not None:
+            # Waits for room in the buffer until the client is killed,
+            # e.g. by the hive closing
+            while self.alive:
+                try:
+                    return self.buffer.put(data, timeout=0.01)
+                except Full:
+                    continue
+            return
+        if self.codec is not None:
+            data = self.codec.encode(data)
         while self.alive:
             return self.socket.send(data, flags=zmq.NOBLOCK)
 
     def connect(self):
         self.socket.connect('tcp://%s:%s' % self.address)
+        if self.buffer is not None:
+            self._flusher_thread = Thread(target=self._flush_buffer)
+            self._flusher_thread.start()
 
     def shutdown(self):
+        if self._flusher_thread is not None:
+            deadline = time.monotonic() + self.linger
+            while self.buffer.unfinished_tasks \
+                    and time.monotonic() < deadline:
+                time.sleep(1e-3)
         self.kill_event.set()
+        if self._flusher_thread is not None:
+            self._flusher_thread.join()
+        if self.overflow == 'spill' and self.buffer is not None:
+            self.buffer.close()
         self.socket.close(linger=0)
 
+    def _flush_buffer(self):
+        while self.alive:
+            try:
+                batch = [self.buffer.get(timeout=0.01)]
+            except Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.buffer.get_nowait())
+                except Empty:
+                    break
+            data = self._encode(batch)
+            while self.alive:
+                if self.socket.poll(10, zmq.POLLOUT):
+                    self.socket.send(data, flags=zmq.NOBLOCK)
+                    break
+            for _ in batch:
+                self.buffer.task_done()
+
+    def _encode(self, batch):
+        if self.codec is None:
+            return batch[0]
+        if len(batch) == 1:
+            return self.codec.encode(batch[0])
+        return self.codec.encode_batch(batch)
+
+
+class ReliableServer(Server):
+    """
+    Server that receives the frames of :class:`ReliableClient` on a ROUTER
+    socket, suppresses duplicates and acknowledges them in batches,
+    see :class:`~pybeehive.reliable.ReliableReceiver`. Messages are
+    acknowledged once they are in the queue of the server.
+
+    :param address:
+    :param ack_every:
+    :param ack_interval:
+    :param sndhwm:
+    :param rcvhwm:
+    :param codec:
+    """
+    socket_type = zmq.ROUTER
+
+    def __init__(self, address, ack_every=256, ack_interval=0.01,
+                 sndhwm=None, rcvhwm=None, codec=None):
+        super(ReliableServer, self).__init__(address, sndhwm, rcvhwm, codec)
+        self.receiver = ReliableReceiver(ack_every, ack_interval)
+
+    def _receive_into_queue(self):
+        receiver = self.receiver
+        while self.alive:
+            if self.socket.poll(1, zmq.POLLIN):
+                # Bound the batch so that acks are not held back
+                for _ in range(receiver.ack_every):
+                    try:
+                        peer, frame = self.socket.recv_multipart(
+                            flags=zmq.NOBLOCK
+                        )
+                    except zmq.Again:
+                        break
+                    payload = receiver.receive(peer, frame)
+                    if payload is not None:
+                        self._enqueue(payload)
+            for peer, ack in receiver.acks():
+                try:
+                    self.socket.send_multipart([peer, ack], flags=zmq.NOBLOCK)
+                except zmq.ZMQError:
+                    pass  # the sender resends and is acknowledged again
+
+
+class ReliableClient(Client):
+    """
+    Client that delivers every message at least once to a
+    :class:`ReliableServer`. Messages are numbered and kept in a replay
+    buffer until they are acknowledged, and are sent again when their ack
+    times out, see :class:`~pybeehive.reliable.ReliableSender`. A thread
+    owns the DEALER socket; :meth:`send` blocks while ``window`` messages
+    wait for it and ``window`` more wait for their acks. Messages that do
+    not fit into the socket wait in order until it can take them.
+
+    :param address:
+    :param window: maximum number of unacknowledged messages
+    :param ack_timeout: number of seconds to wait for an ack before resending
+    :param linger: number of seconds :meth:`shutdown` waits for the
+        unacknowledged messages
+    :param sndhwm:
+    :param rcvhwm:
+    :param codec:
+    """
+    socket_type = zmq.DEALER
+
+    def __init__(self, address, window=10000, ack_timeout=0.2, linger=1.0,
+                 sndhwm=None, rcvhwm=None, codec=None):
+        super(ReliableClient, self).__init__(address, sndhwm, rcvhwm,
+                                             linger=linger, codec=codec)
+        self.sender = ReliableSender(window, ack_timeout)
+        self._outbox = Queue(maxsize=window)
+        self._backlog = deque()
+        self._sender_thread = None
+
+    @property
+    def pending(self):
+        """
+        Number of messages that were not acknowledged yet.
+
+        :return:
+        """
+        return self._outbox.qsize() + len(self.sender)
+
+    def send(self, data):
+        if self.codec is not None:
+            data = self.codec.encode(data)
+        while self.alive:
+            try:
+                return self._outbox.put(data, timeout=0.01)
+            except Full:
+                continue
+
+    def stats(self):
+        return {'depth': self.pending, 'dropped': 0, 'spilled': 0}
+
+    def connect(self):
+        super(ReliableClient, self).connect()
+        self._sender_thread = Thread(target=self._send_from_outbox)
+        self._sender_thread.start()
+
+    def shutdown(self):
+        if self._sender_thread is not None:
+            deadline = time.monotonic() + self.linger
+            while self.pending and time.monotonic() < deadline:
+                time.sleep(1e-3)
+            self.kill_event.set()
+            self._sender_thread.join()
+        super(ReliableClient, self).shutdown()
+
+    def _send_from_outbox(self):
+        sender, backlog = self.sender, self._backlog
+        while self.alive:
+            resend = sender.due()
+            if resend:
+                backlog.clear()
+                backlog.extend(resend)
+            moved = 0
+            while not sender.full:
+                try:
+                    data = self._outbox.get_nowait()
+                except Empty:
+                    break
+                backlog.append(sender.wrap(data))
+                moved += 1
+            # Frames wait in order while the socket is full, so that
+            # they do not leave gaps the receiver would have to drop
+            while backlog:
+                try:
+                    self.socket.send(backlog[0], flags=zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                backlog.popleft()
+            flags = zmq.POLLIN | zmq.POLLOUT if backlog else zmq.POLLIN
+            if self.socket.poll(0 if moved else 1, flags) & zmq.POLLIN:
+                while True:
+                    try:
+                        sender.receive(self.socket.recv(flags=zmq.NOBLOCK))
+                    except zmq.Again:
+                        break
+
+
+class ReplyServer(Server):
+    """
+    Server that receives the results of the requests that other hives
+    handled, see :class:`~pybeehive.rpc.RemoteRequest`, and completes
+    the requests of ``tracker`` with them.
+
+    :param address:
+    :param tracker: :class:`~pybeehive.rpc.RequestTracker`
+    :param server_kwargs:
+    """
+    def __init__(self, address, tracker, **server_kwargs):
+        super(ReplyServer, self).__init__(address, **server_kwargs)
+        self.tracker = tracker
+
+    def _enqueue(self, data):
+        id, result, error = pickle.loads(data)
+        self.tracker.complete(id, result, error)
+
 
 class SocketStreamer(Streamer):
     """
 
     :param address:
     :param topic:
+    :param reliable: receive from reliable socket listeners,
+        see :class:`ReliableServer`
+    :param server_kwargs: keyword arguments of the server, e.g. its
+        high-water marks
     """
-    def __init__(self, address, topic=None):
+    def __init__(self, address, topic=None, reliable=False, **server_kwargs):
         super(SocketStreamer, self).__init__(topic=topic)
-        self.server = Server(address)
+        self.server = (ReliableServer if reliable else Server)(
+            address, **server_kwargs
+        )
 
     def setup(self):
         self.server.start()
@@ -84,7 +400,8 @@ class SocketStreamer(Streamer):
         for msg in self.server.iter_messages():
             event = Event.fromstring(msg)
             yield Event(
-                event.data, topic=self.topic, created_at=event.created_at
+                event.data, topic=self.topic, created_at=event.created_at,
+                request=event.request
             )
 
 
@@ -93,10 +410,17 @@ class SocketListener(Listener):
 
     :param address:
     :param filters:
+    :param reliable: deliver every event at least once to a reliable
+        socket streamer, see :class:`ReliableClient`
+    :param client_kwargs: keyword arguments of the client, e.g. its
+        high-water marks and send buffer
     """
-    def __init__(self, address, filters=None):
+    def __init__(self, address, filters=None, reliable=False,
+                 **client_kwargs):
         super(SocketListener, self).__init__(filters=filters)
-        self.client = Client(address)
+        self.reliable = reliable
+        self.client_kwargs = client_kwargs
+        self.client = self._create_client(address)
 
     def setup(self):
         self.client.connect()
@@ -104,9 +428,19 @@ class SocketListener(Listener):
     def teardown(self):
         self.client.shutdown()
 
+    def interrupt(self):
+        """
+        Stop waiting for the peer to take events, e.g. when the hive closes.
+        Events that were not sent yet are dropped.
+
+        """
+        self.client.kill()
+
     def on_event(self, event):
         result = self.parse_event(event)
-        self.client.send(result.tostring())
+        if result.request is None:
+            result.request = getattr(event, 'request', None)
+        self._send(result)
 
     def parse_event(self, event):
         """
@@ -115,3 +449,102 @@ class SocketListener(Listener):
         :return:
         """
         return event  # pragma: nocover
+
+    def _create_client(self, address):
+        return (ReliableClient if self.reliable else Client)(
+            address, **self.client_kwargs
+        )
+
+    def _send(self, event):
+        self.client.send(event.tostring())
+
+
+def _topic(event):
+    return event.topic
+
+
+class PartitionedSocketListener(SocketListener):
+    """
+    Socket listener that sends each event to one of many socket streamers,
+    the node of its key on a consistent :class:`~pybeehive.partition.HashRing`,
+    so the events of a key always go to the same node. It keeps a client
+    connected to every node, and nodes can be added and removed while the
+    hive runs, which only moves the keys of about one node.
+
+    :param addresses: addresses of the nodes
+    :param filters:
+    :param key: callable that returns the partition key of an event,
+        by default its topic
+    :param replicas: number of virtual nodes of each node on the ring
+    :param reliable:
+    :param client_kwargs:
+    """
+    def __init__(self, addresses, filters=None, key=None, replicas=100,
+                 reliable=False, **client_kwargs):
+        super(SocketListener, self).__init__(filters=filters)
+        self.reliable = reliable
+        self.client_kwargs = client_kwargs
+        self.key = key or _topic
+        self.ring = HashRing(replicas=replicas)
+        self.clients = {}
+        self._connected = False
+        self._lock = Lock()
+        for address in addresses:
+            self.add_node(address)
+
+    def setup(self):
+        with self._lock:
+            for client in self.clients.values():
+                client.connect()
+            self._connected = True
+
+    def teardown(self):
+        with self._lock:
+            clients, self.clients = list(self.clients.values()), {}
+            self._connected = False
+        for client in clients:
+            client.shutdown()
+
+    def interrupt(self):
+        for client in list(self.clients.values()):
+            client.kill()
+
+    def add_node(self, address):
+        """
+        Start sending the keys of a new node to it.
+
+        :param address:
+        """
+        with self._lock:
+            if address in self.clients:
+                return
+            client = self._create_client(address)
+            if self._connected:
+                client.connect()
+            self.clients[address] = client
+            self.ring.add(address)
+
+    def remove_node(self, address):
+        """
+        Stop sending events to a node, its keys go to the other nodes.
+        The events that were not sent to the node yet are dropped.
+
+        :param address:
+        """
+        client = self.clients.get(address)
+        # A send that waits for the node returns once its client is killed
+        if client is not None:
+            client.kill()
+        with self._lock:
+            client = self.clients.pop(address, None)
+            self.ring.remove(address)
+        # No event is sent to the client anymore once it left the ring
+        if client is not None:
+            client.shutdown()
+
+    def _send(self, event):
+        data = event.tostring()
+        with self._lock:
+            client = self.clients[self.ring.get(self.key(event))]
+        # A node that is down blocks the send, so the lock is not held
+        client.send(data)
@@ -0,0 +1,201 @@
+from collections import deque
+from itertools import count
+import io
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+from .rpc import Request
+from .utils import Queue
+
+_LENGTH = struct.Struct('>I')
+
+
+class _Pickler(pickle.Pickler):
+    def __init__(self, file, requests):
+        super(_Pickler, self).__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.requests = requests
+
+    def persistent_id(self, obj):
+        # Requests are resolved by this process, so they stay in memory
+        if isinstance(obj, Request):
+            self.requests[obj.id] = obj
+            return obj.id
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file, requests):
+        super(_Unpickler, self).__init__(file)
+        self.requests = requests
+
+    def persistent_load(self, pid):
+        return self.requests.pop(pid, None)
+
+
+class SpillBuffer:
+    """
+    Queue storage that keeps at most ``memory_limit`` items in memory and
+    spills the rest to segment files on local disk, as length-prefixed
+    pickles. Once items have been spilled, new items are spilled too until
+    the disk backlog drains, so items always come out in the order they
+    went in. Spilled items are read back into memory in chunks, and
+    segments are deleted as soon as they have been read. The requests of
+    spilled events, see :meth:`pybeehive.Hive.request`, are kept in
+    memory by their id, so that they are still resolved once the events
+    are read back.
+
+    :param memory_limit: maximum number of items kept in memory
+    :param directory: directory of the segment files, by default a new
+        temporary directory that is removed by :meth:`close`
+    :param segment_size: number of bytes after which a new segment is started
+    """
+    segment_suffix = '.spill'
+
+    def __init__(self, memory_limit=10000, directory=None,
+                 segment_size=8 * 2 ** 20):
+        if memory_limit < 1:
+            raise ValueError("memory_limit must be at least 1")
+        self.memory_limit = memory_limit
+        self.segment_size = segment_size
+        self._own_directory = directory is None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix='pybeehive-spill-')
+        else:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        # Total number of items that were ever spilled, for monitoring
+        self.spilled = 0
+        self.on_disk = 0
+        self._memory = deque()
+        self._segments = deque()
+        self._names = count()
+        self._writer = None
+        self._written = 0
+        self._reader = None
+        # Requests of the spilled items by their id
+        self._requests = {}
+
+    def __len__(self):
+        return len(self._memory) + self.on_disk
+
+    def __iter__(self):
+        # Only the items in memory, reading the disk would consume it
+        return iter(self._memory)
+
+    def append(self, item):
+        """
+
+        :param item:
+        """
+        if not self.on_disk and len(self._memory) < self.memory_limit:
+            self._memory.append(item)
+        else:
+            self._spill(item)
+
+    def popleft(self):
+        """
+
+        :return:
+        """
+        if not self._memory and self.on_disk:
+            self._load()
+        return self._memory.popleft()
+
+    def close(self):
+        """
+        Delete the spilled items and the segment files.
+
+        """
+        self._clear_disk()
+        if self._own_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _spill(self, item):
+        if self._writer is None or self._written >= self.segment_size:
+            self._rotate()
+        buffer = io.BytesIO()
+        _Pickler(buffer, self._requests).dump(item)
+        data = buffer.getvalue()
+        self._writer.write(_LENGTH.pack(len(data)))
+        self._writer.write(data)
+        self._written += _LENGTH.size + len(data)
+        self.on_disk += 1
+        self.spilled += 1
+
+    def _rotate(self):
+        if self._writer is not None:
+            self._writer.close()
+        path = os.path.join(self.directory, '%012d%s' % (
+            next(self._names), self.segment_suffix))
+        self._writer = open(path, 'wb')
+        self._written = 0
+        self._segments.append(path)
+
+    def _load(self):
+        if self._writer is not None:
+            self._writer.flush()
+        while self.on_disk and len(self._memory) < self.memory_limit:
+            if self._reader is None:
+                self._reader = open(self._segments[0], 'rb')
+            header = self._reader.read(_LENGTH.size)
+            if len(header) < _LENGTH.size:
+                # Every segment but the one being written is complete
+                self._reader.close()
+                self._reader = None
+                os.remove(self._segments.popleft())
+                continue
+            length, = _LENGTH.unpack(header)
+            data = io.BytesIO(self._reader.read(length))
+            self._memory.append(_Unpickler(data, self._requests).load())
+            self.on_disk -= 1
+        if not self.on_disk:
+            self._clear_disk()
+
+    def _clear_disk(self):
+        for f in (self._reader, self._writer):
+            if f is not None:
+                f.close()
+        self._reader = self._writer = None
+        while self._segments:
+            try:
+                os.remove(self._segments.popleft())
+            except OSError:
+                pass
+        self.on_disk = 0
+        self._requests.clear()
+
+
+class SpillQueue(Queue):
+    """
+    Unbounded event queue that keeps memory usage flat during traffic
+    spikes by spilling the overflow to disk, see :class:`SpillBuffer`.
+
+    :param memory_limit:
+    :param directory:
+    :param segment_size:
+    """
+    def __init__(self, memory_limit=10000, directory=None,
+                 segment_size=8 * 2 ** 20):
+        self._spill_args = (memory_limit, directory, segment_size)
+        super(SpillQueue, self).__init__()
+
+    @property
+    def spilled(self):
+        return self.queue.spilled
+
+    @property
+    def on_disk(self):
+        return self.queue.on_disk
+
+    def close(self):
+        """
+        Delete the spilled events and the segment files.
+
+        """
+        with self.mutex:
+            self.queue.close()
+
+    def _init(self, maxsize):
+        self.queue = SpillBuffer(*self._spill_args)
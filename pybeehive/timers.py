@@ -0,0 +1,364 @@
+from datetime import datetime, timedelta
+from heapq import heappush, heappop
+from itertools import count
+from math import floor
+from threading import Event as _Event, Lock
+import random
+from .core import Streamer, Event
+
+
+class Timer:
+    """
+    Base class for schedules that are served by a :class:`TimerStreamer`.
+    When a timer fires ``func`` is called without arguments, and if it
+    returns something other than None the result is streamed as an event.
+
+    :param func: function to call every time the timer fires
+    :param topic: topic of the events created from the results of func
+    :param jitter: maximum number of random seconds to delay each firing by
+    """
+    def __init__(self, func, topic=None, jitter=0):
+        self.func = func
+        self.topic = topic
+        self.jitter = jitter
+        self.fired = 0
+
+    def __str__(self):
+        return "%s(func=%s, topic=%s)" % (
+            self.__class__.__name__, getattr(self.func, '__name__', None),
+            self.topic
+        )
+
+    def first(self, now):
+        """
+        Return the time at which the timer should fire for the first time.
+
+        :param now:
+        :return:
+        """
+        raise NotImplementedError  # pragma: nocover
+
+    def next(self, scheduled, now):
+        """
+        Return the time at which the timer should fire after firing at
+        ``scheduled``, or None if the timer should not fire again.
+
+        :param scheduled:
+        :param now:
+        :return:
+        """
+        raise NotImplementedError  # pragma: nocover
+
+
+class Interval(Timer):
+    """
+    Fire every ``interval`` seconds. Firing times are computed from the
+    previous scheduled time rather than the time the timer actually fired,
+    so the schedule does not drift, and firings that were missed because
+    the timer fell behind are skipped.
+
+    :param func:
+    :param interval: number of seconds between firings
+    :param topic:
+    :param jitter:
+    """
+    def __init__(self, func, interval, topic=None, jitter=0):
+        super(Interval, self).__init__(func, topic=topic, jitter=jitter)
+        if interval <= 0:
+            raise ValueError("interval must be a positive number of seconds")
+        self.interval = interval
+
+    def first(self, now):
+        return now + self.interval
+
+    def next(self, scheduled, now):
+        missed = floor((now - scheduled) / self.interval)
+        return scheduled + self.interval * (max(missed, 0) + 1)
+
+
+class Once(Timer):
+    """
+    Fire once, ``delay`` seconds after the timer is scheduled.
+
+    :param func:
+    :param delay: number of seconds to wait before firing
+    :param topic:
+    :param jitter:
+    """
+    def __init__(self, func, delay=0, topic=None, jitter=0):
+        super(Once, self).__init__(func, topic=topic, jitter=jitter)
+        self.delay = delay
+
+    def first(self, now):
+        return now + self.delay
+
+    def next(self, scheduled, now):
+        return None
+
+
+class Cron(Timer):
+    """
+    Fire at the times matched by a cron expression, evaluated in local time.
+    Expressions have the five standard fields (minute, hour, day of month,
+    month, day of week) and support ``*``, ``a-b``, ``a,b``, ``*/n`` and
+    ``a-b/n``, as well as the ``@hourly``, ``@daily``, ``@weekly``,
+    ``@monthly`` and ``@yearly`` aliases.
+
+    :param func:
+    :param expression: cron expression, e.g. ``'*/5 * * * *'``
+    :param topic:
+    :param jitter:
+    """
+    aliases = {
+        '@yearly': '0 0 1 1 *',
+        '@annually': '0 0 1 1 *',
+        '@monthly': '0 0 1 * *',
+        '@weekly': '0 0 * * 0',
+        '@daily': '0 0 * * *',
+        '@midnight': '0 0 * * *',
+        '@hourly': '0 * * * *',
+    }
+    _bounds = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, func, expression, topic=None, jitter=0):
+        super(Cron, self).__init__(func, topic=topic, jitter=jitter)
+        self.expression = expression
+        fields = self.aliases.get(expression, expression).split()
+        if len(fields) != 5:
+            raise ValueError("cron expression must have 5 fields: %s"
+                             % expression)
+        self.minutes, self.hours, self.days, self.months, weekdays = [
+            self._parse_field(f, lo, hi)
+            for f, (lo, hi) in zip(fields, self._bounds)
+        ]
+        # Both 0 and 7 mean sunday
+        self.weekdays = {d % 7 for d in weekdays}
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def first(self, now):
+        return self.next_after(now)
+
+    def next(self, scheduled, now):
+        return self.next_after(max(scheduled, now))
+
+    def next_after(self, timestamp):
+        """
+        Return the first time matched by the expression after timestamp.
+
+        :param timestamp:
+        :return:
+        """
+        dt = datetime.fromtimestamp(timestamp).replace(
+            second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt.year + 5
+        while dt.year <= limit:
+            if dt.month not in self.months:
+                dt = dt.replace(day=1, hour=0, minute=0)
+                dt = (dt + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt.timestamp()
+        raise ValueError("cron expression never matches: %s"
+                         % self.expression)
+
+    def _day_matches(self, dt):
+        day = dt.day in self.days
+        weekday = dt.isoweekday() % 7 in self.weekdays
+        # Standard cron semantics: if both day fields are restricted
+        # then a day matches if either of the fields matches
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+    @staticmethod
+    def _parse_field(field, lo, hi):
+        values = set()
+        for part in field.split(','):
+            rng, _, step = part.partition('/')
+            try:
+                step = int(step) if step else 1
+                if rng == '*':
+                    start, stop = lo, hi
+                elif '-' in rng:
+                    start, stop = map(int, rng.split('-'))
+                else:
+                    start = stop = int(rng)
+            except ValueError:
+                raise ValueError("invalid cron field: %s" % field)
+            if not lo <= start <= stop <= hi or step < 1:
+                raise ValueError("invalid cron field: %s" % field)
+            values.update(range(start, stop + 1, step))
+        return values
+
+
+class TimerHeap:
+    """
+    Heap of timers ordered by the time they should fire next.
+    """
+    def __init__(self):
+        self._heap = []
+        self._counter = count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, timer, now):
+        """
+
+        :param timer:
+        :param now:
+        """
+        self._schedule(timer, timer.first(now))
+
+    def pop_due(self, now):
+        """
+        Pop every timer that is due at ``now`` and reschedule it.
+
+        :param now:
+        :return: list of (scheduled time, timer) tuples in firing order
+        """
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, scheduled, timer = heappop(self._heap)
+            timer.fired += 1
+            due.append((scheduled, timer))
+            next_time = timer.next(scheduled, now)
+            if next_time is not None:
+                self._schedule(timer, next_time)
+        return due
+
+    def next_time(self):
+        """
+        Return the time the next timer is due, or None if there are no timers.
+
+        :return:
+        """
+        return self._heap[0][0] if self._heap else None
+
+    def delay(self, now):
+        """
+        Return the number of seconds until the next timer is due,
+        or None if there are no timers.
+
+        :param now:
+        :return:
+        """
+        if not self._heap:
+            return None
+        return max(self._heap[0][0] - now, 0)
+
+    def _schedule(self, timer, scheduled):
+        fire_at = scheduled
+        if timer.jitter:
+            fire_at += random.uniform(0, timer.jitter)
+        heappush(self._heap, (fire_at, next(self._counter), scheduled, timer))
+
+
+class TimerStreamer(Streamer):
+    """
+    Streamer that serves any number of timers from a single thread.
+
+    :param topic:
+    """
+    _wakeup_class = _Event
+
+    def __init__(self, topic=None):
+        super(TimerStreamer, self).__init__(topic=topic)
+        # Whether the timers are fired by a virtual clock
+        self.clock_driven = False
+        self.timers = []
+        self._heap = TimerHeap()
+        self._lock = Lock()
+        self._wakeup = self._wakeup_class()
+
+    def add_timer(self, timer):
+        """
+
+        :param timer:
+        """
+        with self._lock:
+            self.timers.append(timer)
+            self._heap.push(timer, self.clock.time())
+        self._wakeup.set()
+
+    def kill(self):
+        super(TimerStreamer, self).kill()
+        self._wakeup.set()
+
+    def attach(self, virtual_clock):
+        """
+        Let a :class:`~pybeehive.clock.VirtualClock` fire the timers while
+        it advances, instead of the streamer's thread.
+
+        :param virtual_clock:
+        """
+        self._reschedule()
+        self.clock_driven = True
+        virtual_clock.add_scheduler(self)
+
+    def detach(self, virtual_clock):
+        """
+
+        :param virtual_clock:
+        """
+        virtual_clock.remove_scheduler(self)
+        self.clock_driven = False
+
+    def next_due(self):
+        """
+
+        :return:
+        """
+        with self._lock:
+            return self._heap.next_time()
+
+    def fire_due(self, now):
+        """
+        Fire the timers that are due and return their events.
+
+        :param now:
+        :return:
+        """
+        with self._lock:
+            due = self._heap.pop_due(now)
+        return list(self._fire(due, now))
+
+    def stream(self):
+        if self.clock_driven:
+            self.kill_event.wait()
+            return
+        self._reschedule()
+        while self.alive:
+            self._wakeup.clear()
+            now = self.clock.time()
+            with self._lock:
+                due = self._heap.pop_due(now)
+                delay = self._heap.delay(now)
+            for event in self._fire(due, now):
+                yield event
+            if not due:
+                self.clock.wait(self._wakeup, delay)
+
+    def _fire(self, due, now):
+        for scheduled, timer in due:
+            try:
+                result = timer.func()
+            except Exception as e:
+                self.on_exception(e)
+            else:
+                if result is not None:
+                    yield Event(result, topic=timer.topic, created_at=now)
+
+    def _reschedule(self):
+        # Timers added before the hive started are scheduled from the time
+        # of the clock the hive runs with, which may be a virtual clock
+        with self._lock:
+            self._heap = TimerHeap()
+            for timer in self.timers:
+                self._heap.push(timer, self.clock.time())
@@ -0,0 +1,144 @@
+SEPARATOR = '.'
+# Matches exactly one segment of a topic
+ONE = '*'
+# Matches zero or more segments of a topic
+ANY = '#'
+
+
+def is_pattern(topic):
+    """
+    Return True if topic is a :class:`Pattern`.
+
+    :param topic:
+    :return:
+    """
+    return isinstance(topic, Pattern)
+
+
+def validate_pattern(pattern):
+    """
+    Raise a ValueError if a wildcard is used as part of a segment
+    instead of a whole segment, e.g. ``'orders.eu*'``.
+
+    :param pattern:
+    """
+    for segment in pattern.split(SEPARATOR):
+        if segment not in (ONE, ANY) and (ONE in segment or ANY in segment):
+            raise ValueError(
+                "wildcards must be whole topic segments: %s" % pattern
+            )
+
+
+class Pattern(str):
+    """
+    Dotted topic filter with wildcard segments, in which a ``*`` segment
+    matches exactly one segment and a ``#`` segment matches zero or more
+    segments, e.g. ``Pattern('orders.*.created')``. Filters that are plain
+    strings only match the topic that is equal to them, even if they
+    contain ``*`` or ``#``.
+
+    :param pattern:
+    """
+    def __new__(cls, pattern):
+        validate_pattern(pattern)
+        return super(Pattern, cls).__new__(cls, pattern)
+
+    def __repr__(self):
+        return 'Pattern(%s)' % str.__repr__(self)
+
+
+class _Node:
+    __slots__ = ('children', 'one', 'any', 'terminal')
+
+    def __init__(self):
+        self.children = {}
+        self.one = None
+        self.any = None
+        self.terminal = False
+
+
+class TopicTrie:
+    """
+    Matches dotted topics against a set of filters. Filters can be exact
+    topics of any hashable type, or :class:`Pattern` instances in which a
+    ``*`` segment matches exactly one segment and a ``#`` segment matches
+    zero or more segments, e.g. ``Pattern('orders.eu.#')``.
+
+    Exact topics are matched with a single set lookup and patterns are
+    matched by walking a trie of their segments, so the cost of matching
+    depends on the depth of the topic rather than the number of filters.
+
+    :param patterns: iterable of filters
+    """
+    def __init__(self, patterns=()):
+        self._exact = set()
+        self._root = None
+        for pattern in patterns:
+            self.add(pattern)
+
+    def __bool__(self):
+        return bool(self._exact) or self._root is not None
+
+    def add(self, pattern):
+        """
+
+        :param pattern:
+        """
+        if not is_pattern(pattern):
+            self._exact.add(pattern)
+            return
+        if self._root is None:
+            self._root = _Node()
+        node = self._root
+        for segment in pattern.split(SEPARATOR):
+            if segment == ONE:
+                if node.one is None:
+                    node.one = _Node()
+                node = node.one
+            elif segment == ANY:
+                if node.any is None:
+                    node.any = _Node()
+                node = node.any
+            else:
+                child = node.children.get(segment)
+                if child is None:
+                    child = node.children[segment] = _Node()
+                node = child
+        node.terminal = True
+
+    def match(self, topic):
+        """
+        Return True if topic matches any of the filters.
+
+        :param topic:
+        :return:
+        """
+        try:
+            if topic in self._exact:
+                return True
+        except TypeError:
+            return False
+        if self._root is None or not isinstance(topic, str):
+            return False
+        segments = topic.split(SEPARATOR)
+        n = len(segments)
+        stack, seen = [(self._root, 0)], set()
+        while stack:
+            node, i = stack.pop()
+            if (id(node), i) in seen:
+                continue
+            seen.add((id(node), i))
+            if node.any is not None:
+                # '#' consumes any number of the remaining segments
+                for j in range(i, n + 1):
+                    stack.append((node.any, j))
+            if i == n:
+                if node.terminal:
+                    return True
+                continue
+            child = node.children.get(segments[i])
+            if child is not None:
+                stack.append((child, i + 1))
+            if node.one is not None:
+                stack.append((node.one, i + 1))
+        return False
@@ -0,0 +1,407 @@
+from bisect import insort
+from collections import OrderedDict, deque
+from queue import Queue as _Queue, Full
+from time import monotonic
+
+
+class Batch(list):
+    """
+    A list of items that a :class:`~pybeehive.Streamer` yields in one go.
+    Every item is wrapped in an Event and all of them are put into the
+    hive's event queue atomically, with a single wakeup of the dispatcher.
+    """
+    pass
+
+
+def topic_of(item):
+    return getattr(item, 'topic', None)
+
+
+class ConflationBuffer:
+    """
+    Queue storage that only keeps the newest item for each key. An item
+    that replaces a pending item with the same key takes over its position,
+    so items are consumed in the order their keys first arrived.
+
+    :param key: function that returns the key of an item
+    """
+    def __init__(self, key):
+        self.key = key
+        self.conflated = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def is_pending(self, key):
+        """
+
+        :param key:
+        :return: True if an item with the key is pending
+        """
+        return key in self._items
+
+    def append(self, item):
+        """
+        Add an item, replacing the pending item with the same key.
+
+        :param item:
+        :return: the replaced item, or None if no item was pending
+        """
+        key = self.key(item)
+        replaced = self._items.get(key)
+        self._items[key] = item
+        if replaced is not None:
+            self.conflated += 1
+        return replaced
+
+    def popleft(self):
+        """
+        Remove and return the item whose key arrived first.
+
+        :return:
+        """
+        return self._items.popitem(last=False)[1]
+
+
+class LaneBuffer:
+    """
+    Queue storage with one FIFO lane per priority. Without weights lanes
+    are served strictly by priority, highest first. With weights every lane
+    with pending items is served in proportion to its weight, using smooth
+    weighted round robin. In both modes an item that has waited longer than
+    ``max_wait`` is served next regardless of its lane, so that low
+    priorities are never starved.
+
+    :param weights: dict of priority to weight, or None for strict priority
+    :param topic_priorities: dict of topic to the priority of the events of
+        that topic that do not have a priority of their own
+    :param max_wait: maximum number of seconds an item waits before it is
+        promoted, or None to never promote items
+    """
+    def __init__(self, weights=None, topic_priorities=None, max_wait=1.0):
+        self.weights = dict(weights) if weights else None
+        self.topic_priorities = dict(topic_priorities or {})
+        self.max_wait = max_wait
+        self.promoted = 0
+        self._lanes = {}
+        # Priorities of the lanes, lowest first
+        self._priorities = []
+        self._credit = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for priority in reversed(self._priorities):
+            for _, item in self._lanes[priority]:
+                yield item
+
+    def lengths(self):
+        """
+        Return the number of pending items in each lane.
+
+        :return: dict of priority to number of items
+        """
+        return {p: len(lane) for p, lane in self._lanes.items()}
+
+    def priority_of(self, item):
+        """
+
+        :param item:
+        :return:
+        """
+        priority = getattr(item, 'priority', None)
+        if priority is None:
+            priority = self.topic_priorities.get(
+                getattr(item, 'topic', None), 0)
+        return priority
+
+    def append(self, item):
+        """
+
+        :param item:
+        """
+        priority = self.priority_of(item)
+        lane = self._lanes.get(priority)
+        if lane is None:
+            lane = self._lanes[priority] = deque()
+            self._credit[priority] = 0
+            insort(self._priorities, priority)
+        lane.append((monotonic(), item))
+        self._size += 1
+
+    def popleft(self):
+        """
+        Remove and return the next item to serve.
+
+        :return:
+        """
+        if not self._size:
+            raise IndexError("pop from an empty LaneBuffer")
+        lane = self._starved_lane()
+        if lane is None:
+            lane = self._next_lane()
+        self._size -= 1
+        return lane.popleft()[1]
+
+    def _starved_lane(self):
+        if self.max_wait is None:
+            return None
+        oldest, starved = None, None
+        for lane in self._lanes.values():
+            if lane and (oldest is None or lane[0][0] < oldest):
+                oldest, starved = lane[0][0], lane
+        if monotonic() - oldest > self.max_wait:
+            self.promoted += 1
+            return starved
+        return None
+
+    def _next_lane(self):
+        if self.weights is None:
+            for priority in reversed(self._priorities):
+                if self._lanes[priority]:
+                    return self._lanes[priority]
+        best, total = None, 0
+        for priority in self._priorities:
+            if self._lanes[priority]:
+                weight = self.weights.get(priority, 1)
+                self._credit[priority] += weight
+                total += weight
+                if best is None or \
+                        self._credit[priority] > self._credit[best]:
+                    best = priority
+        self._credit[best] -= total
+        return self._lanes[best]
+
+
+class Queue(_Queue):
+    """
+    :class:`queue.Queue` that can also put many items under one lock.
+    """
+
+    def put_many(self, items, block=True, timeout=None):
+        """
+        Put all items into the queue at once and wake consumers a single time.
+        A batch larger than ``maxsize`` is only put once the queue is empty.
+
+        :param items: iterable of items to put
+        :param block: wait for free space if the queue is bounded and full
+        :param timeout: maximum number of seconds to wait for free space
+        """
+        items = list(items)
+        if not items:
+            return
+        with self.not_full:
+            if self.maxsize > 0:
+                needed = min(self._space_needed(items), self.maxsize)
+                if not block:
+                    if self.maxsize - self._qsize() < needed:
+                        raise Full
+                elif timeout is None:
+                    while self.maxsize - self._qsize() < needed:
+                        self.not_full.wait()
+                elif timeout < 0:
+                    raise ValueError("'timeout' must be a non-negative number")
+                else:
+                    endtime = monotonic() + timeout
+                    while self.maxsize - self._qsize() < needed:
+                        remaining = endtime - monotonic()
+                        if remaining <= 0.0:
+                            raise Full
+                        self.not_full.wait(remaining)
+            for item in items:
+                self._put(item)
+            self.unfinished_tasks += len(items)
+            self.not_empty.notify(len(items))
+
+    def put_many_nowait(self, items):
+        """
+        Put all items into the queue without blocking.
+
+        :param items: iterable of items to put
+        """
+        return self.put_many(items, block=False)
+
+    def _space_needed(self, items):
+        return len(items)
+
+
+class Inbox(Queue):
+    """
+    Bounded queue with an overflow policy, used as the inbox of an
+    :class:`~pybeehive.actors.ActorListener`. When the inbox is full:
+
+    * ``'block'`` waits for free space, like :class:`queue.Queue`
+    * ``'drop_oldest'`` drops the oldest queued item to make room
+    * ``'drop_newest'`` drops the item being put
+    * ``'conflate'`` replaces the queued item that has the same key as the
+      item being put, or drops the oldest item if there is none
+
+    :param maxsize: maximum number of queued items, 0 for unbounded
+    :param overflow: overflow policy
+    :param key: function that returns the conflation key of an item,
+        defaults to the topic of events
+    :param on_drop: function that is called with every dropped or
+        replaced item
+    """
+    overflow_policies = ('block', 'drop_oldest', 'drop_newest', 'conflate')
+
+    def __init__(self, maxsize=1024, overflow='block', key=None,
+                 on_drop=None):
+        if overflow not in self.overflow_policies:
+            raise ValueError("overflow must be one of %s, not %r"
+                             % (', '.join(self.overflow_policies), overflow))
+        super(Inbox, self).__init__(maxsize)
+        self.overflow = overflow
+        self.key = key or topic_of
+        self.on_drop = on_drop
+        self.dropped = 0
+        self.conflated = 0
+        self.high_water = 0
+
+    def stats(self):
+        """
+        Return the depth metrics of the inbox.
+
+        :return: dict with the current depth, the highest depth reached and
+            the number of dropped and conflated items
+        """
+        with self.mutex:
+            return {
+                'depth': self._qsize(),
+                'high_water': self.high_water,
+                'dropped': self.dropped,
+                'conflated': self.conflated,
+            }
+
+    def put(self, item, block=True, timeout=None):
+        if self.overflow == 'block':
+            return super(Inbox, self).put(item, block, timeout)
+        with self.not_full:
+            if 0 < self.maxsize <= self._qsize() \
+                    and not self._make_room(item):
+                return
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def put_many(self, items, block=True, timeout=None):
+        if self.overflow == 'block':
+            return super(Inbox, self).put_many(items, block, timeout)
+        for item in items:
+            self.put(item)
+
+    def _put(self, item):
+        super(Inbox, self)._put(item)
+        self.high_water = max(self.high_water, self._qsize())
+
+    def _make_room(self, item):
+        # Returns whether the item still has to be put
+        if self.overflow == 'conflate':
+            key = self.key(item)
+            for i, queued in enumerate(self.queue):
+                if self.key(queued) == key:
+                    self.queue[i] = item
+                    self.conflated += 1
+                    self._dropped(queued)
+                    return False
+        elif self.overflow == 'drop_newest':
+            self.dropped += 1
+            self._dropped(item)
+            return False
+        self._dropped(self._get())
+        self.dropped += 1
+        # The dropped item will never be marked as done
+        self.unfinished_tasks -= 1
+        if not self.unfinished_tasks:
+            self.all_tasks_done.notify_all()
+        return True
+
+    def _dropped(self, item):
+        if self.on_drop is not None:
+            self.on_drop(item)
+
+
+class ConflatingQueue(Queue):
+    """
+    Queue that only keeps the newest pending event for each key, so under
+    overload its size and the work of its consumers are bounded by the
+    number of distinct keys. It can be used as the event queue of a
+    :class:`~pybeehive.Hive` or as the inbox of an
+    :class:`~pybeehive.actors.ActorListener`.
+
+    :param key: function that returns the key of an event,
+        defaults to the topic of the event
+    :param maxsize: maximum number of distinct pending keys, 0 for unbounded
+    :param on_drop: function that is called with every replaced event
+    """
+    def __init__(self, key=None, maxsize=0, on_drop=None):
+        self.key = key or topic_of
+        self.on_drop = on_drop
+        super(ConflatingQueue, self).__init__(maxsize)
+
+    @property
+    def conflated(self):
+        """
+        Number of events that were replaced by newer events.
+
+        :return:
+        """
+        return self.queue.conflated
+
+    def put(self, item, block=True, timeout=None):
+        with self.not_full:
+            # Replacing a pending event takes no space, even when full
+            if self.queue.is_pending(self.key(item)):
+                self._put(item)
+                self.unfinished_tasks += 1
+                self.not_empty.notify()
+                return
+        super(ConflatingQueue, self).put(item, block, timeout)
+
+    def _space_needed(self, items):
+        keys = {self.key(item) for item in items}
+        return len([k for k in keys if not self.queue.is_pending(k)])
+
+    def _init(self, maxsize):
+        self.queue = ConflationBuffer(self.key)
+
+    def _put(self, item):
+        replaced = self.queue.append(item)
+        if replaced is not None:
+            # Replaced items will never be marked as done
+            self.unfinished_tasks -= 1
+            if self.on_drop is not None:
+                self.on_drop(replaced)
+
+
+class LaneQueue(Queue):
+    """
+    Queue that dispatches events by priority, see :class:`LaneBuffer`.
+
+    :param weights:
+    :param topic_priorities:
+    :param max_wait:
+    :param maxsize:
+    """
+    def __init__(self, weights=None, topic_priorities=None, max_wait=1.0,
+                 maxsize=0):
+        self._lane_args = (weights, topic_priorities, max_wait)
+        super(LaneQueue, self).__init__(maxsize)
+
+    def lengths(self):
+        """
+        Return the number of pending events in each lane.
+
+        :return:
+        """
+        with self.mutex:
+            return self.queue.lengths()
+
+    def _init(self, maxsize):
+        self.queue = LaneBuffer(*self._lane_args)
@@ -0,0 +1,38 @@
+import asyncio
+import random
+import time
+
+from pybeehive.asyn.balancer import BalancerListener, WorkerStreamer
+import pybeehive.asyn
+
+
+def test_balancer_worker_pool():
+    address = '127.0.0.1', random.randint(7000, 10000)
+    front = pybeehive.asyn.Hive()
+    balancer = BalancerListener(address)
+    front.add(balancer)
+    received = {'fast': [], 'slow': []}
+    workers = []
+    for name, delay in [('fast', 0), ('slow', 0.01)]:
+        hive = pybeehive.asyn.Hive()
+        hive.add(WorkerStreamer(address, capacity=4))
+
+        async def handle(event, name=name, delay=delay):
+            await asyncio.sleep(delay)
+            received[name].append(event.data)
+        hive.listener()(handle)
+        workers.append(hive)
+    for hive in workers + [front]:
+        hive.run(threaded=True)
+    start = time.time()
+    while balancer.workers < 2 and time.time() - start < 2:
+        time.sleep(1e-3)
+    front.submit_events(pybeehive.Event(i) for i in range(200))
+    while sum(map(len, received.values())) < 200 and time.time() - start < 5:
+        time.sleep(1e-3)
+    for hive in [front] + workers:
+        hive.close()
+    assert sorted(received['fast'] + received['slow']) == list(range(200)), \
+        "Events were not all delivered once"
+    assert len(received['fast']) > 2 * len(received['slow']), \
+        "Slow worker received as much work as the fast worker"
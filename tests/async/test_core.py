@@ -1,6 +1,8 @@
 import asyncio
+import pytest
 import pybeehive
 import pybeehive.asyn
+from pybeehive.asyn.utils import Queue, ConflatingQueue, async_generator
 
 
 def test_stream(async_bee_factory, run_in_loop):
@@ -58,6 +60,17 @@ def test_notify(async_bee_factory, run_in_loop):
     assert listener.calls[0] == 1, 'Did not process data correct in on_event'
 
 
+def test_notify_with_filters(async_bee_factory, run_in_loop):
+    listener = async_bee_factory.create('listener')
+    listener.filters = [pybeehive.Pattern('orders.#')]
+    chained = listener.chain(async_bee_factory.create('listener'))
+    for topic in ['orders.eu', 'users', None]:
+        run_in_loop(listener.notify, pybeehive.Event(topic, topic=topic))
+    assert [e.data for e in listener.calls] == ['orders.eu'], \
+        'Listener did not filter events'
+    assert len(chained.calls) == 1, 'Filtered event was propagated'
+
+
 def test_chained_notify(async_bee_factory, run_in_loop):
     listener1 = async_bee_factory.create('listener')
     listener2 = async_bee_factory.create('listener')
@@ -85,3 +98,75 @@ def test_chained_notify_with_exception(async_bee_factory, run_in_loop):
     assert len(listener2.calls) == 0, 'First chained on_event triggered'
     assert len(listener3.calls) == 0, 'Second chained on_event triggered'
 
+
+def test_stream_batch(async_bee_factory, run_in_loop):
+    streamer = async_bee_factory.create('streamer')
+    q = Queue()
+    batches = [pybeehive.Batch(range(3)), pybeehive.Batch(range(3, 5))]
+
+    @async_generator
+    async def stream():
+        if batches:
+            return batches.pop(0)
+        streamer.kill()
+        raise StopAsyncIteration
+
+    streamer.stream = stream
+    streamer.set_queue(q)
+    run_in_loop(streamer.run)
+    events = [q.get_nowait() for _ in range(q.qsize())]
+    assert [e.data for e in events] == list(range(5)), \
+        'Stream did not yield batched data in order'
+
+
+def test_queue_put_many(run_in_loop):
+    q = Queue(maxsize=3)
+    q.put_many_nowait([1, 2])
+    assert q.qsize() == 2, 'Did not put all items'
+    with pytest.raises(asyncio.QueueFull):
+        q.put_many_nowait([3, 4])
+    run_in_loop(q.put_many, [3])
+    assert [q.get_nowait() for _ in range(3)] == [1, 2, 3], \
+        'Items were not put in order'
+
+
+def test_conflating_queue(run_in_loop):
+    q = ConflatingQueue()
+    q.put_many_nowait([pybeehive.Event(i, topic=i % 2) for i in range(5)])
+    run_in_loop(q.put, pybeehive.Event(5, topic=2))
+    assert q.qsize() == 3, 'Did not bound the queue by distinct keys'
+    assert [q.get_nowait().data for _ in range(3)] == [4, 3, 5], \
+        'Did not keep the newest event in first arrival order'
+    assert q.conflated == 3, 'Did not count conflated events'
+
+
+def test_full_conflating_queue_replaces_pending_keys(run_in_loop):
+    q = ConflatingQueue(maxsize=2)
+    q.put_nowait(pybeehive.Event(1, topic='a'))
+    q.put_nowait(pybeehive.Event(2, topic='b'))
+    run_in_loop(asyncio.wait_for, q.put(pybeehive.Event(3, topic='a')), 1)
+    q.put_many_nowait([pybeehive.Event(4, topic='b')])
+    with pytest.raises(asyncio.QueueFull):
+        q.put_nowait(pybeehive.Event(5, topic='c'))
+    assert [q.get_nowait().data for _ in range(2)] == [3, 4], \
+        'Did not replace pending events of a full queue'
+
+
+def test_lane_queue(run_in_loop):
+    from pybeehive.asyn.utils import LaneQueue
+    q = LaneQueue(max_wait=None)
+    run_in_loop(q.put_many, [pybeehive.Event(i, priority=i % 3)
+                             for i in range(6)])
+    assert [q.get_nowait().data for _ in range(6)] == [2, 5, 1, 4, 0, 3], \
+        'Did not serve events by priority'
+
+
+def test_spill_queue(run_in_loop):
+    from pybeehive.asyn.utils import SpillQueue
+    q = SpillQueue(memory_limit=3)
+    for i in range(10):
+        run_in_loop(q.put, pybeehive.Event(i))
+    assert q.on_disk == 7, 'Did not spill the overflow'
+    assert [q.get_nowait().data for _ in range(10)] == list(range(10)), \
+        'Events were not returned in order'
+    q.close()
@@ -6,7 +6,7 @@ import _thread
 import pybeehive
 import pybeehive.asyn
 from pybeehive.asyn import async_generator
-from pybeehive.asyn.hive import _loop_async
+from pybeehive.asyn.utils import new_event_loop
 
 
 def run_kill_hive(hive, wait=0.005):
@@ -14,20 +14,7 @@ def run_kill_hive(hive, wait=0.005):
         await asyncio.sleep(wait)
         hive.kill()
     loop = asyncio.get_event_loop()
-
-    hive._set_loop()
-    with hive._setup_teardown_listeners():
-        with hive._setup_teardown_streamers() as jobs:
-            futures = [asyncio.ensure_future(j) for j in jobs]
-            loop.run_until_complete(asyncio.gather(
-                kill(),
-                _loop_async(
-                    hive._event_queue, hive.listeners, hive.kill_event
-                )
-            ))
-    for future in futures:
-        if not future.done():
-            future.cancel()
+    loop.run_until_complete(asyncio.gather(kill(), hive.serve()))
 
 
 def test_run(async_hive, async_bee_factory):
@@ -274,3 +261,108 @@ def test_setup_teardown_exceptions(async_hive, async_bee_factory):
         'Did not attempt to teardown listener with failed setup'
     assert s_failed_setup.teardown_event.is_set(), \
         'Did not attempt to teardown streamer with failed setup'
+    failed = [bee for bee, _ in async_hive.setup_errors]
+    assert len(failed) == 4 and all(bee in failed for bee in [
+        l_failed_setup, s_failed_setup, l_failed_both, s_failed_both
+    ]), 'Failed setups were not recorded'
+
+
+def test_submit_events(async_hive):
+    calls = []
+
+    @async_hive.listener
+    async def on_event(event):
+        calls.append(event)
+        await asyncio.sleep(0)
+
+    async_hive.submit_events(pybeehive.Event(i) for i in range(5))
+    run_kill_hive(async_hive)
+    assert [e.data for e in calls] == list(range(5)), \
+        'Listener did not receive all submitted events in order'
+
+
+def test_serve_in_running_loop(async_hive, async_bee_factory):
+    listener = async_bee_factory.create('listener')
+    streamer = async_bee_factory.create('streamer')
+    async_hive.add(listener)
+    async_hive.add(streamer)
+
+    async def app():
+        server = asyncio.ensure_future(async_hive.serve())
+        while len(listener.calls) < 10:
+            await asyncio.sleep(1e-3)
+        async_hive.close()
+        await server
+
+    asyncio.get_event_loop().run_until_complete(
+        asyncio.wait_for(app(), timeout=2))
+    assert async_hive.loop is asyncio.get_event_loop(), \
+        'Hive did not run on the callers event loop'
+    assert listener.teardown_event.is_set(), 'Did not teardown listener'
+    assert streamer.teardown_event.is_set(), 'Did not teardown streamer'
+    assert [e.data for e in listener.calls] == list(range(10)), \
+        'Hive did not process all streamed events'
+
+
+def test_async_context_manager(async_hive, async_bee_factory):
+    listener = async_bee_factory.create('listener')
+    async_hive.add(listener)
+
+    async def app():
+        async with async_hive as hive:
+            assert listener.setup_event.is_set(), 'Did not setup listener'
+            hive.submit_event(pybeehive.Event('test'))
+            while not listener.calls:
+                await asyncio.sleep(1e-3)
+        assert not async_hive.alive, 'Hive still alive after exiting block'
+
+    asyncio.get_event_loop().run_until_complete(
+        asyncio.wait_for(app(), timeout=2))
+    assert listener.teardown_event.is_set(), 'Did not teardown listener'
+    assert listener.calls[0].data == 'test', 'Listener did not get event'
+
+
+def test_run_with_loop_factory(async_hive, async_bee_factory):
+    loops = []
+
+    def loop_factory():
+        loops.append(new_event_loop())
+        return loops[-1]
+
+    listener = async_bee_factory.create('listener')
+    streamer = async_bee_factory.create('streamer')
+    async_hive.add(listener)
+    async_hive.add(streamer)
+
+    @async_hive.listener
+    async def stop(event):
+        if event.data == 9:
+            async_hive.close()
+        await asyncio.sleep(0)
+
+    async_hive.run(threaded=True, loop_factory=loop_factory).join(2)
+    assert len(loops) == 1, 'Hive did not use the loop factory'
+    assert async_hive.loop is loops[0], 'Hive did not run on created loop'
+    assert loops[0].is_closed(), 'Hive did not close the created loop'
+    assert len(listener.calls) == 10, 'Hive did not process all events'
+
+
+def test_shedder_drops_expired_events(async_hive):
+    calls = []
+
+    @async_hive.listener
+    async def on_event(event):
+        calls.append(event)
+
+    async_hive.shedder = pybeehive.LoadShedder(topic_ttls={'quotes': 60})
+    async_hive.submit_events([
+        pybeehive.Event('old', topic='quotes', created_at=1),
+        pybeehive.Event('old trade', topic='trades', created_at=1),
+        pybeehive.Event('new', topic='quotes'),
+    ])
+    run_kill_hive(async_hive)
+    assert [e.data for e in calls] == ['old trade', 'new'], \
+        'Hive dispatched an expired event'
+    assert async_hive.shedder.stats() == {
+        'quotes': {'expired': 1, 'shed': 0}
+    }, 'Did not count expired event'
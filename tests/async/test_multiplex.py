@@ -0,0 +1,40 @@
+import asyncio
+import socket
+
+from pybeehive.asyn.multiplex import IOStreamer
+
+
+def test_hive_io_streamer(async_hive):
+    calls = []
+    reader, writer = socket.socketpair()
+    reader.setblocking(False)
+
+    @async_hive.io_streamer(reader, topic='io')
+    def read():
+        yield reader.recv(4096)
+
+    @async_hive.listener
+    async def on_event(event):
+        calls.append(event)
+        if len(calls) == 3:
+            async_hive.close()
+        await asyncio.sleep(0)
+
+    assert isinstance(async_hive.streamers[0], IOStreamer), \
+        'Did not create async IO streamer'
+
+    async def write():
+        for msg in [b'a', b'b', b'c']:
+            await asyncio.sleep(0.01)
+            writer.send(msg)
+
+    async def run():
+        await asyncio.gather(write(), async_hive.serve())
+
+    asyncio.get_event_loop().run_until_complete(
+        asyncio.wait_for(run(), timeout=2))
+    reader.close()
+    writer.close()
+    assert [e.data for e in calls] == [b'a', b'b', b'c'], \
+        'IO streamer did not stream data'
+    assert all(e.topic == 'io' for e in calls), 'Topic was not set'
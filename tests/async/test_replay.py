@@ -0,0 +1,25 @@
+import asyncio
+
+from pybeehive.asyn.replay import ReplayStreamer, Recorder
+import pybeehive
+
+
+def test_record_and_replay(tmpdir, run_in_loop):
+    recorder = Recorder(str(tmpdir))
+    run_in_loop(recorder.setup)
+    for i in range(10):
+        run_in_loop(recorder.notify,
+                    pybeehive.Event(i, created_at=100 + i * 0.1))
+    run_in_loop(recorder.teardown)
+
+    for speed in [None, 50]:
+        q = asyncio.Queue()
+        streamer = ReplayStreamer(str(tmpdir), speed=speed, batch_size=3)
+        streamer.set_queue(q)
+        run_in_loop(streamer.run)
+        events = [q.get_nowait() for _ in range(q.qsize())]
+        assert [e.data for e in events] == list(range(10)), \
+            'Did not replay every event'
+        assert events[-1].created_at == 100.9, \
+            'Did not keep the original created_at'
+        assert not streamer.alive, 'Streamer was restarted after the replay'
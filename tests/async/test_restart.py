@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+from pybeehive.asyn.utils import Queue, async_generator
+from pybeehive.restart import ExponentialBackoff, RestartPolicy
+import pybeehive.asyn
+
+
+class FlakyStreamer(pybeehive.asyn.Streamer):
+    def __init__(self, results, restart_policy=None):
+        super(FlakyStreamer, self).__init__(restart_policy=restart_policy)
+        self.results = list(results)
+        self.starts = []
+
+    def stream(self):
+        self.starts.append(time.time())
+        result = self.results.pop(0) if self.results else []
+        if not self.results:
+            self.kill()
+        items = iter([] if isinstance(result, Exception) else result)
+
+        @async_generator
+        async def wrapped():
+            if isinstance(result, Exception):
+                raise result
+            await asyncio.sleep(0)
+            try:
+                return next(items)
+            except StopIteration:
+                raise StopAsyncIteration
+        return wrapped()
+
+
+def run_streamer(streamer, run_in_loop):
+    q = Queue()
+    streamer.set_queue(q)
+    run_in_loop(streamer.run)
+    return [q.get_nowait().data for _ in range(q.qsize())]
+
+
+def test_default_policy(run_in_loop):
+    streamer = FlakyStreamer([ValueError(), [1, 2], [], [3]])
+    assert run_streamer(streamer, run_in_loop) == [1, 2, 3], \
+        'Did not restart stream'
+    assert streamer.restarts == 3, 'Incorrect restart count'
+
+
+def test_stop_on_exhaustion(run_in_loop):
+    streamer = FlakyStreamer(
+        [ValueError(), [1, 2], [3]],
+        restart_policy=RestartPolicy(restart_exhausted=False)
+    )
+    assert run_streamer(streamer, run_in_loop) == [1, 2], \
+        'Restarted exhausted stream'
+
+
+def test_exponential_backoff(run_in_loop):
+    policy = ExponentialBackoff(initial=0.01, factor=2, jitter=0)
+    streamer = FlakyStreamer([ValueError()] * 3 + [[]], restart_policy=policy)
+    run_streamer(streamer, run_in_loop)
+    gaps = [b - a for a, b in zip(streamer.starts, streamer.starts[1:])]
+    assert len(gaps) == 3, 'Did not restart failed stream'
+    for gap, expected in zip(gaps, [0.01, 0.02, 0.04]):
+        assert gap >= expected, 'Did not back off between restarts'
@@ -0,0 +1,87 @@
+import asyncio
+import random
+import pytest
+
+import pybeehive.asyn
+
+
+def test_async_hive_request(run_in_new_loop):
+    hive = pybeehive.asyn.Hive()
+
+    @hive.listener
+    async def double(event):
+        await asyncio.sleep(0)
+        return event.data * 2
+
+    async def run():
+        async with hive:
+            futures = [hive.request(pybeehive.Event(i), timeout=1)
+                       for i in range(10)]
+            return await asyncio.gather(*futures)
+
+    assert run_in_new_loop(run) == [i * 2 for i in range(10)]
+    assert len(hive.requests) == 0
+
+
+def test_async_hive_request_timeout(run_in_new_loop):
+    hive = pybeehive.asyn.Hive()
+
+    @hive.listener
+    async def ignore(event):
+        return None
+
+    async def run():
+        async with hive:
+            await hive.request(pybeehive.Event(1), timeout=0.05)
+
+    with pytest.raises(asyncio.TimeoutError):
+        run_in_new_loop(run)
+    assert hive.requests.timed_out == 1
+
+
+def test_async_hive_request_exception(run_in_new_loop):
+    hive = pybeehive.asyn.Hive()
+
+    @hive.listener
+    async def fail(event):
+        raise ValueError(event.data)
+
+    async def run():
+        async with hive:
+            await hive.request(pybeehive.Event(1), timeout=1)
+
+    with pytest.raises(ValueError):
+        run_in_new_loop(run)
+
+
+def test_async_remote_request(run_in_new_loop):
+    port = random.randint(7000, 10000)
+    address = '127.0.0.1', port
+    front = pybeehive.asyn.Hive(reply_address=('127.0.0.1', port + 1))
+    back = pybeehive.Hive()
+
+    @front.socket_listener(address)
+    async def forward(event):
+        return event
+
+    @back.socket_streamer(address)
+    def stream():
+        return
+
+    @back.listener
+    def handle(event):
+        return event.data * 2
+
+    async def run():
+        async with front:
+            await asyncio.sleep(0.1)
+            futures = [front.request(pybeehive.Event(i), timeout=2)
+                       for i in range(10)]
+            return await asyncio.gather(*futures)
+
+    back.run(threaded=True)
+    try:
+        assert run_in_new_loop(run) == [i * 2 for i in range(10)], \
+            "Requests were not answered remotely"
+    finally:
+        back.close()
@@ -4,8 +4,13 @@ import random
 import time
 import pytest
 import _thread
+import zmq
 
-from pybeehive.asyn.socket import SocketListener, SocketStreamer
+from pybeehive.codec import FrameCodec
+from pybeehive.asyn.socket import (
+    SocketListener, SocketStreamer, ReliableClient, ReliableServer,
+    PartitionedSocketListener, Client, Server
+)
 import pybeehive
 
 
@@ -110,6 +115,193 @@ def test_message_closed_server(async_hive):
     assert len(events) >= 1, "Hive did not process all events"
 
 
+def test_client_buffer_overflow(run_in_new_loop):
+
+    async def _test():
+        client = Client(('127.0.0.1', 0), sndhwm=10, buffer_size=5,
+                        overflow='drop')
+        assert client.socket.getsockopt(zmq.SNDHWM) == 10
+        for _ in range(10):
+            await client.send(b'data')
+        assert client.stats() == {'depth': 5, 'dropped': 5, 'spilled': 0}
+        await client.shutdown()
+
+        address = '127.0.0.1', random.randint(7000, 10000)
+        client = Client(address, buffer_size=5, overflow='spill')
+        server = Server(address)
+        for i in range(20):
+            await client.send(str(i).encode())
+        assert client.stats() == {'depth': 20, 'dropped': 0, 'spilled': 15}
+        await server.start()
+        await client.connect()
+        received = []
+        start = time.time()
+        while len(received) < 20 and time.time() - start < 5:
+            try:
+                received.append(server.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                await asyncio.sleep(1e-3)
+        await client.shutdown()
+        await server.shutdown()
+        assert received == [str(i).encode() for i in range(20)], \
+            "Buffered messages were not all sent in order"
+
+    run_in_new_loop(_test)
+
+
+def test_hive_closes_while_client_buffer_is_full(async_hive):
+    address = '127.0.0.1', random.randint(7000, 10000)
+
+    @async_hive.socket_listener(address, buffer_size=2, overflow='block',
+                                sndhwm=1)
+    async def parse_event(event):
+        return event
+
+    async_hive.submit_events(pybeehive.Event(i) for i in range(10))
+    thread = async_hive.run(threaded=True)
+    time.sleep(0.1)
+    async_hive.close()
+    thread.join(3)
+    assert not thread.is_alive(), "Hive waited for room in the buffer"
+
+
+def test_compressed_batched_messaging(run_in_new_loop):
+    address = '127.0.0.1', random.randint(7000, 10000)
+
+    async def _test():
+        codec = FrameCodec('zlib', threshold=100)
+        client = Client(address, buffer_size=1000, codec=codec,
+                        batch_size=100)
+        server = Server(address, codec=FrameCodec())
+        messages = [pybeehive.Event(i).tostring() for i in range(300)]
+        for msg in messages:
+            await client.send(msg)
+        await server.start()
+        await client.connect()
+        received = []
+        start = time.time()
+        while len(received) < 300 and time.time() - start < 5:
+            try:
+                received.append(server.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                await asyncio.sleep(1e-3)
+        await client.shutdown()
+        await server.shutdown()
+        assert received == messages, \
+            "Batched messages were not all received in order"
+        assert codec.ratio < 0.5, "Batches were not compressed"
+
+    run_in_new_loop(_test)
+
+
+def test_reliable_messaging(run_in_new_loop):
+    address = '127.0.0.1', random.randint(7000, 10000)
+
+    async def _test():
+        client = ReliableClient(address, window=100)
+        server = ReliableServer(address)
+        await client.connect()
+        # Sent before the server is up, so no peer receives them at first
+        for i in range(100):
+            await client.send(str(i).encode())
+        await server.start()
+        received = []
+        for i in range(100, 300):
+            await client.send(str(i).encode())
+        start = time.time()
+        while len(received) < 300 and time.time() - start < 5:
+            try:
+                received.append(server.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                await asyncio.sleep(1e-3)
+        await client.shutdown()
+        await server.shutdown()
+        assert received == [str(i).encode() for i in range(300)], \
+            "Messages were not delivered in order"
+        assert client.pending == 0, "Messages were not acknowledged"
+
+    run_in_new_loop(_test)
+
+
+def test_partitioned_socket_listener(run_in_new_loop):
+    port = random.randint(7000, 10000)
+    addresses = [('127.0.0.1', port + i) for i in range(3)]
+
+    async def receive(servers, count):
+        received = {address: [] for address in servers}
+        start = time.time()
+        while sum(map(len, received.values())) < count \
+                and time.time() - start < 2:
+            for address, server in servers.items():
+                try:
+                    data = server.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    await asyncio.sleep(1e-3)
+                else:
+                    received[address].append(pybeehive.Event.fromstring(data))
+        return received
+
+    async def _test():
+        servers = {a: Server(a) for a in addresses}
+        listener = PartitionedSocketListener(addresses[:2])
+        for server in servers.values():
+            await server.start()
+        await listener.setup()
+        await listener.add_node(addresses[2])
+        await listener.remove_node(addresses[0])
+        for i in range(60):
+            await listener.notify(pybeehive.Event(i, topic=str(i % 20)))
+        received = await receive(servers, 60)
+        await listener.teardown()
+        for server in servers.values():
+            await server.shutdown()
+        assert sum(map(len, received.values())) == 60
+        assert not received[addresses[0]], "Event sent to a removed node"
+        assert received[addresses[2]], "No events sent to the added node"
+        for address, events in received.items():
+            assert all(listener.ring.get(e.topic) == address
+                       for e in events), "Event sent to the wrong node"
+
+    run_in_new_loop(_test)
+
+
+def test_reliable_socket_streamer_listener_loop(async_hive):
+    address = '127.0.0.1', random.randint(7000, 10000)
+    events = []
+
+    @async_hive.socket_listener(address, reliable=True)
+    async def parse_event(event):
+        event = pybeehive.Event(event.data + 1, created_at=event.created_at)
+        events.append(event)
+        return event
+
+    async_hive.add(SocketStreamer(address, reliable=True))
+    async_hive.submit_event(pybeehive.Event(-1))
+    async_hive.run(threaded=True)
+    start = time.time()
+    while len(events) < 5 and time.time() - start < 2:
+        time.sleep(1e-4)
+    async_hive.close()
+    assert len(events) >= 5, "Hive did not process all events"
+    for i, e in enumerate(events):
+        assert i == e.data, "Event data was not parsed by listener"
+
+
+def test_hive_closes_while_peer_is_down(async_hive):
+    address = '127.0.0.1', random.randint(7000, 10000)
+
+    @async_hive.socket_listener(address, reliable=True, window=2)
+    async def parse_event(event):
+        return event
+
+    async_hive.submit_events(pybeehive.Event(i) for i in range(10))
+    thread = async_hive.run(threaded=True)
+    time.sleep(0.1)
+    async_hive.close()
+    thread.join(3)
+    assert not thread.is_alive(), "Hive waited for a peer that is down"
+
+
 # This test can pass, but due to the inconsistent handling of
 # KeyboardInterrupt in zmq.asyncio.Socket.send it does not
 # pass consistently and is thus skipped in the normal tests.
@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+from pybeehive.asyn.timers import TimerStreamer
+from pybeehive.clock import VirtualClock
+import pybeehive
+import pybeehive.asyn
+
+
+def test_hive_timers(async_hive):
+    calls = []
+
+    @async_hive.interval(0.005, topic='tick')
+    def tick():
+        return 'tick'
+
+    @async_hive.interval(0.005)
+    async def async_tick():
+        await asyncio.sleep(0)
+        return 'async'
+
+    @async_hive.once(0.01)
+    def once():
+        return 'once'
+
+    @async_hive.listener
+    async def on_event(event):
+        calls.append(event)
+        await asyncio.sleep(0)
+
+    assert isinstance(async_hive.streamers[0], TimerStreamer), \
+        'Did not create async timer streamer'
+    async_hive.run(threaded=True)
+    time.sleep(0.1)
+    async_hive.close()
+    assert len(async_hive.streamers) == 1, 'Did not share one streamer'
+    assert len([e for e in calls if e.data == 'once']) == 1, \
+        'One-shot timer did not fire exactly once'
+    assert len([e for e in calls if e.data == 'tick']) > 5, \
+        'Interval timer did not fire repeatedly'
+    assert len([e for e in calls if e.data == 'async']) > 5, \
+        'Coroutine timer did not fire repeatedly'
+    assert all(e.topic == 'tick' for e in calls if e.data == 'tick'), \
+        'Topic was not set'
+
+
+def test_hive_timers_scheduled_on_start(async_hive):
+    calls = []
+
+    @async_hive.once(0.2)
+    def once():
+        return 'once'
+
+    @async_hive.listener
+    async def on_event(event):
+        calls.append(time.time())
+
+    time.sleep(0.3)
+    start = time.time()
+    async_hive.run(threaded=True)
+    deadline = time.time() + 2
+    while not calls and time.time() < deadline:
+        time.sleep(1e-3)
+    async_hive.close()
+    assert calls, 'One-shot timer did not fire'
+    assert calls[0] - start >= 0.15, \
+        'Timer was scheduled when it was added instead of on start'
+
+
+def test_virtual_clock_fires_timers():
+    clock = VirtualClock(start=0)
+    streamer = TimerStreamer()
+    streamer.clock = clock
+    streamer.add_timer(pybeehive.timers.Interval(clock.time, 10, topic='t'))
+    streamer.attach(clock)
+    fired = clock.advance(35)
+    streamer.detach(clock)
+    assert [(e.data, e.created_at) for e in fired] == \
+        [(10, 10), (20, 20), (30, 30)], 'Timers did not fire in order'
+    assert not clock.advance(100), 'Detached timers still fired'
+
+
+def test_hive_timers_in_virtual_time():
+    start = 1525420800
+    clock = VirtualClock(start=start)
+    hive = pybeehive.asyn.Hive(clock=clock)
+    calls = []
+
+    @hive.interval(600, topic='heartbeat')
+    def heartbeat():
+        return 'sync'
+
+    @hive.interval(700, topic='heartbeat')
+    async def async_heartbeat():
+        await asyncio.sleep(0)
+        return 'async'
+
+    @hive.listener
+    async def on_event(event):
+        calls.append(event)
+        if event.data == 'done':
+            hive.kill()
+
+    hive.submit_events(
+        pybeehive.Event(i, topic='tick', created_at=start + i)
+        for i in range(0, 2000, 100)
+    )
+    hive.submit_event(pybeehive.Event('done', created_at=start + 2000))
+    begin = time.time()
+    hive.run()
+    assert time.time() - begin < 5, 'Timers did not run in virtual time'
+    assert clock.time() == start + 2000, 'Clock did not follow the events'
+    heartbeats = [(e.data, e.created_at - start) for e in calls
+                  if e.topic == 'heartbeat']
+    assert heartbeats == [('sync', 600), ('async', 700), ('sync', 1200),
+                          ('async', 1400), ('sync', 1800)], \
+        'Timers did not fire at their virtual times'
+    times = [e.created_at for e in calls]
+    assert times == sorted(times), 'Timer events were not dispatched in order'
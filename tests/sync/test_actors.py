@@ -0,0 +1,125 @@
+from threading import Event, Thread
+import time
+import pytest
+
+from pybeehive.actors import ActorListener
+from pybeehive.utils import Inbox
+import pybeehive
+
+
+class SlowActor(ActorListener):
+    def __init__(self, inbox=None, filters=None, delay=0):
+        super(SlowActor, self).__init__(inbox=inbox, filters=filters)
+        self.delay = delay
+        self.calls = []
+        self.exceptions = []
+
+    def on_event(self, event):
+        time.sleep(self.delay)
+        if event.data == 'fail':
+            raise ValueError(event.data)
+        self.calls.append(event.data)
+        return event
+
+    def on_exception(self, exception):
+        self.exceptions.append(exception)
+
+
+def events(*data, **kwargs):
+    return [pybeehive.Event(d, **kwargs) for d in data]
+
+
+def test_inbox_bad_policy():
+    with pytest.raises(ValueError):
+        Inbox(overflow='explode')
+
+
+def test_inbox_drop_oldest():
+    inbox = Inbox(2, overflow='drop_oldest')
+    for event in events(1, 2, 3):
+        inbox.put(event)
+    assert [inbox.get().data for _ in range(2)] == [2, 3], \
+        'Did not drop the oldest event'
+    assert inbox.stats() == {
+        'depth': 0, 'high_water': 2, 'dropped': 1, 'conflated': 0
+    }, 'Incorrect inbox metrics'
+
+
+def test_inbox_drop_newest():
+    inbox = Inbox(2, overflow='drop_newest')
+    inbox.put_many(events(1, 2, 3))
+    assert [inbox.get().data for _ in range(2)] == [1, 2], \
+        'Did not drop the newest event'
+    assert inbox.dropped == 1, 'Did not count dropped event'
+    assert inbox.empty(), 'Dropped event was queued'
+
+
+def test_inbox_conflate():
+    inbox = Inbox(2, overflow='conflate')
+    inbox.put(pybeehive.Event(1, topic='a'))
+    inbox.put(pybeehive.Event(2, topic='b'))
+    inbox.put(pybeehive.Event(3, topic='a'))
+    inbox.put(pybeehive.Event(4, topic='c'))
+    assert [inbox.get().data for _ in range(2)] == [2, 4], \
+        'Did not conflate events with the same key'
+    assert (inbox.conflated, inbox.dropped) == (1, 1), \
+        'Incorrect conflation metrics'
+
+
+def test_inbox_join_after_drops():
+    inbox = Inbox(1, overflow='drop_oldest')
+    inbox.put_many(events(1, 2, 3))
+    inbox.get()
+    inbox.task_done()
+    joined = Event()
+    Thread(target=lambda: (inbox.join(), joined.set())).start()
+    assert joined.wait(1), 'Dropped events were never marked as done'
+
+
+def test_actor_does_not_block_dispatch():
+    slow = SlowActor(Inbox(10, overflow='drop_newest'), delay=0.05)
+    chained = slow.chain(SlowActor())
+    slow.start()
+    chained.start()
+    start = time.time()
+    for event in events(*range(20)):
+        slow.notify(event)
+    assert time.time() - start < 0.05, 'Notify waited for the listener'
+    slow.stop()
+    chained.stop()
+    assert slow.calls == list(range(len(slow.calls))), \
+        'Events were handled out of order'
+    assert len(slow.calls) + slow.inbox.dropped == 20, \
+        'Events were lost without being counted as dropped'
+    assert chained.calls == slow.calls, \
+        'Chained listener was not notified from the actor'
+
+
+def test_actor_exceptions():
+    actor = SlowActor(filters=['topic'])
+    actor.start()
+    for event in events('fail', 'ok', topic='topic') + events('other'):
+        actor.notify(event)
+    actor.stop()
+    assert actor.calls == ['ok'], 'Actor did not filter events'
+    assert len(actor.exceptions) == 1, 'Exception was not handled'
+
+
+def test_hive_actor_listener(hive, bee_factory):
+    calls = []
+    hive.add(bee_factory.create('streamer'))
+
+    @hive.listener(inbox=Inbox(100, overflow='drop_oldest'))
+    def slow(event):
+        calls.append(event)
+
+    def kill_after():
+        time.sleep(0.03)
+        hive.kill()
+
+    Thread(target=kill_after).start()
+    hive.run()
+    actor = hive.listeners.listeners_by_name('slow')[0]
+    assert isinstance(actor, ActorListener), 'Did not create an actor'
+    assert actor.thread is None, 'Actor thread was not stopped'
+    assert len(calls) > 0, 'Actor did not handle any events'
@@ -0,0 +1,110 @@
+import random
+import time
+import pytest
+
+from pybeehive.balancer import (
+    BalancerListener, Credits, WorkerStreamer, credit_frame,
+    GRANT, RESET, LEAVE
+)
+from pybeehive.codec import FrameCodec
+import pybeehive
+
+
+def test_credits_go_to_most_free_worker():
+    credits = Credits()
+    credits.grant(b'a', 1)
+    credits.grant(b'b', 3)
+    assert credits.available == 4 and len(credits) == 2
+    assert [credits.take() for _ in range(4)] == [b'b', b'b', b'a', b'b'], \
+        "Credits were not used by free capacity, oldest worker first"
+    with pytest.raises(LookupError):
+        credits.take()
+
+
+def test_credit_frames():
+    credits = Credits()
+    credits.handle(b'a', credit_frame(GRANT, 2))
+    credits.handle(b'a', credit_frame(GRANT, 3))
+    assert credits.available == 5
+    credits.handle(b'a', credit_frame(RESET, 1))
+    assert credits.available == 1, "Reset did not replace the credits"
+    credits.handle(b'a', credit_frame(LEAVE))
+    assert credits.available == 0 and b'a' not in credits
+
+
+def run_pool(codec=None):
+    address = '127.0.0.1', random.randint(7000, 10000)
+    front = pybeehive.Hive()
+    balancer = BalancerListener(address, codec=codec)
+    front.add(balancer)
+    received = {'fast': [], 'slow': []}
+    max_queued = []
+    workers = []
+    for name, delay in [('fast', 0), ('slow', 0.01)]:
+        hive = pybeehive.Hive()
+        streamer = WorkerStreamer(address, capacity=4, codec=codec)
+        hive.add(streamer)
+
+        def handle(event, name=name, delay=delay, hive=hive):
+            max_queued.append(hive._event_queue.qsize())
+            time.sleep(delay)
+            received[name].append(event.data)
+        hive.listener()(handle)
+        workers.append(hive)
+    for hive in workers + [front]:
+        hive.run(threaded=True)
+    while balancer.workers < 2:
+        time.sleep(1e-3)
+    front.submit_events(pybeehive.Event(i) for i in range(200))
+    start = time.time()
+    while sum(map(len, received.values())) < 200 and time.time() - start < 5:
+        time.sleep(1e-3)
+    for hive in [front] + workers:
+        hive.close()
+    return received, max(max_queued)
+
+
+def test_balancer_worker_pool():
+    received, max_queued = run_pool()
+    assert sorted(received['fast'] + received['slow']) == list(range(200)), \
+        "Events were not all delivered once"
+    assert len(received['fast']) > 2 * len(received['slow']), \
+        "Slow worker received as much work as the fast worker"
+    assert max_queued <= 4, "Worker queued more events than its capacity"
+
+
+def test_balancer_worker_pool_with_codec():
+    received, _ = run_pool(codec=FrameCodec('zlib', threshold=0))
+    assert sorted(received['fast'] + received['slow']) == list(range(200))
+
+
+def test_worker_capacity():
+    with pytest.raises(ValueError):
+        WorkerStreamer(('127.0.0.1', 0), capacity=0)
+
+
+def test_worker_leaves_when_hive_closes():
+    address = '127.0.0.1', random.randint(7000, 10000)
+    front = pybeehive.Hive()
+    balancer = BalancerListener(address)
+    front.add(balancer)
+    worker = pybeehive.Hive()
+    streamer = WorkerStreamer(address)
+    worker.add(streamer)
+    front.run(threaded=True)
+    thread = worker.run(threaded=True)
+    try:
+        start = time.time()
+        while balancer.workers < 1 and time.time() - start < 2:
+            time.sleep(1e-3)
+        assert balancer.workers == 1, "Worker did not join the balancer"
+        worker.close()
+        thread.join(2)
+        assert streamer.socket.closed, "Worker socket was not closed"
+        start = time.time()
+        while balancer.workers and time.time() - start < 2:
+            time.sleep(1e-3)
+        assert balancer.workers == 0, "Worker did not leave the balancer"
+    finally:
+        worker.close()
+        front.close()
@@ -0,0 +1,104 @@
+from threading import Event, Thread
+import time
+
+from pybeehive.clock import VirtualClock
+from pybeehive.replay import Recorder, ReplayStreamer
+import pybeehive
+
+
+def test_virtual_clock_advance():
+    clock = VirtualClock(start=10)
+    clock.advance(5)
+    assert clock.time() == 10, 'Clock moved backwards'
+    clock.advance_by(2.5)
+    assert clock.time() == 12.5, 'Clock did not advance'
+
+
+def test_virtual_clock_wait():
+    clock = VirtualClock()
+    event = Event()
+    results = []
+    waiter = Thread(target=lambda: results.append(clock.wait(event, 60)))
+    waiter.start()
+    time.sleep(0.03)
+    assert waiter.is_alive(), 'Wait returned before the clock advanced'
+    clock.advance(60)
+    waiter.join(1)
+    assert results == [False], 'Wait did not time out in virtual time'
+    event.set()
+    assert clock.wait(event, 60), 'Wait did not return for a set event'
+
+
+def test_virtual_clock_fires_timers():
+    from pybeehive.timers import Interval, TimerStreamer
+    clock = VirtualClock(start=0)
+    streamer = TimerStreamer()
+    streamer.clock = clock
+    streamer.add_timer(Interval(lambda: clock.time(), 10, topic='t'))
+    streamer.attach(clock)
+    fired = clock.advance(35)
+    assert [(e.data, e.created_at) for e in fired] == \
+        [(10, 10), (20, 20), (30, 30)], 'Timers did not fire in order'
+    assert clock.time() == 35, 'Clock did not advance to the target'
+
+
+def test_events_use_hive_clock():
+    hive = pybeehive.Hive(clock=VirtualClock(start=1000))
+    events = []
+
+    @hive.streamer
+    def stream():
+        yield 'data'
+        time.sleep(1)
+
+    @hive.listener()
+    def on_event(event):
+        events.append(event)
+        hive.kill()
+
+    hive.run()
+    assert [e.created_at for e in events] == [1000], \
+        'Event did not use the hive clock'
+    assert pybeehive.Event('data').created_at > 1000, \
+        'Clock of the hive is used outside of it'
+
+
+def test_simulated_replay(tmpdir):
+    recorder = Recorder(str(tmpdir))
+    recorder.setup()
+    start = 1525420800
+    # An hour of events, one every second
+    for i in range(3600):
+        recorder.notify(pybeehive.Event(i, topic='tick', created_at=start + i))
+    recorder.teardown()
+
+    clock = VirtualClock(start=start)
+    hive = pybeehive.Hive(clock=clock)
+    hive.add(ReplayStreamer(str(tmpdir)))
+    ticks, heartbeats = [], []
+
+    @hive.interval(600, topic='heartbeat')
+    def heartbeat():
+        return clock.time()
+
+    @hive.listener(filters=['tick'])
+    def on_tick(event):
+        ticks.append(event)
+
+    @hive.listener(filters=['heartbeat'])
+    def on_heartbeat(event):
+        heartbeats.append(event)
+
+    def kill_when_done():
+        while len(ticks) < 3600 and hive.alive:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        hive.kill()
+
+    Thread(target=kill_when_done).start()
+    begin = time.time()
+    hive.run()
+    assert time.time() - begin < 30, 'Replay did not run faster than real time'
+    assert clock.time() == start + 3599, 'Clock did not follow the events'
+    assert [e.created_at - start for e in heartbeats] == \
+        [600, 1200, 1800, 2400, 3000], 'Timers did not fire in virtual time'
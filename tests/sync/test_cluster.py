@@ -0,0 +1,121 @@
+from functools import partial
+from queue import Empty
+import multiprocessing
+import os
+import time
+import pytest
+
+from pybeehive.cluster import HiveCluster, partition
+import pybeehive
+
+
+def worker_hive(results):
+    hive = pybeehive.Hive()
+
+    @hive.listener
+    def handle(event):
+        results.put((os.getpid(), event.topic, event.data))
+    return hive
+
+
+def failing_hive():
+    raise ValueError("no hive")
+
+
+class FailingListener(pybeehive.Listener):
+    def setup(self):
+        raise ValueError("no setup")
+
+    def on_event(self, event):
+        pass
+
+
+def failing_listener_hive():
+    hive = pybeehive.Hive()
+    hive.add(FailingListener())
+    return hive
+
+
+def collect(results, count, timeout=5):
+    items, deadline = [], time.time() + timeout
+    while len(items) < count and time.time() < deadline:
+        try:
+            items.append(results.get(timeout=0.01))
+        except Empty:
+            continue
+    return items
+
+
+def test_partition_is_stable():
+    assert partition('topic', 4) == partition('topic', 4)
+    assert {partition(i, 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+def test_cluster_partitions_by_topic():
+    results = multiprocessing.Queue()
+    cluster = HiveCluster(partial(worker_hive, results), processes=2,
+                          batch_size=10)
+    topics = ['a', 'b', 'c', 'd']
+    cluster.submit_events(pybeehive.Event(i, topic=topics[i % 4])
+                          for i in range(200))
+    thread = cluster.run(threaded=True)
+    items = collect(results, 200)
+    cluster.close()
+    thread.join()
+    assert sorted(data for _, _, data in items) == list(range(200)), \
+        "Events were not all handled once"
+    pids = {}
+    for pid, topic, data in items:
+        assert pids.setdefault(topic, pid) == pid, \
+            "Events of a topic were handled by many workers"
+    for topic in topics:
+        data = [d for _, t, d in items if t == topic]
+        assert data == sorted(data), "Events of a topic were reordered"
+    stats = cluster.stats()
+    assert len(stats) == 2
+    assert sum(s['events'] for s in stats) == 200
+    assert not any(s['alive'] for s in stats), "Workers were not stopped"
+
+
+def test_cluster_spreads_events_without_key():
+    results = multiprocessing.Queue()
+    cluster = HiveCluster(partial(worker_hive, results), processes=2,
+                          batch_size=1)
+    cluster.submit_events(pybeehive.Event(i) for i in range(20))
+    thread = cluster.run(threaded=True)
+    items = collect(results, 20)
+    cluster.close()
+    thread.join()
+    assert len({pid for pid, _, _ in items}) == 2, \
+        "Events without a key were not spread across the workers"
+
+
+def test_cluster_handles_queued_events_on_close():
+    results = multiprocessing.Queue()
+    cluster = HiveCluster(partial(worker_hive, results), processes=2,
+                          key=lambda e: e.data, batch_size=1000,
+                          flush_interval=10)
+    cluster.submit_events(pybeehive.Event(i) for i in range(100))
+    thread = cluster.run(threaded=True)
+    cluster.hive.drain(5)
+    time.sleep(0.05)
+    cluster.close()
+    thread.join()
+    assert len(collect(results, 100)) == 100, \
+        "Partial batches were not handled before the workers closed"
+
+
+def test_cluster_worker_setup_failure():
+    cluster = HiveCluster(failing_hive, processes=2)
+    with pytest.raises(RuntimeError):
+        cluster.run()
+    assert not any(p.is_alive() for p in cluster.workers)
+
+
+def test_cluster_worker_listener_setup_failure():
+    cluster = HiveCluster(failing_listener_hive, processes=2)
+    with pytest.raises(RuntimeError) as error:
+        cluster.run()
+    assert 'no setup' in str(error.value), \
+        "Setup error of the listener was not reported"
+    assert not any(p.is_alive() for p in cluster.workers)
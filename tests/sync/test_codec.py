@@ -0,0 +1,52 @@
+import os
+import pytest
+
+from pybeehive.codec import FrameCodec, BATCH, NONE, ZLIB, LZMA
+import pybeehive
+
+
+def test_encode_decode():
+    codec = FrameCodec()
+    frame = codec.encode(b'data')
+    assert frame[0] == NONE
+    assert codec.decode(frame) == [b'data']
+
+
+@pytest.mark.parametrize('compression,flag', [('zlib', ZLIB), ('lzma', LZMA)])
+def test_compression_threshold(compression, flag):
+    codec = FrameCodec(compression, threshold=100)
+    small, large = b'x' * 99, b'x' * 1000
+    assert codec.encode(small)[0] == NONE, "Payload below threshold compressed"
+    frame = codec.encode(large)
+    assert frame[0] == flag, "Payload above threshold was not compressed"
+    assert len(frame) < len(large)
+    # Any codec decodes the frames of any other
+    assert FrameCodec().decode(frame) == [large]
+    assert codec.ratio < 1
+
+
+def test_incompressible_payload_sent_raw():
+    codec = FrameCodec('zlib', threshold=0)
+    payload = os.urandom(1000)
+    frame = codec.encode(payload)
+    assert frame[0] == NONE, "Compression that did not help was kept"
+    assert codec.decode(frame) == [payload]
+
+
+def test_batch():
+    codec = FrameCodec('zlib', threshold=100)
+    payloads = [pybeehive.Event({'price': i, 'symbol': 'ABC'}).tostring()
+                for i in range(50)]
+    frame = codec.encode_batch(payloads)
+    assert frame[0] == BATCH | ZLIB
+    assert codec.decode(frame) == payloads
+    assert len(frame) < sum(len(p) for p in payloads) / 2, \
+        "Batch was not compressed as a whole"
+    assert codec.decode(FrameCodec().encode_batch([])) == []
+
+
+def test_invalid_compression():
+    with pytest.raises(ValueError):
+        FrameCodec('gzip')
+    with pytest.raises(ValueError):
+        FrameCodec().decode(b'\x0fdata')
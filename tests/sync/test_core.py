@@ -1,6 +1,10 @@
 import time
 import pybeehive
+import pybeehive.topics
+from pybeehive.topics import Pattern
+import pybeehive.utils
 from multiprocessing import Queue
+from queue import Full
 import pytest
 
 _now = time.time()
@@ -134,6 +138,64 @@ def test_filter(bee_factory):
     assert len(filtered.calls) == 1, "Listener with filters did not call on_event for an event with topic"
 
 
+def test_filter_wildcards(bee_factory):
+    listener = bee_factory.create(
+        'listener', filters=[Pattern('orders.*.created'), Pattern('audit.#'),
+                             'exact', 42]
+    )
+    topics = {
+        'orders.eu.created': True,
+        'orders.eu.created.late': False,
+        'orders.created': False,
+        'audit': True,
+        'audit.user.login': True,
+        'auditing': False,
+        'exact': True,
+        42: True,
+        None: False,
+    }
+    for topic, expected in topics.items():
+        event = pybeehive.Event('data', topic=topic)
+        assert listener.filter(event) is expected, \
+            'Incorrect match for topic %s' % topic
+
+
+def test_filters_without_patterns_match_exactly(bee_factory):
+    listener = bee_factory.create('listener', filters=['C#', 'a*b', 'x.*'])
+    for topic in ['C#', 'a*b', 'x.*']:
+        assert listener.filter(pybeehive.Event('data', topic=topic)), \
+            'Exact filter %s did not match itself' % topic
+    for topic in ['C.d', 'acb', 'x.y']:
+        assert not listener.filter(pybeehive.Event('data', topic=topic)), \
+            'Exact filter matched %s as a pattern' % topic
+
+
+def test_filters_can_be_changed_in_place(bee_factory):
+    listener = bee_factory.create('listener', filters=['a'])
+    listener.filters.add('b')
+    listener.filters.add(Pattern('c.#'))
+    listener.filters.discard('a')
+    assert isinstance(listener.filters, set)
+    assert not listener.filter(pybeehive.Event('data', topic='a'))
+    assert listener.filter(pybeehive.Event('data', topic='b'))
+    assert listener.filter(pybeehive.Event('data', topic='c.d'))
+
+
+def test_topic_trie():
+    trie = pybeehive.topics.TopicTrie(
+        [Pattern('#.error'), Pattern('a.#.z'), Pattern('*')]
+    )
+    assert trie.match('x') and not trie.match('x.y'), 'Incorrect * match'
+    assert trie.match('error') and trie.match('x.y.error'), \
+        'Incorrect leading # match'
+    assert trie.match('a.z') and trie.match('a.b.c.z'), \
+        'Incorrect inner # match'
+    assert not trie.match('a.b.c'), 'Matched a topic without its suffix'
+    assert not trie.match(['unhashable']), 'Matched an unhashable topic'
+    with pytest.raises(ValueError):
+        Pattern('orders.eu*')
+
+
 def test_notify(bee_factory):
     listener = bee_factory.create('listener')
     listener.notify(1)
@@ -194,3 +256,139 @@ def test_chained_notify_with_exception(bee_factory):
     listener1.notify(1)
     assert len(listener2.calls) == 0, 'First chained on_event triggered'
     assert len(listener3.calls) == 0, 'Second chained on_event triggered'
+
+
+def test_stream_batch(bee_factory):
+    q = pybeehive.utils.Queue()
+    streamer = bee_factory.create('streamer', topic='batch')
+
+    def stream():
+        yield pybeehive.Batch(range(5))
+        yield 5
+        streamer.kill()
+
+    streamer.stream = stream
+    streamer.set_queue(q)
+    streamer.run()
+    events = [q.get_nowait() for _ in range(q.qsize())]
+    assert [e.data for e in events] == list(range(6)), \
+        'Stream did not yield batched data in order'
+    assert all(e.topic == 'batch' for e in events), \
+        'Batched events did not get the streamer topic'
+
+
+def test_queue_put_many():
+    q = pybeehive.utils.Queue(maxsize=3)
+    q.put_many([1, 2])
+    assert q.qsize() == 2, 'Did not put all items'
+    with pytest.raises(Full):
+        q.put_many_nowait([3, 4])
+    with pytest.raises(Full):
+        q.put_many([3, 4], timeout=0.001)
+    q.put_many_nowait([3])
+    assert [q.get_nowait() for _ in range(3)] == [1, 2, 3], \
+        'Items were not put in order'
+
+
+def test_conflating_queue():
+    q = pybeehive.utils.ConflatingQueue(key=lambda e: e.data['key'])
+    for i, key in enumerate('abacab'):
+        q.put(pybeehive.Event({'key': key, 'value': i}))
+    assert q.qsize() == 3, 'Did not bound the queue by distinct keys'
+    assert [q.get_nowait().data['value'] for _ in range(3)] == [4, 5, 3], \
+        'Did not keep the newest event in first arrival order'
+    assert q.conflated == 3, 'Did not count conflated events'
+    for _ in range(3):
+        q.task_done()
+    q.join()
+
+
+def test_full_conflating_queue_replaces_pending_keys():
+    q = pybeehive.utils.ConflatingQueue(maxsize=2)
+    q.put(pybeehive.Event(1, topic='a'))
+    q.put(pybeehive.Event(2, topic='b'))
+    q.put(pybeehive.Event(3, topic='a'), timeout=0.01)
+    q.put_many([pybeehive.Event(4, topic='b')], timeout=0.01)
+    with pytest.raises(Full):
+        q.put(pybeehive.Event(5, topic='c'), timeout=0.01)
+    with pytest.raises(Full):
+        q.put_many_nowait([pybeehive.Event(6, topic='a'),
+                           pybeehive.Event(7, topic='c')])
+    assert [q.get_nowait().data for _ in range(2)] == [3, 4], \
+        'Did not replace pending events of a full queue'
+
+
+def test_filter_predicates(bee_factory):
+    listener = bee_factory.create('listener', filters=[
+        'trades', 'quotes',
+        pybeehive.Eq('type', 'trade'),
+        pybeehive.Range('order.size', 10, 100),
+    ])
+    events = [
+        ({'type': 'trade', 'order': {'size': 10}}, 'trades', True),
+        ({'type': 'trade', 'order': {'size': 10}}, 'quotes', True),
+        ({'type': 'trade', 'order': {'size': 10}}, 'other', False),
+        ({'type': 'trade', 'order': {'size': 100}}, 'trades', False),
+        ({'type': 'quote', 'order': {'size': 10}}, 'trades', False),
+        ({'type': 'trade'}, 'trades', False),
+        ({'type': 'trade', 'order': {'size': 'big'}}, 'trades', False),
+        ('not a mapping', 'trades', False),
+    ]
+    for data, topic, expected in events:
+        event = pybeehive.Event(data, topic=topic)
+        assert listener.filter(event) is expected, \
+            'Incorrect match for %s %s' % (topic, data)
+
+
+def test_predicate_index():
+    from pybeehive.predicates import PredicateIndex
+    calls = []
+
+    class Counted(pybeehive.Range):
+        def test(self, value):
+            calls.append(value)
+            return super(Counted, self).test(value)
+
+    eq = pybeehive.Eq('side', 'buy')
+    members = pybeehive.In('side', ['buy', 'sell'])
+    rng = Counted('price', 0, 10)
+    index = PredicateIndex([eq, members, rng, pybeehive.Eq('side', 'buy')])
+    assert len(index) == 3, 'Equal predicates were not deduplicated'
+    event = pybeehive.Event({'side': 'sell', 'price': 5})
+    for _ in range(3):
+        assert not index.evaluate(eq, event), 'Incorrect equality result'
+        assert index.evaluate(members, event), 'Incorrect membership result'
+        assert index.evaluate(rng, event), 'Incorrect range result'
+    assert calls == [5], 'Predicate was evaluated more than once per event'
+    assert index.evaluate(eq, pybeehive.Event({'side': 'buy'})), \
+        'Results were not reset for a new event'
+
+
+def test_lane_queue_strict():
+    q = pybeehive.utils.LaneQueue(topic_priorities={'control': 10})
+    q.put(pybeehive.Event('telemetry'))
+    q.put(pybeehive.Event('low', priority=-1))
+    q.put(pybeehive.Event('stop', topic='control'))
+    q.put(pybeehive.Event('urgent', priority=20))
+    assert q.lengths() == {0: 1, -1: 1, 10: 1, 20: 1}, 'Incorrect lanes'
+    assert [q.get_nowait().data for _ in range(4)] == \
+        ['urgent', 'stop', 'telemetry', 'low'], 'Did not serve by priority'
+
+
+def test_lane_queue_weighted():
+    q = pybeehive.utils.LaneQueue(weights={1: 3, 0: 1})
+    for i in range(8):
+        q.put(pybeehive.Event(('high', i), priority=1))
+        q.put(pybeehive.Event(('low', i)))
+    served = [q.get_nowait().data[0] for _ in range(8)]
+    assert served.count('high') == 6 and served.count('low') == 2, \
+        'Lanes were not served in proportion to their weights'
+
+
+def test_lane_queue_starvation():
+    q = pybeehive.utils.LaneQueue(max_wait=0.01)
+    q.put(pybeehive.Event('low', priority=0))
+    time.sleep(0.02)
+    q.put(pybeehive.Event('high', priority=1))
+    assert q.get_nowait().data == 'low', 'Starved event was not promoted'
+    assert q.queue.promoted == 1, 'Did not count promoted event'
@@ -320,8 +320,269 @@ def test_setup_teardown_exceptions(hive, bee_factory):
 
     for bee in [s_failed_teardown, s_failed_setup, s_failed_both]:
         assert bee.count > 0, 'Streamer with failed setup did not run'
+    failed = [bee for bee, _ in hive.setup_errors]
+    assert len(failed) == 4 and all(bee in failed for bee in [
+        l_failed_setup, s_failed_setup, l_failed_both, s_failed_both
+    ]), 'Failed setups were not recorded'
 
     assert l_failed_setup.teardown_event.is_set(), \
         'Did not attempt to teardown listener with failed setup'
     assert s_failed_setup.teardown_event.is_set(), \
         'Did not attempt to teardown streamer with failed setup'
+
+
+def test_submit_events(hive):
+    calls = []
+
+    @hive.listener
+    def on_event(event):
+        calls.append(event)
+
+    hive.submit_events(pybeehive.Event(i) for i in range(5))
+    run_kill_hive(hive)
+    assert [e.data for e in calls] == list(range(5)), \
+        'Listener did not receive all submitted events in order'
+
+    with pytest.raises(AssertionError):
+        hive.submit_events([pybeehive.Event(1), 2])
+
+
+def test_batched_streamer(hive, bee_factory):
+    listener = bee_factory.create('listener')
+    hive.add(listener)
+
+    @hive.streamer
+    def stream():
+        yield pybeehive.Batch(range(10))
+        while True:
+            time.sleep(1e-3)
+            yield pybeehive.Batch()
+
+    run_kill_hive(hive)
+    assert [e.data for e in listener.calls] == list(range(10)), \
+        'Batched streamer did not submit all events'
+
+
+def test_listener_tree_index(bee_factory):
+    tree = pybeehive.hive._ListenerTree()
+    root = bee_factory.create('listener')
+    tree.add_listener(root)
+    children = [bee_factory.create('listener') for _ in range(3)]
+    for child in children:
+        tree.add_listener(child, chain='TestListener')
+    # 1 root, then 1 child chained to the root, then 1 child chained to
+    # both, then 1 child chained to all four previous listeners
+    assert len(tree) == 1, 'Chained listeners were counted as roots'
+    assert tree.flatten() == [root] + children, 'Incorrect flattened order'
+    assert len(root.chained_bees) == 3, 'Did not chain to every listener'
+    assert len(children[1].chained_bees) == 1, 'Did not chain to children'
+    # Chaining outside of the tree invalidates the index
+    extra = children[2].chain(bee_factory.create('listener'))
+    assert tree.listeners_by_name('TestListener')[-1] is extra, \
+        'Index was not updated after chaining outside of the tree'
+    assert tree.flatten()[-1] is extra, \
+        'Order was not updated after chaining outside of the tree'
+    tree.add_listener(bee_factory.create('listener'), chain='Missing')
+    assert len(tree.flatten()) == 5, 'Indexed an unreachable listener'
+
+
+def test_listener_tree_large(hive):
+    n = 10000
+    for i in range(n):
+        def on_event(event):
+            return event
+        on_event.__name__ = 'listener%d' % i
+        if i == 0:
+            hive.listener(on_event)
+        else:
+            hive.listener(chain='listener%d' % (i - 1))(on_event)
+    assert len(hive.listeners) == 1, 'Chained listeners were counted as roots'
+    flat = hive.listeners.flatten()
+    assert len(flat) == n, 'Did not flatten deep chain'
+    assert [l.__class__.__name__ for l in flat[:3]] == \
+        ['listener0', 'listener1', 'listener2'], 'Incorrect order'
+    assert len(hive.listeners.call_method_recursively('setup')) == n, \
+        'Did not call method on every listener'
+
+
+def test_listener_tree_compile(hive):
+    calls, errors = [], []
+
+    @hive.listener
+    def first(event):
+        calls.append(('first', event.data))
+        return event.data + 1
+
+    @hive.listener(chain='first', filters=['even'])
+    def second(event):
+        calls.append(('second', event.data))
+        if event.data == 4:
+            raise ValueError(event.data)
+        return event
+
+    @hive.listener(chain='second')
+    def third(event):
+        calls.append(('third', event.data))
+
+    first_listener = hive.listeners.listeners_by_name('first')[0]
+    hive.listeners.listeners_by_name('second')[0].on_exception = \
+        errors.append
+    for bee in hive.listeners.flatten():
+        if bee is not first_listener:
+            bee.filter = lambda e: e.data % 2 == 0
+    plan = hive.listeners.compile()
+    assert hive.listeners.compile() is plan, 'Plan was not cached'
+    assert plan[0].stages == tuple(hive.listeners.flatten()), \
+        'Single successor chain was not fused'
+    for i in range(4):
+        for bee in plan:
+            bee.notify(pybeehive.Event(i))
+    assert calls == [
+        ('first', 0), ('first', 1), ('second', 2), ('third', 2),
+        ('first', 2), ('first', 3), ('second', 4)
+    ], 'Plan did not match notify semantics'
+    assert len(errors) == 1 and isinstance(errors[0], ValueError), \
+        'Exception was not handled by the failing listener'
+    hive.listener(chain='first')(lambda e: None)
+    assert hive.listeners.compile() is not plan, 'Plan was not invalidated'
+
+
+def test_listener_tree_compile_matches_notify(bee_factory):
+    class Overridden(pybeehive.Listener):
+        def notify(self, event):
+            self.calls.append(event)
+
+        def on_event(self, event):
+            return event  # pragma: nocover
+
+    def build():
+        root = bee_factory.create('listener')
+        leaf = root.chain(bee_factory.create('listener'))
+        opaque = Overridden()
+        opaque.calls = []
+        leaf.chain(opaque)
+        leaf.chain(bee_factory.create('listener'))
+        tree = pybeehive.hive._ListenerTree()
+        tree.add_listener(root)
+        return tree, opaque
+
+    notified, opaque_notified = build()
+    compiled, opaque_compiled = build()
+    for i in range(5):
+        for bee in notified:
+            bee.notify(pybeehive.Event(i))
+        for bee in compiled.compile():
+            bee.notify(pybeehive.Event(i))
+    assert [[e.data for e in b.calls] for b in notified.flatten()] == \
+        [[e.data for e in b.calls] for b in compiled.flatten()], \
+        'Compiled plan diverged from notify'
+    assert opaque_compiled in compiled.compile()[0].children, \
+        'Listener that overrides notify was compiled'
+
+
+def test_listener_predicates_shared_index(hive):
+    for i in range(3):
+        hive.listener(filters=pybeehive.Eq('type', 'trade'))(lambda e: e)
+    index = hive.listeners.bind_predicates()
+    assert len(index) == 1, 'Predicates were not shared between listeners'
+    assert all(bee.predicate_index is index
+               for bee in hive.listeners.flatten()), \
+        'Listeners were not bound to the index'
+
+
+def test_conflating_event_queue(bee_factory):
+    hive = pybeehive.Hive(queue=pybeehive.utils.ConflatingQueue())
+    listener = bee_factory.create('listener')
+    hive.add(listener)
+    hive.submit_events(
+        pybeehive.Event(i, topic='quote.%d' % (i % 3)) for i in range(30)
+    )
+    run_kill_hive(hive)
+    assert [e.data for e in listener.calls] == [27, 28, 29], \
+        'Hive did not consume the conflated queue'
+
+
+def test_shedder_drops_expired_events(hive, bee_factory):
+    listener = bee_factory.create('listener')
+    hive.add(listener)
+    hive.shedder = pybeehive.LoadShedder(ttl=60)
+    hive.submit_events([
+        pybeehive.Event('old', created_at=1), pybeehive.Event('new')
+    ])
+    run_kill_hive(hive)
+    assert [e.data for e in listener.calls] == ['new'], \
+        'Hive dispatched an expired event'
+    assert hive.shedder.expired[None] == 1, 'Did not count expired event'
+
+
+def test_submit_event_priority(bee_factory):
+    hive = pybeehive.Hive(queue=pybeehive.utils.LaneQueue())
+    listener = bee_factory.create('listener')
+    hive.add(listener)
+    hive.submit_events(pybeehive.Event(i) for i in range(3))
+    hive.submit_event(pybeehive.Event('control'), priority=1)
+    run_kill_hive(hive)
+    assert [e.data for e in listener.calls] == ['control', 0, 1, 2], \
+        'Did not dispatch the event with a higher priority first'
+
+
+def test_journal_queue_acknowledges_events(tmpdir, bee_factory):
+    from pybeehive.journal import Journal, JournalQueue
+    journal = Journal(str(tmpdir))
+    hive = pybeehive.Hive(queue=JournalQueue(journal))
+    listener = bee_factory.create('listener')
+    hive.add(listener)
+    hive.submit_events(pybeehive.Event(i) for i in range(5))
+    run_kill_hive(hive)
+    journal.close()
+    assert len(listener.calls) == 5, 'Hive did not dispatch every event'
+    assert journal.acked == 5, 'Hive did not acknowledge dispatched events'
+
+
+def test_drain(hive):
+    calls = []
+
+    @hive.listener
+    def slow(event):
+        time.sleep(0.01)
+        calls.append(event)
+
+    hive.submit_events(pybeehive.Event(i) for i in range(10))
+    thread = hive.run(threaded=True)
+    assert hive.live.wait(1), 'Hive did not become live'
+    assert hive.drain(timeout=2), 'Queued events were not dispatched'
+    assert len(calls) == 10, 'Drain returned before the last event was handled'
+    hive.submit_event(pybeehive.Event('late'))
+    assert not hive.drain(timeout=0), 'Drain did not time out'
+    hive.close()
+    thread.join()
+    assert not hive.live.is_set(), 'Closed hive is still live'
+    assert not hive.drain(), 'Drain did not return for a closed hive'
+
+
+def test_journal_queue_waits_for_actors(tmpdir):
+    from pybeehive.actors import ActorListener
+    from pybeehive.journal import Journal, JournalQueue
+    handling, release = Event(), Event()
+
+    class Actor(ActorListener):
+        def on_event(self, event):
+            handling.set()
+            release.wait()
+
+    journal = Journal(str(tmpdir))
+    hive = pybeehive.Hive(queue=JournalQueue(journal))
+    hive.add(Actor())
+    hive.submit_event(pybeehive.Event('slow'))
+    thread = hive.run(threaded=True)
+    assert handling.wait(1), 'Actor did not receive the event'
+    time.sleep(0.05)
+    assert journal.acked == 0, 'Acknowledged an event the actor handles'
+    release.set()
+    start = time.time()
+    while journal.acked < 1 and time.time() - start < 1:
+        time.sleep(0.01)
+    hive.close()
+    thread.join()
+    journal.close()
+    assert journal.acked == 1, 'Did not acknowledge the handled event'
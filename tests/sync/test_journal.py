@@ -0,0 +1,129 @@
+from threading import Event, Thread
+import os
+
+from pybeehive.journal import Journal, JournalQueue
+import pybeehive
+
+
+def events(n, start=0):
+    return [pybeehive.Event(i) for i in range(start, start + n)]
+
+
+def segments(path):
+    return sorted(f for f in os.listdir(str(path)) if f.endswith('.seg'))
+
+
+def test_append_and_replay(tmpdir):
+    event = pybeehive.Event('a', topic='t')
+    with Journal(str(tmpdir)) as journal:
+        assert journal.append(event) == 1, \
+            'Sequence numbers do not start at 1'
+        seq = journal.append_many(events(3))
+        assert journal.wait(seq, timeout=1), 'Events were not committed'
+        replayed = list(journal.replay())
+    assert [s for s, _ in replayed] == [1, 2, 3, 4], \
+        'Incorrect sequence numbers'
+    assert replayed[0][1] == event, 'Event did not survive the journal'
+
+
+def test_group_commit(tmpdir):
+    journal = Journal(str(tmpdir), commit_interval=0.01)
+
+    def write():
+        for event in events(20):
+            journal.wait(journal.append(event))
+
+    writers = [Thread(target=write) for _ in range(8)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    journal.close()
+    assert journal.appended == 160, 'Did not append every event'
+    assert journal.commits < 160, 'Writers did not share fsyncs'
+
+
+def test_recover_unacked_events(tmpdir):
+    journal = Journal(str(tmpdir), segment_size=200)
+    journal.wait(journal.append_many(events(10)))
+    journal.ack(6)
+    journal.close()
+    assert len(segments(tmpdir)) < 10, 'Acknowledged segments were kept'
+    journal = Journal(str(tmpdir), segment_size=200)
+    assert [e.data for _, e in journal.replay()] == [6, 7, 8, 9], \
+        'Did not replay exactly the unacknowledged events'
+    assert journal.append(pybeehive.Event('next')) == 11, \
+        'Sequence numbers did not continue after recovery'
+    journal.close()
+
+
+def test_recover_torn_write(tmpdir):
+    journal = Journal(str(tmpdir))
+    journal.wait(journal.append_many(events(3)))
+    journal.close()
+    path = os.path.join(str(tmpdir), segments(tmpdir)[-1])
+    size = os.path.getsize(path)
+    with open(path, 'ab') as f:
+        f.write(b'\x00\x00\x00\x00\x00\x00\x00\x04\x00\x00\x01\x00garbage')
+    journal = Journal(str(tmpdir))
+    assert os.path.getsize(path) == size, 'Torn write was not truncated'
+    assert [e.data for _, e in journal.replay()] == [0, 1, 2], \
+        'Did not recover the valid events'
+    journal.close()
+
+
+def test_journal_queue(tmpdir):
+    q = JournalQueue(Journal(str(tmpdir)))
+    q.put_many(events(3))
+    q.put(pybeehive.Event(3))
+    assert q.get().data == 0, 'Did not queue events in order'
+    q.task_done()
+    assert q.journal.acked == 1, 'Did not acknowledge the handled event'
+    q.journal.close()
+    # The three unacknowledged events are queued again after a restart
+    q = JournalQueue(Journal(str(tmpdir)))
+    assert [q.get_nowait().data for _ in range(3)] == [1, 2, 3], \
+        'Unacknowledged events were not recovered'
+    q.journal.close()
+
+
+def test_journal_queue_out_of_order_producers(tmpdir):
+    q = JournalQueue(Journal(str(tmpdir)))
+    wait, blocked, release = q.journal.wait, Event(), Event()
+
+    def slow_wait(seq, timeout=None):
+        if seq == 1:
+            blocked.set()
+            release.wait()
+        return wait(seq, timeout)
+
+    q.journal.wait = slow_wait
+    slow = Thread(target=q.put, args=(pybeehive.Event('first'),))
+    slow.start()
+    blocked.wait()
+    fast = Thread(target=q.put, args=(pybeehive.Event('second'),))
+    fast.start()
+    fast.join()
+    assert q.get().data == 'second', 'Second event was not queued first'
+    q.task_done()
+    assert q.journal.acked == 0, 'Acknowledged past an unhandled event'
+    release.set()
+    slow.join()
+    assert q.get().data == 'first', 'First event was not queued'
+    q.task_done()
+    assert q.journal.acked == 2, 'Did not acknowledge both events'
+    q.journal.close()
+
+
+def test_journal_queue_holds(tmpdir):
+    q = JournalQueue(Journal(str(tmpdir)))
+    q.put_many(events(2))
+    q.get()
+    release = q.hold()
+    q.task_done()
+    q.get()
+    q.task_done()
+    assert q.journal.acked == 0, 'Acknowledged a held event'
+    release()
+    assert q.journal.acked == 2, 'Did not acknowledge the released event'
+    q.journal.close()
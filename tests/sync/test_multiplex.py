@@ -0,0 +1,119 @@
+from queue import Queue
+from threading import Thread
+import socket
+import threading
+import time
+import pytest
+
+from pybeehive.multiplex import IOStreamer, Multiplexer
+import pybeehive
+
+
+class SocketReader(IOStreamer):
+    def __init__(self, topic=None):
+        super(SocketReader, self).__init__(topic=topic)
+        self.reader, self.writer = socket.socketpair()
+        self.reader.setblocking(False)
+        self.fileobj = self.reader
+        self.torn_down = False
+
+    def teardown(self):
+        self.torn_down = True
+        self.reader.close()
+        self.writer.close()
+
+    def stream(self):
+        data = self.reader.recv(4096)
+        if not data:
+            self.kill()
+        for line in data.decode().split():
+            yield line
+
+
+def wait_for(condition, timeout=2):
+    start = time.time()
+    while not condition() and time.time() - start < timeout:
+        time.sleep(1e-3)
+
+
+@pytest.mark.parametrize('workers', [0, 4])
+def test_multiplexer(workers):
+    q = Queue()
+    streamers = [SocketReader(topic=i) for i in range(50)]
+    multiplexer = Multiplexer(workers=workers)
+    for streamer in streamers:
+        streamer.set_queue(q)
+        multiplexer.register(streamer)
+    threads = threading.active_count()
+    multiplexer.start()
+    try:
+        assert threading.active_count() == threads + 1, \
+            'Multiplexer did not use a single thread'
+        for i in range(3):
+            for streamer in streamers:
+                streamer.writer.send(b'%d ' % i)
+        wait_for(lambda: q.qsize() == 150)
+        events = [q.get_nowait() for _ in range(q.qsize())]
+        assert len(events) == 150, 'Did not read from all streamers'
+        for streamer in streamers:
+            assert [e.data for e in events if e.topic == streamer.topic] \
+                == ['0', '1', '2'], 'Did not read data in order'
+        # closing the write end kills the streamer
+        streamers[0].writer.close()
+        wait_for(lambda: streamers[0] not in multiplexer.streamers)
+        assert not streamers[0].alive, 'Streamer was not killed on EOF'
+        assert streamers[0] not in multiplexer.streamers, \
+            'Killed streamer was not unregistered'
+    finally:
+        multiplexer.shutdown()
+        for streamer in streamers:
+            streamer.teardown()
+
+
+def test_standalone_run():
+    q = Queue()
+    streamer = SocketReader()
+    streamer.set_queue(q)
+    thread = Thread(target=streamer.run)
+    thread.start()
+    streamer.writer.send(b'a b')
+    wait_for(lambda: q.qsize() == 2)
+    streamer.kill()
+    thread.join()
+    streamer.teardown()
+    assert [q.get_nowait().data for _ in range(2)] == ['a', 'b'], \
+        'Standalone streamer did not read data'
+
+
+@pytest.mark.parametrize('io_workers', [0, 2])
+def test_hive_io_streamers(io_workers, bee_factory):
+    hive = pybeehive.Hive(io_workers=io_workers)
+    listener = bee_factory.create('listener')
+    hive.add(listener)
+    streamers = [SocketReader() for _ in range(20)]
+    hive.add(*streamers)
+    reader, writer = socket.socketpair()
+    reader.setblocking(False)
+
+    @hive.io_streamer(reader, topic='decorated')
+    def read():
+        yield reader.recv(4096)
+
+    threads = threading.active_count()
+    hive.run(threaded=True)
+    # one thread for the hive and one for the multiplexer
+    wait_for(lambda: hive._multiplexer and hive._multiplexer.streamers)
+    assert threading.active_count() == threads + 2, \
+        'IO streamers did not share a thread'
+    for streamer in streamers:
+        streamer.writer.send(b'x')
+    writer.send(b'y')
+    wait_for(lambda: len(listener.calls) == 21)
+    hive.close()
+    assert len(listener.calls) == 21, 'Did not process all IO events'
+    assert [e.data for e in listener.calls if e.topic == 'decorated'] \
+        == [b'y'], 'Decorated IO streamer did not stream data'
+    wait_for(lambda: all(s.torn_down for s in streamers))
+    assert all(s.torn_down for s in streamers), 'Did not teardown streamers'
+    reader.close()
+    writer.close()
@@ -0,0 +1,124 @@
+from queue import Empty
+from threading import Thread
+import random
+import time
+import pytest
+
+from pybeehive.partition import HashRing
+from pybeehive.socket import PartitionedSocketListener, Server
+import pybeehive
+
+
+def receive(servers, count, timeout=2):
+    received = {address: [] for address in servers}
+    deadline = time.time() + timeout
+    while sum(map(len, received.values())) < count \
+            and time.time() < deadline:
+        for address, server in servers.items():
+            try:
+                data = server.queue.get(timeout=1e-3)
+            except Empty:
+                continue
+            received[address].append(pybeehive.Event.fromstring(data))
+    return received
+
+
+def test_ring_is_stable():
+    ring = HashRing(['a', 'b', 'c'])
+    other = HashRing(['c', 'b', 'a'])
+    keys = ['key-%d' % i for i in range(1000)]
+    assert [ring.get(k) for k in keys] == [other.get(k) for k in keys], \
+        "Ring depends on the order the nodes were added in"
+    counts = {node: 0 for node in ring.nodes}
+    for key in keys:
+        counts[ring.get(key)] += 1
+    assert min(counts.values()) > 200, "Keys are not spread evenly"
+
+
+def test_ring_add_moves_keys_to_new_node():
+    ring = HashRing(['a', 'b', 'c'])
+    keys = ['key-%d' % i for i in range(2000)]
+    before = {k: ring.get(k) for k in keys}
+    ring.add('d')
+    moved = [k for k in keys if ring.get(k) != before[k]]
+    assert all(ring.get(k) == 'd' for k in moved), \
+        "Keys moved between existing nodes"
+    assert 0.15 < len(moved) / len(keys) < 0.35, \
+        "Adding a node did not move about 1/N of the keys"
+    ring.remove('d')
+    assert {k: ring.get(k) for k in keys} == before, \
+        "Removing a node did not restore the mapping"
+    assert len(ring) == 3 and 'd' not in ring
+
+
+def test_ring_errors():
+    with pytest.raises(LookupError):
+        HashRing().get('key')
+    with pytest.raises(ValueError):
+        HashRing(replicas=0)
+
+
+def test_partitioned_socket_listener():
+    port = random.randint(7000, 10000)
+    addresses = [('127.0.0.1', port + i) for i in range(3)]
+    servers = {a: Server(a) for a in addresses}
+    listener = PartitionedSocketListener(addresses[:2])
+    for server in servers.values():
+        server.start()
+    listener.setup()
+    try:
+        topics = ['topic-%d' % i for i in range(20)]
+        for i in range(100):
+            listener.notify(pybeehive.Event(i, topic=topics[i % 20]))
+        received = receive(servers, 100)
+        assert sum(map(len, received.values())) == 100
+        assert not received[addresses[2]], "Event sent to an unknown node"
+        for address, events in received.items():
+            assert all(listener.ring.get(e.topic) == address
+                       for e in events), "Event sent to the wrong node"
+
+        listener.add_node(addresses[2])
+        for i in range(100):
+            listener.notify(pybeehive.Event(i, topic=topics[i % 20]))
+        received = receive(servers, 100)
+        assert received[addresses[2]], "No events sent to the added node"
+        assert sum(map(len, received.values())) == 100
+
+        listener.remove_node(addresses[0])
+        for i in range(100):
+            listener.notify(pybeehive.Event(i, topic=topics[i % 20]))
+        received = receive(servers, 100)
+        assert not received[addresses[0]], "Event sent to a removed node"
+        assert sum(map(len, received.values())) == 100
+    finally:
+        listener.teardown()
+        for server in servers.values():
+            server.shutdown()
+
+
+def test_remove_node_that_is_down():
+    address = '127.0.0.1', random.randint(7000, 10000)
+    listener = PartitionedSocketListener([address], reliable=True, window=2)
+    listener.setup()
+    try:
+        sender = Thread(target=lambda: [
+            listener.notify(pybeehive.Event(i)) for i in range(10)
+        ])
+        sender.start()
+        time.sleep(0.1)
+        assert sender.is_alive(), "Send did not wait for the node"
+        remover = Thread(target=listener.remove_node, args=(address,))
+        remover.start()
+        remover.join(2)
+        assert not remover.is_alive(), "Removing a node that is down blocked"
+        sender.join(2)
+        assert not sender.is_alive(), "Send to a removed node did not return"
+    finally:
+        listener.teardown()
+
+
+def test_partitioned_socket_listener_key():
+    listener = PartitionedSocketListener([('127.0.0.1', 1)],
+                                         key=lambda e: e.data['user'])
+    assert listener.key(pybeehive.Event({'user': 'a'})) == 'a'
+    listener.teardown()
@@ -0,0 +1,225 @@
+from queue import Empty
+import random
+import time
+import pytest
+
+from pybeehive.reliable import ReliableSender, ReliableReceiver
+from pybeehive.socket import ReliableClient, ReliableServer, SocketStreamer
+import pybeehive
+
+
+def transfer(sender, receiver, frames, peer=b'peer'):
+    return [receiver.receive(peer, f, now=0) for f in frames]
+
+
+def receive(server, count, timeout=5):
+    messages, deadline = [], time.time() + timeout
+    while len(messages) < count and time.time() < deadline:
+        try:
+            messages.append(server.queue.get(timeout=0.01))
+        except Empty:
+            continue
+    return messages
+
+
+def test_sender_receiver_in_order():
+    sender, receiver = ReliableSender(), ReliableReceiver()
+    frames = [sender.wrap(str(i).encode(), now=0) for i in range(5)]
+    assert transfer(sender, receiver, frames) == \
+        [b'0', b'1', b'2', b'3', b'4'], "Payloads not delivered in order"
+    assert len(sender) == 5, "Frames released before their ack"
+    assert receiver.delivered == 5
+
+
+def test_receiver_suppresses_duplicates():
+    sender, receiver = ReliableSender(), ReliableReceiver()
+    frames = [sender.wrap(b'data', now=0) for _ in range(3)]
+    transfer(sender, receiver, frames)
+    assert transfer(sender, receiver, frames) == [None] * 3, \
+        "Duplicate frames were delivered"
+    assert receiver.duplicates == 3
+
+
+def test_receiver_drops_frames_after_gap():
+    sender, receiver = ReliableSender(), ReliableReceiver()
+    frames = [sender.wrap(str(i).encode(), now=0) for i in range(3)]
+    assert transfer(sender, receiver, [frames[0], frames[2]]) == \
+        [b'0', None], "Frame after a gap was delivered"
+    assert receiver.out_of_order == 1
+    assert transfer(sender, receiver, frames[1:]) == [b'1', b'2'], \
+        "Resent frames were not delivered"
+
+
+def test_batched_cumulative_acks():
+    sender = ReliableSender()
+    receiver = ReliableReceiver(ack_every=3, ack_interval=1)
+    frames = [sender.wrap(b'data', now=0) for _ in range(5)]
+    transfer(sender, receiver, frames[:2])
+    assert receiver.acks(now=0.5) == [], "Ack was not batched"
+    transfer(sender, receiver, frames[2:])
+    acks = receiver.acks(now=0.5)
+    assert len(acks) == 1, "Ack not sent after ack_every frames"
+    peer, ack = acks[0]
+    assert peer == b'peer'
+    assert sender.receive(ack, now=0.5) == 5, "Ack was not cumulative"
+    assert len(sender) == 0 and sender.acked == 5
+    assert sender.receive(ack, now=0.5) == 0, "Stale ack released frames"
+
+
+def test_ack_interval():
+    sender = ReliableSender()
+    receiver = ReliableReceiver(ack_every=100, ack_interval=0.01)
+    transfer(sender, receiver, [sender.wrap(b'data', now=0)])
+    assert receiver.acks(now=0.005) == []
+    assert len(receiver.acks(now=0.01)) == 1, "Ack not sent after interval"
+    assert receiver.acks(now=1) == [], "Ack sent twice"
+
+
+def test_go_back_n_resend():
+    sender = ReliableSender(ack_timeout=1)
+    frames = [sender.wrap(str(i).encode(), now=0) for i in range(3)]
+    assert sender.due(now=0.5) == [], "Frames resent before the ack timeout"
+    assert sender.due(now=1) == frames, "Unacked frames were not resent"
+    assert sender.retransmitted == 3
+    assert sender.due(now=1.5) == [], "Resend did not reset the timeout"
+
+
+def test_sender_window():
+    sender = ReliableSender(window=2)
+    sender.wrap(b'data')
+    sender.wrap(b'data')
+    assert sender.full
+    with pytest.raises(OverflowError):
+        sender.wrap(b'data')
+    with pytest.raises(ValueError):
+        ReliableSender(window=0)
+
+
+def test_restarted_receiver_starts_at_oldest_unacked():
+    sender = ReliableSender(ack_timeout=1)
+    receiver = ReliableReceiver(ack_every=1)
+    transfer(sender, receiver, [sender.wrap(b'0', now=0)])
+    for _, ack in receiver.acks(now=0):
+        sender.receive(ack, now=0)
+    lost = sender.wrap(b'1', now=0)
+    receiver = ReliableReceiver()
+    assert transfer(sender, receiver, [sender.wrap(b'2', now=0)]) == [None], \
+        "Frame after a lost frame was delivered"
+    assert lost in sender.due(now=1)
+    assert transfer(sender, receiver, sender.resend(now=1)) == [b'1', b'2']
+
+
+def test_restarted_sender_starts_new_session():
+    receiver = ReliableReceiver()
+    sender = ReliableSender()
+    transfer(sender, receiver, [sender.wrap(b'old', now=0)])
+    sender = ReliableSender()
+    assert transfer(sender, receiver, [sender.wrap(b'new', now=0)]) == \
+        [b'new'], "Frame of a new session was suppressed"
+
+
+def test_max_peers():
+    receiver = ReliableReceiver(max_peers=2)
+    for peer in (b'a', b'b', b'c'):
+        sender = ReliableSender()
+        receiver.receive(peer, sender.wrap(b'data'))
+    assert len(receiver._peers) == 2
+    receiver.forget(b'c')
+    assert list(receiver._peers) == [b'b']
+
+
+def test_reliable_client_server():
+    port = random.randint(7000, 10000)
+    client = ReliableClient(('127.0.0.1', port), window=100)
+    server = ReliableServer(('127.0.0.1', port))
+    client.connect()
+    try:
+        # Sent before the server is up, so no peer receives them at first
+        for i in range(150):
+            client.send(str(i).encode())
+        server.start()
+        # Blocks while the window is full until the server acknowledges
+        for i in range(150, 500):
+            client.send(str(i).encode())
+        received = receive(server, 500)
+        assert received == [str(i).encode() for i in range(500)], \
+            "Messages were not delivered in order"
+        start = time.time()
+        while client.pending and time.time() - start < 2:
+            time.sleep(1e-3)
+        assert client.pending == 0, "Messages were not acknowledged"
+    finally:
+        client.shutdown()
+        server.shutdown()
+
+
+def test_reliable_server_restart():
+    port = random.randint(7000, 10000)
+    client = ReliableClient(('127.0.0.1', port), ack_timeout=0.05)
+    server = ReliableServer(('127.0.0.1', port))
+    server.start()
+    client.connect()
+    received = set()
+    try:
+        for i in range(100):
+            client.send(str(i).encode())
+        received.update(receive(server, 50))
+        server.shutdown()
+        server = ReliableServer(('127.0.0.1', port))
+        server.start()
+        for i in range(100, 200):
+            client.send(str(i).encode())
+        start = time.time()
+        while len(received) < 200 and time.time() - start < 5:
+            received.update(receive(server, 1, timeout=0.1))
+        assert received == {str(i).encode() for i in range(200)}, \
+            "Messages were lost when the server restarted"
+    finally:
+        client.shutdown()
+        server.shutdown()
+
+
+def test_reliable_socket_decorators(hive):
+    address = '127.0.0.1', random.randint(7000, 10000)
+    events = []
+
+    @hive.socket_listener(address, reliable=True)
+    def parse_event(event):
+        event = pybeehive.Event(event.data + 1, created_at=event.created_at)
+        events.append(event)
+        return event
+
+    @hive.socket_streamer(address, reliable=True)
+    def stream():
+        return
+
+    assert isinstance(hive.streamers[0].server, ReliableServer)
+    hive.submit_event(pybeehive.Event(-1))
+    hive.run(threaded=True)
+    start = time.time()
+    while len(events) < 5 and time.time() - start < 2:
+        time.sleep(1e-4)
+    hive.close()
+    assert len(events) >= 5, "Hive did not process all events"
+    for i, e in enumerate(events):
+        assert i == e.data, "Event data was not parsed by listener"
+
+
+def test_hive_closes_while_peer_is_down(hive):
+    address = '127.0.0.1', random.randint(7000, 10000)
+
+    @hive.socket_listener(address, reliable=True, window=2)
+    def parse_event(event):
+        return event
+
+    hive.submit_events(pybeehive.Event(i) for i in range(10))
+    thread = hive.run(threaded=True)
+    time.sleep(0.1)
+    hive.close()
+    thread.join(3)
+    assert not thread.is_alive(), "Hive waited for a peer that is down"
+
+
+def test_reliable_socket_streamer():
+    streamer = SocketStreamer(('127.0.0.1', 0), reliable=True)
+    assert isinstance(streamer.server, ReliableServer)
@@ -0,0 +1,82 @@
+from queue import Queue
+from threading import Thread
+import time
+
+from pybeehive.journal import Journal
+from pybeehive.replay import ReplayStreamer, Recorder, Pacer, read_log
+import pybeehive
+
+
+def record(path, n, start=1000.0, step=1.0):
+    recorder = Recorder(str(path), segment_size=500)
+    recorder.setup()
+    for i in range(n):
+        recorder.notify(pybeehive.Event(i, topic='t%d' % (i % 2),
+                                        created_at=start + i * step))
+    recorder.teardown()
+
+
+def replay(streamer):
+    q = Queue()
+    streamer.set_queue(q)
+    streamer.run()
+    return [q.get_nowait() for _ in range(q.qsize())]
+
+
+def test_read_log_batches(tmpdir):
+    record(tmpdir, 25)
+    batches = list(read_log(str(tmpdir), batch_size=4))
+    assert all(len(b) <= 4 for b in batches), 'Batches were too large'
+    assert [e.data for b in batches for e in b] == list(range(25)), \
+        'Did not read every recorded event in order'
+    filtered = read_log(str(tmpdir), start=1005, end=1010)
+    assert [e.data for b in filtered for e in b] == list(range(5, 10)), \
+        'Did not filter events by time'
+
+
+def test_replay_as_fast_as_possible(tmpdir):
+    record(tmpdir, 100)
+    streamer = ReplayStreamer(str(tmpdir), start=1050, batch_size=16)
+    events = replay(streamer)
+    assert [e.data for e in events] == list(range(50, 100)), \
+        'Did not replay the events in the time range'
+    assert events[0].created_at == 1050 and events[0].topic == 't0', \
+        'Did not keep the original created_at and topic'
+    assert streamer.replayed == 50, 'Did not count replayed events'
+    assert streamer.events_per_second > 0, 'Did not report events/s'
+    assert not streamer.alive, 'Streamer was restarted after the replay'
+
+
+def test_replay_scaled(tmpdir):
+    record(tmpdir, 3, step=0.5)
+    streamer = ReplayStreamer(str(tmpdir), speed=20)
+    start = time.time()
+    events = replay(streamer)
+    elapsed = time.time() - start
+    assert len(events) == 3, 'Did not replay every event'
+    assert 0.04 < elapsed < 0.5, 'Did not pace the replay'
+
+
+def test_pacer():
+    pacer = Pacer(speed=2)
+    first = pybeehive.Event(0, created_at=100)
+    assert pacer.delay(first, now=10) == 0, 'Delayed the first event'
+    assert pacer.delay(pybeehive.Event(1, created_at=104), now=11) == 1, \
+        'Did not scale the time between events'
+    assert Pacer().delay(first, now=0) == 0, 'Delayed an unpaced event'
+
+
+def test_recorder_in_hive(hive, tmpdir):
+    hive.add(Recorder(str(tmpdir)))
+    hive.submit_events(pybeehive.Event(i) for i in range(5))
+
+    def kill_after():
+        time.sleep(0.03)
+        hive.kill()
+
+    Thread(target=kill_after).start()
+    hive.run()
+    journal = Journal(str(tmpdir))
+    assert [e.data for _, e in journal.replay()] == list(range(5)), \
+        'Recorder did not record the events'
+    journal.close()
@@ -0,0 +1,121 @@
+from queue import Queue
+import time
+import pytest
+
+from pybeehive.restart import RestartPolicy, ExponentialBackoff
+import pybeehive
+
+
+class FlakyStreamer(pybeehive.Streamer):
+    def __init__(self, results, restart_policy=None):
+        super(FlakyStreamer, self).__init__(restart_policy=restart_policy)
+        self.results = list(results)
+        self.exceptions = []
+        self.starts = []
+
+    def stream(self):
+        self.starts.append(time.time())
+        if not self.results:
+            self.kill()
+            return
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        for item in result:
+            yield item
+
+    def on_exception(self, exception):
+        self.exceptions.append(exception)
+
+
+def run_streamer(streamer):
+    q = Queue()
+    streamer.set_queue(q)
+    streamer.run()
+    return [q.get_nowait().data for _ in range(q.qsize())]
+
+
+def test_default_policy_restarts_immediately():
+    streamer = FlakyStreamer([ValueError(), [1, 2], [], [3]])
+    assert run_streamer(streamer) == [1, 2, 3], 'Did not restart stream'
+    assert streamer.restarts == 4, 'Incorrect restart count'
+    assert len(streamer.exceptions) == 1, 'Did not call on_exception'
+
+
+def test_max_restarts():
+    streamer = FlakyStreamer(
+        [[1], ValueError(), [], ValueError(), [2]],
+        restart_policy=RestartPolicy(max_restarts=2)
+    )
+    assert run_streamer(streamer) == [1], 'Did not stop after max restarts'
+    assert not streamer.alive, 'Streamer was not killed'
+    assert streamer.restarts == 3, 'Incorrect restart count'
+
+
+def test_max_restarts_reset_on_progress():
+    streamer = FlakyStreamer(
+        [ValueError(), [1], ValueError(), [2], ValueError(), [3]],
+        restart_policy=RestartPolicy(max_restarts=1)
+    )
+    assert run_streamer(streamer) == [1, 2, 3], \
+        'Failures were not reset after the stream made progress'
+
+
+def test_stop_on_exhaustion():
+    streamer = FlakyStreamer(
+        [ValueError(), [1, 2], [3]],
+        restart_policy=RestartPolicy(restart_exhausted=False)
+    )
+    assert run_streamer(streamer) == [1, 2], 'Restarted exhausted stream'
+    assert not streamer.alive, 'Streamer was not killed'
+
+
+def test_exponential_backoff_delays():
+    policy = ExponentialBackoff(initial=1, factor=2, maximum=5, jitter=0)
+    assert [policy.next_delay(i, False) for i in range(1, 6)] == \
+        [1, 2, 4, 5, 5], 'Incorrect backoff delays'
+    assert policy.next_delay(10 ** 6, False) == 5, 'Did not cap huge delays'
+    jittered = ExponentialBackoff(initial=1, jitter=0.5)
+    for _ in range(100):
+        assert 1 <= jittered.next_delay(1, False) <= 1.5, \
+            'Jitter out of bounds'
+    capped = ExponentialBackoff(max_restarts=1, restart_exhausted=False)
+    assert capped.next_delay(2, False) is None, 'Did not cap retries'
+    assert capped.next_delay(1, True) is None, 'Restarted exhausted stream'
+
+
+def test_exponential_backoff_streamer():
+    policy = ExponentialBackoff(initial=0.01, factor=2, jitter=0)
+    streamer = FlakyStreamer([ValueError()] * 3, restart_policy=policy)
+    run_streamer(streamer)
+    gaps = [b - a for a, b in zip(streamer.starts, streamer.starts[1:])]
+    for gap, expected in zip(gaps, [0.01, 0.02, 0.04]):
+        assert gap >= expected, 'Did not back off between restarts'
+
+
+def test_backoff_interrupted_by_kill(hive):
+    @hive.streamer(restart_policy=ExponentialBackoff(initial=60))
+    def stream():
+        raise ValueError
+        yield
+
+    streamer = hive.streamers[0]
+    hive.run(threaded=True)
+    while not streamer.restarts:
+        time.sleep(1e-3)
+    start = time.time()
+    hive.close()
+    streamer.thread.join()
+    assert time.time() - start < 1, 'Kill did not interrupt backoff'
+    assert isinstance(streamer.restart_policy, ExponentialBackoff), \
+        'Decorator did not set restart policy'
+
+
+@pytest.mark.parametrize('policy', [None, RestartPolicy(max_restarts=0)])
+def test_empty_stream_spins(policy):
+    streamer = FlakyStreamer([[]] * 1000, restart_policy=policy)
+    run_streamer(streamer)
+    if policy is None:
+        assert streamer.restarts == 1000, 'Did not restart empty stream'
+    else:
+        assert streamer.restarts == 0, 'Restarted empty stream'
@@ -0,0 +1,179 @@
+from concurrent.futures import TimeoutError
+import pickle
+import random
+import time
+import pytest
+
+from pybeehive.rpc import RequestTracker, RemoteRequest
+import pybeehive
+
+
+def test_tracker_complete():
+    tracker = RequestTracker()
+    request = tracker.create()
+    assert len(tracker) == 1
+    request.resolve(1)
+    assert request.future.result(timeout=0) == 1
+    tracker.complete(request.id, 2)
+    assert request.future.result(timeout=0) == 1, \
+        "Completed request was resolved twice"
+    assert len(tracker) == 0 and tracker.completed == 1
+
+
+def test_tracker_fail():
+    tracker = RequestTracker()
+    request = tracker.create()
+    request.fail(ValueError('failed'))
+    with pytest.raises(ValueError):
+        request.future.result(timeout=0)
+    assert tracker.failed == 1
+
+
+def test_tracker_timeout():
+    tracker = RequestTracker()
+    request = tracker.create(timeout=1)
+    other = tracker.create()
+    tracker.expire(now=time.monotonic() + 0.5)
+    assert not request.future.done(), "Request expired before its timeout"
+    tracker.expire(now=time.monotonic() + 1)
+    with pytest.raises(TimeoutError):
+        request.future.result(timeout=0)
+    assert not other.future.done(), "Request without timeout expired"
+    assert tracker.timed_out == 1 and len(tracker) == 1
+
+
+def test_tracker_max_outstanding():
+    tracker = RequestTracker(max_outstanding=2)
+    request = tracker.create()
+    tracker.create()
+    with pytest.raises(RuntimeError):
+        tracker.create()
+    request.resolve(None)
+    tracker.create()
+
+
+def test_request_pickling():
+    request = RequestTracker().create()
+    assert pickle.loads(pickle.dumps(request)) is None, \
+        "Request without reply address was sent to another hive"
+    request = RequestTracker(reply_address=('127.0.0.1', 1)).create()
+    remote = pickle.loads(pickle.dumps(request))
+    assert isinstance(remote, RemoteRequest)
+    assert remote.id == request.id
+    assert remote.reply_address == ('127.0.0.1', 1)
+
+
+def test_hive_request(hive):
+    @hive.listener
+    def double(event):
+        return event.data * 2
+
+    hive.run(threaded=True)
+    try:
+        futures = [hive.request(pybeehive.Event(i), timeout=1)
+                   for i in range(10)]
+        assert [f.result(timeout=1) for f in futures] == \
+            [i * 2 for i in range(10)]
+    finally:
+        hive.close()
+    assert len(hive.requests) == 0
+
+
+def test_hive_request_chain(hive):
+    @hive.listener(filters=['topic'])
+    def first(event):
+        return event.data + 1
+
+    @hive.listener(chain='first')
+    def second(event):
+        return event.data * 10
+
+    @hive.listener(filters=['other'])
+    def ignored(event):
+        return 'ignored'
+
+    hive.run(threaded=True)
+    try:
+        future = hive.request(pybeehive.Event(1, topic='topic'), timeout=1)
+        assert future.result(timeout=1) == 20, \
+            "Request was not resolved at the end of the chain"
+    finally:
+        hive.close()
+
+
+def test_hive_request_exception(hive):
+    @hive.listener
+    def fail(event):
+        raise ValueError(event.data)
+
+    hive.run(threaded=True)
+    try:
+        future = hive.request(pybeehive.Event('failed'), timeout=1)
+        with pytest.raises(ValueError):
+            future.result(timeout=1)
+    finally:
+        hive.close()
+
+
+def test_hive_request_timeout(hive):
+    @hive.listener
+    def ignore(event):
+        return None
+
+    hive.run(threaded=True)
+    try:
+        future = hive.request(pybeehive.Event(1), timeout=0.05)
+        with pytest.raises(TimeoutError):
+            future.result(timeout=1)
+    finally:
+        hive.close()
+    assert hive.requests.timed_out == 1
+
+
+def test_hive_request_actor(hive):
+    @hive.listener(inbox=pybeehive.Inbox(10))
+    def handle(event):
+        return event.data + 1
+
+    hive.run(threaded=True)
+    try:
+        future = hive.request(pybeehive.Event(1), timeout=1)
+        assert future.result(timeout=1) == 2
+    finally:
+        hive.close()
+
+
+def test_remote_request():
+    port = random.randint(7000, 10000)
+    address = '127.0.0.1', port
+    reply_address = '127.0.0.1', port + 1
+    front = pybeehive.Hive(reply_address=reply_address)
+    back = pybeehive.Hive()
+
+    @front.socket_listener(address)
+    def forward(event):
+        return event
+
+    @back.socket_streamer(address)
+    def stream():
+        return
+
+    @back.listener
+    def handle(event):
+        return event.data * 2
+
+    back.run(threaded=True)
+    front.run(threaded=True)
+    try:
+        time.sleep(0.1)
+        futures = [front.request(pybeehive.Event(i), timeout=2)
+                   for i in range(10)]
+        assert [f.result(timeout=2) for f in futures] == \
+            [i * 2 for i in range(10)], "Requests were not answered remotely"
+        assert list(back.requests._clients) == [reply_address], \
+            "Replies were not sent by the answering hive"
+    finally:
+        front.close()
+        back.close()
+    time.sleep(0.1)
+    assert not back.requests._clients, "Reply clients were not shut down"
@@ -0,0 +1,52 @@
+from pybeehive.shedding import LoadShedder
+import pybeehive
+
+
+def event(topic=None, age=0, ttl=None, now=100):
+    return pybeehive.Event(topic, topic=topic, created_at=now - age, ttl=ttl)
+
+
+def test_ttl():
+    shedder = LoadShedder(ttl=5, topic_ttls={'quotes': 1})
+    assert not shedder.should_drop(event('trades', age=4), now=100), \
+        'Dropped an event within the default TTL'
+    assert shedder.should_drop(event('trades', age=6), now=100), \
+        'Did not drop an event past the default TTL'
+    assert shedder.should_drop(event('quotes', age=2), now=100), \
+        'Did not drop an event past the TTL of its topic'
+    assert not shedder.should_drop(event('quotes', age=2, ttl=3), now=100), \
+        'TTL of the event did not take precedence'
+    assert shedder.stats() == {
+        'trades': {'expired': 1, 'shed': 0},
+        'quotes': {'expired': 1, 'shed': 0},
+    }, 'Incorrect shed counts'
+
+
+def test_event_ttl_is_copied():
+    assert pybeehive.Event(event(ttl=3)).ttl == 3, 'TTL was not copied'
+    assert pybeehive.Event('data').ttl is None, 'Events have a default TTL'
+
+
+def test_adaptive_shedding():
+    shedder = LoadShedder(
+        target_latency=1, priorities={'debug': -1, 'orders': 1},
+        smoothing=1, adjust_interval=10
+    )
+    topics = ['debug', 'metrics', 'orders']
+
+    def dispatched(age, now):
+        return [t for t in topics
+                if not shedder.should_drop(event(t, age, now=now), now=now)]
+
+    assert dispatched(0.5, now=0) == topics, 'Shed under the target latency'
+    assert dispatched(2, now=1) == ['metrics', 'orders'], \
+        'Did not shed the lowest priority first'
+    assert dispatched(2, now=5) == ['metrics', 'orders'], \
+        'Changed the shedding level before the adjust interval'
+    assert dispatched(2, now=12) == ['orders'], \
+        'Did not shed the next priority'
+    assert dispatched(2, now=30) == ['orders'], 'Shed the highest priority'
+    assert dispatched(0.1, now=50) == ['metrics', 'orders'], \
+        'Did not recover after the latency dropped'
+    assert shedder.shed['debug'] == 5, 'Incorrect shed count'
+
@@ -1,9 +1,13 @@
+from queue import Empty
 from threading import Thread
+import os
 import random
 import time
 import pytest
 import _thread
+import zmq
 
+from pybeehive.codec import FrameCodec
 from pybeehive.socket import SocketStreamer, SocketListener
 import pybeehive
 
@@ -155,3 +159,151 @@ def test_interrupted_streamer_listener_loop(hive):
     assert not streamer.server.alive, 'KeyboardInterrupt did not kill server'
     assert not listener.client.alive, 'KeyboardInterrupt did not kill client'
 
+
+
+def receive_all(server, count, timeout=5):
+    messages = []
+    start = time.time()
+    while len(messages) < count and time.time() - start < timeout:
+        try:
+            messages.append(server.queue.get(timeout=0.01))
+        except Empty:
+            continue
+    return messages
+
+
+def test_client_hwm():
+    client = pybeehive.socket.Client(('127.0.0.1', 0), sndhwm=10, rcvhwm=20)
+    server = pybeehive.socket.Server(('127.0.0.1', 0), rcvhwm=30)
+    assert client.socket.getsockopt(zmq.SNDHWM) == 10
+    assert client.socket.getsockopt(zmq.RCVHWM) == 20
+    assert server.socket.getsockopt(zmq.RCVHWM) == 30
+    client.shutdown()
+    server.socket.close(linger=0)
+    with pytest.raises(ValueError):
+        pybeehive.socket.Client(('127.0.0.1', 0), overflow='wait')
+
+
+def test_client_buffer_overflow_drop():
+    client = pybeehive.socket.Client(('127.0.0.1', 0), buffer_size=5,
+                                     overflow='drop')
+    for i in range(10):
+        client.send(b'data')
+    assert client.stats() == {'depth': 5, 'dropped': 5, 'spilled': 0}
+    client.shutdown()
+
+
+def test_client_buffer_overflow_spill():
+    port = random.randint(7000, 10000)
+    client = pybeehive.socket.Client(('127.0.0.1', port), buffer_size=5,
+                                     overflow='spill')
+    server = pybeehive.socket.Server(('127.0.0.1', port))
+    for i in range(20):
+        client.send(str(i).encode())
+    assert client.stats() == {'depth': 20, 'dropped': 0, 'spilled': 15}
+    server.start()
+    client.connect()
+    try:
+        assert receive_all(server, 20) == [str(i).encode() for i in range(20)]
+    finally:
+        client.shutdown()
+        server.shutdown()
+    assert not os.path.exists(client.buffer.queue.directory), \
+        "Spill directory was not removed"
+
+
+def test_client_buffer_overflow_block():
+    port = random.randint(7000, 10000)
+    client = pybeehive.socket.Client(('127.0.0.1', port), sndhwm=10,
+                                     buffer_size=10, overflow='block')
+    server = pybeehive.socket.Server(('127.0.0.1', port))
+    sender = Thread(target=lambda: [client.send(str(i).encode())
+                                    for i in range(1000)])
+    client.connect()
+    sender.start()
+    time.sleep(0.05)
+    assert sender.is_alive(), "Send did not block on a full buffer"
+    assert client.stats()['depth'] == 10
+    server.start()
+    try:
+        received = receive_all(server, 1000)
+        sender.join()
+        assert received == [str(i).encode() for i in range(1000)], \
+            "Buffered messages were not all sent in order"
+        assert client.stats()['dropped'] == 0
+    finally:
+        client.shutdown()
+        server.shutdown()
+
+
+def test_hive_closes_while_client_buffer_is_full(hive):
+    address = '127.0.0.1', random.randint(7000, 10000)
+
+    @hive.socket_listener(address, buffer_size=2, overflow='block', sndhwm=1)
+    def parse_event(event):
+        return event
+
+    hive.submit_events(pybeehive.Event(i) for i in range(10))
+    thread = hive.run(threaded=True)
+    time.sleep(0.1)
+    hive.close()
+    thread.join(3)
+    assert not thread.is_alive(), "Hive waited for room in the buffer"
+
+
+def test_client_shutdown_flushes_buffer():
+    port = random.randint(7000, 10000)
+    client = pybeehive.socket.Client(('127.0.0.1', port), buffer_size=100)
+    server = pybeehive.socket.Server(('127.0.0.1', port))
+    server.start()
+    client.connect()
+    for i in range(50):
+        client.send(b'data')
+    client.shutdown()
+    assert client.stats()['depth'] == 0, "Buffer was not flushed on shutdown"
+    assert len(receive_all(server, 50)) == 50
+    server.shutdown()
+
+
+def test_compressed_batched_client_server():
+    port = random.randint(7000, 10000)
+    codec = FrameCodec('zlib', threshold=100)
+    client = pybeehive.socket.Client(('127.0.0.1', port), buffer_size=1000,
+                                     codec=codec, batch_size=100)
+    server = pybeehive.socket.Server(('127.0.0.1', port), codec=FrameCodec())
+    messages = [pybeehive.Event(i).tostring() for i in range(500)]
+    for msg in messages:
+        client.send(msg)
+    server.start()
+    client.connect()
+    try:
+        assert receive_all(server, 500) == messages, \
+            "Batched messages were not all received in order"
+        assert codec.ratio < 0.5, "Batches were not compressed"
+    finally:
+        client.shutdown()
+        server.shutdown()
+    with pytest.raises(ValueError):
+        pybeehive.socket.Client(('127.0.0.1', port), batch_size=10)
+
+
+def test_compressed_socket_bees(hive):
+    address = '127.0.0.1', random.randint(7000, 10000)
+    events = []
+
+    @hive.socket_listener(address, codec=FrameCodec('lzma', threshold=0))
+    def parse_event(event):
+        event = pybeehive.Event(event.data + 'x', created_at=event.created_at)
+        events.append(event)
+        return event
+
+    hive.add(SocketStreamer(address, codec=FrameCodec()))
+    hive.submit_event(pybeehive.Event('x' * 1000))
+    hive.run(threaded=True)
+    start = time.time()
+    while len(events) < 5 and time.time() - start < 2:
+        time.sleep(1e-4)
+    hive.close()
+    assert len(events) >= 5, "Hive did not process all events"
+    for i, e in enumerate(events):
+        assert e.data == 'x' * (1001 + i), "Compressed event was not decoded"
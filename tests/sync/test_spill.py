@@ -0,0 +1,60 @@
+import os
+
+from pybeehive.spill import SpillBuffer, SpillQueue
+import pybeehive
+
+
+def test_spill_preserves_order(tmpdir):
+    buf = SpillBuffer(memory_limit=10, directory=str(tmpdir),
+                      segment_size=256)
+    for i in range(100):
+        buf.append(i)
+    assert len(buf) == 100 and buf.on_disk == 90, 'Did not spill overflow'
+    assert len(os.listdir(str(tmpdir))) > 1, 'Did not rotate segments'
+    out = [buf.popleft() for _ in range(50)]
+    for i in range(100, 120):
+        buf.append(i)
+    out += [buf.popleft() for _ in range(len(buf))]
+    assert out == list(range(120)), 'Items were not returned in order'
+    assert os.listdir(str(tmpdir)) == [], 'Drained segments were kept'
+    assert buf.spilled == 110, 'Incorrect number of spilled items'
+
+
+def test_spill_memory_stays_bounded():
+    buf = SpillBuffer(memory_limit=5)
+    for i in range(1000):
+        buf.append(i)
+        assert len(buf._memory) <= 5, 'Memory grew past the limit'
+    assert [buf.popleft() for _ in range(1000)] == list(range(1000)), \
+        'Lost spilled items'
+    buf.close()
+    assert not os.path.exists(buf.directory), 'Directory was not removed'
+
+
+def test_spill_queue_events():
+    q = SpillQueue(memory_limit=2)
+    q.put_many([pybeehive.Event(i, topic='audit') for i in range(10)])
+    assert q.qsize() == 10 and q.on_disk == 8, 'Did not spill events'
+    events = [q.get_nowait() for _ in range(10)]
+    assert [e.data for e in events] == list(range(10)), \
+        'Events were not returned in order'
+    assert events[-1].topic == 'audit', 'Events were not encoded fully'
+    q.close()
+
+
+def test_spill_queue_keeps_requests():
+    hive = pybeehive.Hive(queue=SpillQueue(memory_limit=1))
+
+    @hive.listener
+    def double(event):
+        return event.data * 2
+
+    futures = [hive.request(pybeehive.Event(i), timeout=2) for i in range(5)]
+    assert hive._event_queue.on_disk == 4, 'Did not spill the events'
+    hive.run(threaded=True)
+    try:
+        assert [f.result(timeout=2) for f in futures] == \
+            [i * 2 for i in range(5)], 'Requests of spilled events were lost'
+    finally:
+        hive.close()
+        hive._event_queue.close()
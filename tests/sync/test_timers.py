@@ -0,0 +1,159 @@
+from datetime import datetime
+import threading
+import time
+import pytest
+
+from pybeehive.timers import Cron, Interval, Once, TimerHeap
+import pybeehive
+
+
+def noop():
+    pass
+
+
+def test_interval_is_drift_corrected():
+    timer = Interval(noop, 10)
+    assert timer.first(100) == 110, 'Did not schedule first firing'
+    assert timer.next(110, 113) == 120, 'Next firing drifted'
+    assert timer.next(110, 145) == 150, 'Did not skip missed firings'
+    with pytest.raises(ValueError):
+        Interval(noop, 0)
+
+
+def test_once():
+    timer = Once(noop, 5)
+    assert timer.first(100) == 105, 'Did not schedule firing'
+    assert timer.next(105, 105) is None, 'Scheduled a second firing'
+
+
+def test_cron_next_after():
+    start = datetime(2018, 10, 15, 12, 7, 30).timestamp()
+    every_5 = Cron(noop, '*/5 * * * *')
+    assert datetime.fromtimestamp(every_5.next_after(start)) == \
+        datetime(2018, 10, 15, 12, 10), 'Incorrect step match'
+    daily = Cron(noop, '@daily')
+    assert datetime.fromtimestamp(daily.next_after(start)) == \
+        datetime(2018, 10, 16, 0, 0), 'Incorrect alias match'
+    # 2018-10-15 is a monday, so the next friday is the 19th
+    fridays = Cron(noop, '30 9 * * 5')
+    assert datetime.fromtimestamp(fridays.next_after(start)) == \
+        datetime(2018, 10, 19, 9, 30), 'Incorrect weekday match'
+    # restricted day of month and day of week match either field
+    either = Cron(noop, '0 0 1 * 3')
+    assert datetime.fromtimestamp(either.next_after(start)) == \
+        datetime(2018, 10, 17, 0, 0), 'Day fields were not combined'
+    ranges = Cron(noop, '0 8-10/2,20 * 1-2 *')
+    assert datetime.fromtimestamp(ranges.next_after(start)) == \
+        datetime(2019, 1, 1, 8, 0), 'Incorrect range match'
+
+
+@pytest.mark.parametrize('expression', [
+    '* * * *', '60 * * * *', '* * 0 * *', 'a * * * *', '*/0 * * * *',
+    '5-1 * * * *'
+])
+def test_cron_invalid_expression(expression):
+    with pytest.raises(ValueError):
+        Cron(noop, expression)
+
+
+def test_timer_heap():
+    heap = TimerHeap()
+    fast, slow, once = Interval(noop, 1), Interval(noop, 3), Once(noop, 2)
+    for timer in [slow, once, fast]:
+        heap.push(timer, 0)
+    assert heap.delay(0) == 1, 'Incorrect delay until first timer'
+    due = heap.pop_due(3)
+    assert [t for _, t in due] == [fast, once, slow], 'Incorrect firing order'
+    assert [s for s, _ in due] == [1, 2, 3], 'Incorrect scheduled times'
+    assert len(heap) == 2, 'One-shot timer was rescheduled'
+    assert heap.delay(3) == 1, 'Incorrect delay after firing'
+    assert heap.pop_due(3.5) == [], 'Fired timers that were not due'
+
+
+def test_timer_heap_jitter():
+    heap = TimerHeap()
+    timer = Interval(noop, 1, jitter=0.5)
+    heap.push(timer, 0)
+    assert 1 <= heap.delay(0) <= 1.5, 'Jitter out of bounds'
+    heap.pop_due(1.5)
+    assert 2 <= heap.delay(0) <= 2.5, 'Jitter accumulated over firings'
+
+
+def test_hive_timers(hive):
+    calls = []
+    thread_names = set()
+
+    def record(name):
+        thread_names.add(threading.current_thread().name)
+        return name
+
+    for i in range(20):
+        hive.interval(0.005, topic='tick')(lambda: record('tick'))
+
+    @hive.once(0.01)
+    def once():
+        return record('once')
+
+    @hive.cron('@yearly')
+    def never():
+        return record('never')
+
+    @hive.listener
+    def on_event(event):
+        calls.append(event)
+
+    hive.run(threaded=True)
+    time.sleep(0.1)
+    hive.close()
+    assert len(hive.streamers) == 1, 'Did not share one streamer for timers'
+    assert len(thread_names) == 1, 'Timers did not fire from one thread'
+    assert len([e for e in calls if e.data == 'once']) == 1, \
+        'One-shot timer did not fire exactly once'
+    ticks = [e for e in calls if e.data == 'tick']
+    assert len(ticks) >= 40, 'Interval timers did not fire repeatedly'
+    assert all(e.topic == 'tick' for e in ticks), 'Topic was not set'
+    assert not any(e.data == 'never' for e in calls), 'Cron fired too early'
+
+
+def test_hive_timer_exception(hive):
+    calls = []
+
+    @hive.interval(0.001)
+    def fail():
+        raise ValueError
+
+    @hive.interval(0.001)
+    def ok():
+        return 1
+
+    @hive.listener
+    def on_event(event):
+        calls.append(event)
+
+    hive.run(threaded=True)
+    time.sleep(0.02)
+    hive.close()
+    assert calls, 'Failing timer stopped other timers from firing'
+
+
+def test_hive_timers_scheduled_on_start(hive):
+    calls = []
+
+    @hive.once(0.2)
+    def once():
+        return 'once'
+
+    @hive.listener
+    def on_event(event):
+        calls.append(time.time())
+
+    time.sleep(0.3)
+    start = time.time()
+    hive.run(threaded=True)
+    deadline = time.time() + 2
+    while not calls and time.time() < deadline:
+        time.sleep(1e-3)
+    hive.close()
+    assert calls, 'One-shot timer did not fire'
+    assert calls[0] - start >= 0.15, \
+        'Timer was scheduled when it was added instead of on start'